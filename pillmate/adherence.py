@@ -0,0 +1,192 @@
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .archive import archived_day_counts, archived_summary
+from .caching import touch_all
+from .dosing import date_range
+from .models import Medicine, DailyDose, DailyAdherenceSummary
+from .recurrence import compile_rule, medicine_slots
+
+# 한 번에 조회할 수 있는 최대 기간 (1년 히트맵까지)
+MAX_RANGE_DAYS = 366
+
+
+def resolve_range(params, today):
+    """
+    쿼리 파라미터로부터 조회 기간(start, end) 계산
+    - start/end=YYYY-MM-DD : 임의 기간
+    - year=YYYY&month=M    : 해당 월
+    - year=YYYY            : 해당 연도 전체
+    - month=M              : 올해 해당 월
+    - 없음                 : 이번 달
+    """
+    start_str = params.get("start")
+    end_str = params.get("end")
+    year_str = params.get("year")
+    month_str = params.get("month")
+
+    if start_str or end_str:
+        if not (start_str and end_str):
+            raise ValueError("start 와 end 는 함께 지정해야 합니다.")
+        start = date.fromisoformat(start_str)
+        end = date.fromisoformat(end_str)
+    else:
+        year = int(year_str) if year_str else today.year
+        if year_str and not month_str:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+        else:
+            month = int(month_str) if month_str else today.month
+            start = date(year, month, 1)
+            end = date(year + (month == 12), (month % 12) + 1, 1) - timedelta(days=1)
+
+    if start > end:
+        raise ValueError("start 는 end 보다 늦을 수 없습니다.")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"조회 기간은 최대 {MAX_RANGE_DAYS}일 입니다.")
+    return start, end
+
+
+def virtual_pending(user_id, start, end):
+    """
+    VIRTUAL 약 중 아직 row 가 없는(복용 안 한) 날짜별 dose 개수 → {date: count}
+    매일 복용하는 약은 기간을 +하루 복용 횟수/- 경계로 찍고 누적합으로 날짜별 dose 수를 구하고,
+    요일 / N일 간격 약만 복용 규칙으로 복용일을 전개한다.
+    """
+    meds = list(
+        Medicine.objects.filter(
+            user_id=user_id, schedule_mode="VIRTUAL", start_date__lte=end, end_date__gte=start
+        ).values_list(
+            "id", "start_date", "end_date", "archived_until",
+            "slot_times", "alarm_time", "weekday_mask", "interval_days",
+        )
+    )
+    if not meds:
+        return {}
+
+    edges = Counter()
+    scheduled = Counter()
+    for _, med_start, med_end, _, slot_times, alarm_time, weekday_mask, interval_days in meds:
+        slots = medicine_slots(slot_times, alarm_time)
+        rule = compile_rule(med_start, med_end, slots, weekday_mask, interval_days)
+        if len(rule.offsets) == rule.period:
+            edges[max(med_start, start)] += len(slots)
+            edges[min(med_end, end) + timedelta(days=1)] -= len(slots)
+        else:
+            for d in rule.dates(start, end):
+                scheduled[d] += len(slots)
+
+    materialized = Counter(
+        DailyDose.objects.filter(
+            user_id=user_id,
+            medicine_id__in=[med[0] for med in meds],
+            date__range=(start, end),
+        ).values_list("date", flat=True)
+    )
+    # 보관된 달의 복용 row 는 DoseArchive 에서
+    archived = [med[0] for med in meds if med[3] and med[3] >= start]
+    if archived:
+        materialized.update(archived_day_counts(archived, start, end))
+
+    pending = {}
+    active = 0
+    for d in date_range(start, end):
+        active += edges[d]
+        count = active + scheduled[d] - materialized[d]
+        if count:
+            pending[d] = count
+    return pending
+
+
+def summary_rows(user_id, start, end):
+    """기간 내 집계 row — (user, date) unique 인덱스 범위 조회"""
+    return DailyAdherenceSummary.objects.filter(
+        user_id=user_id, date__range=(start, end)
+    ).values_list("date", "scheduled", "taken")
+
+
+def daily_counts(user_id, start, end):
+    """
+    기간 내 날짜별 복용/미복용 개수
+    DailyAdherenceSummary 범위 조회로 읽고, 기록이 없는 날은 0 으로 채운다.
+    VIRTUAL 약의 아직 생성 안 된 dose 는 미복용으로 더해준다.
+    """
+    rows = summary_rows(user_id, start, end)
+    by_date = {d: (scheduled, taken) for d, scheduled, taken in rows}
+    pending = virtual_pending(user_id, start, end)
+
+    data = []
+    for d in date_range(start, end):
+        scheduled, taken = by_date.get(d, (0, 0))
+        data.append({
+            "date": d.strftime("%Y-%m-%d"),
+            "taken": taken,
+            "missed": scheduled - taken + pending.get(d, 0),
+        })
+    return data
+
+
+def compute_summary(user_id=None):
+    """DailyDose 원본 + DoseArchive 에서 집계를 새로 계산 → {(user_id, date): (scheduled, taken)}"""
+    doses = DailyDose.objects.all()
+    if user_id is not None:
+        doses = doses.filter(user_id=user_id)
+
+    rows = (
+        doses
+        .values_list("user_id", "date")
+        .annotate(
+            scheduled=Count("id"),
+            taken=Count("id", filter=Q(is_taken=True)),
+        )
+        .order_by()
+    )
+    summary = archived_summary(user_id)
+    for uid, d, scheduled, taken in rows:
+        archived_scheduled, archived_taken = summary.get((uid, d), (0, 0))
+        summary[(uid, d)] = (archived_scheduled + scheduled, archived_taken + taken)
+    return summary
+
+
+def stored_summary(user_id=None):
+    """현재 저장된 집계 → {(user_id, date): (scheduled, taken)} (0/0 row 는 제외)"""
+    summaries = DailyAdherenceSummary.objects.exclude(scheduled=0, taken=0)
+    if user_id is not None:
+        summaries = summaries.filter(user_id=user_id)
+
+    rows = summaries.values_list("user_id", "date", "scheduled", "taken")
+    return {(uid, d): (scheduled, taken) for uid, d, scheduled, taken in rows}
+
+
+def verify_summary(user_id=None):
+    """원본과 집계가 다른 (user_id, date) 목록 반환 → [(key, 저장값, 실제값)]"""
+    expected = compute_summary(user_id)
+    stored = stored_summary(user_id)
+    return [
+        (key, stored.get(key, (0, 0)), expected.get(key, (0, 0)))
+        for key in sorted(expected.keys() | stored.keys())
+        if stored.get(key, (0, 0)) != expected.get(key, (0, 0))
+    ]
+
+
+def rebuild_summary(user_id=None):
+    """집계를 원본 기준으로 전부 다시 만든다. (생성한 row 수 반환)"""
+    expected = compute_summary(user_id)
+
+    with transaction.atomic():
+        summaries = DailyAdherenceSummary.objects.all()
+        if user_id is not None:
+            summaries = summaries.filter(user_id=user_id)
+        summaries.delete()
+
+        DailyAdherenceSummary.objects.bulk_create(
+            [
+                DailyAdherenceSummary(user_id=uid, date=d, scheduled=scheduled, taken=taken)
+                for (uid, d), (scheduled, taken) in expected.items()
+            ],
+            batch_size=1000,
+        )
+        touch_all()
+    return len(expected)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Medicine, GuardianInfo
+from .models import Medicine, GuardianInfo, Device, MedicineLog
 @admin.register(Medicine)
 class MedicineAdmin(admin.ModelAdmin):
     fieldsets = (
@@ -7,14 +7,27 @@ class MedicineAdmin(admin.ModelAdmin):
             "fields": ("user", "name", "type")
         }),
         ("복약 설정", {
-            "fields": ("quantity", "time", "alarm_time")
+            "fields": ("quantity", "time", "alarm_time", "slot_times")
         }),
         ("복약 기간", {
-            "fields": ("start_date", "end_date")
+            "fields": ("start_date", "end_date", "weekday_mask", "interval_days", "schedule_mode")
         })
     )
 
 @admin.register(GuardianInfo)
 class GuardianInfoAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "phone", "email", "owner_name", "owner_email")
-    search_fields = ("name", "phone", "email", "owner_name", "owner_email")
+    list_display = ("id", "user", "name", "phone", "email", "owner_name", "owner_email")
+    search_fields = ("user__username", "name", "phone", "email", "owner_name", "owner_email")
+
+
+@admin.register(Device)
+class DeviceAdmin(admin.ModelAdmin):
+    list_display = ("id", "device_id", "user")
+    search_fields = ("device_id", "user__username")
+
+
+@admin.register(MedicineLog)
+class MedicineLogAdmin(admin.ModelAdmin):
+    list_display = ("id", "device", "medicine", "taken", "timestamp", "received_at", "reconciled")
+    list_filter = ("reconciled", "taken")
+    search_fields = ("device__device_id", "medicine")
@@ -0,0 +1,140 @@
+import bisect
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .archive import archived_rows
+from .models import Medicine, DailyDose, DoseArchive
+from .recurrence import compile_rule, medicine_slots
+
+# 실제 복용 시각 - 복용 예정 시각 (분) 구간: 30분 넘게 일찍 / 알람 전 30분 / 30분 이내 / 30~60분 / 1~2시간 / 2시간 넘게 늦게
+TIMING_BOUNDS = (-30, 0, 30, 60, 120)
+TIMING_LABELS = ("early", "before_alarm", "on_time", "late", "very_late", "much_later")
+
+
+def _streaks(taken_days, rule, first, last, today):
+    """
+    (가장 긴 연속 복용일 수, 현재 연속 복용일 수)
+    taken_days: first ~ last 사이 모든 복용 시각을 복용한 날짜 (정렬됨)
+    복용 규칙상 바로 다음 복용일이면 연속 (rule.index 가 1 차이)
+    오늘 아직 다 복용하지 않았으면 현재 연속은 직전 복용일까지로 센다.
+    """
+    longest = run = 0
+    previous = previous_index = None
+    for d in taken_days:
+        index = rule.index(d)
+        run = run + 1 if previous_index == index - 1 else 1
+        longest = max(longest, run)
+        previous, previous_index = d, index
+
+    end = rule.last_on_or_before(last)
+    if end == today and previous != today:
+        end = rule.last_on_or_before(today - timedelta(days=1))
+    current = run if end is not None and previous == end and end >= first else 0
+    return longest, current
+
+
+def _timing(drifts):
+    """알람 대비 복용 시각 차이(분) 목록 → 분포"""
+    buckets = [0] * len(TIMING_LABELS)
+    for minutes in drifts:
+        buckets[bisect.bisect_right(TIMING_BOUNDS, minutes)] += 1
+    return {
+        "samples": len(drifts),
+        "median_minutes": round(statistics.median(drifts), 1) if drifts else None,
+        "mean_minutes": round(statistics.fmean(drifts), 1) if drifts else None,
+        "buckets": dict(zip(TIMING_LABELS, buckets)),
+    }
+
+
+def _rate(taken, scheduled):
+    return round(taken * 100 / scheduled, 1) if scheduled else None
+
+
+def medicine_stats(user_id, start, end, today=None):
+    """
+    기간 내 약별 복용률 / 연속 복용 (현재, 최장) / 복용 시각 대비 실제 복용 시각 분포
+    복용 일정은 약의 복용 규칙 (기간 + 요일 + N일 간격 + 하루 복용 시각) 을 따르고,
+    아직 오지 않은 날 (오늘 이후) 은 세지 않는다. 복용률은 dose (복용 시각) 단위,
+    연속 복용은 그날 복용 시각을 모두 복용한 복용일 단위로 센다.
+
+    쿼리: 약 1번 + 복용한 DailyDose values_list 1번 (+ 보관된 달이 있으면 DoseArchive 1번)
+    복용한 row 를 (약, 날짜) 순으로 한 번만 훑어서 모든 지표를 계산한다.
+    """
+    today = today or timezone.localdate()
+    last = min(end, today)
+
+    medicines = list(
+        Medicine.objects.filter(user_id=user_id, start_date__lte=last, end_date__gte=start)
+        .order_by("id")
+        .values_list(
+            "id", "name", "start_date", "end_date", "alarm_time", "archived_until",
+            "slot_times", "weekday_mask", "interval_days",
+        )
+    )
+
+    taken = defaultdict(Counter)   # medicine_id → {date: 복용한 dose 수}
+    drifts = defaultdict(list)     # medicine_id → [분]
+    if medicines:
+        ids = {med[0] for med in medicines}
+        rows = (
+            DailyDose.objects.filter(user_id=user_id, is_taken=True, date__range=(start, last))
+            .order_by("medicine_id", "date")
+            .values_list("medicine_id", "date", "slot_time", "taken_at")
+        )
+        for med_id, d, slot_time, taken_at in rows:
+            if med_id not in ids:
+                continue
+            taken[med_id][d] += 1
+            if taken_at is not None:
+                slot = timezone.make_aware(datetime.combine(d, slot_time))
+                drifts[med_id].append((taken_at - slot).total_seconds() / 60)
+
+        archived = [med[0] for med in medicines if med[5] and med[5] >= start]
+        if archived:
+            # 보관된 달은 복용 날짜만 남아 있음 (복용 시각 없음)
+            archives = DoseArchive.objects.filter(
+                medicine_id__in=archived, month__range=(start.replace(day=1), last), taken__gt=0
+            ).order_by("month")
+            for archive in archives:
+                taken[archive.medicine_id].update(
+                    d for d, is_taken in archived_rows(archive) if is_taken and start <= d <= last
+                )
+
+    result = []
+    total_scheduled = total_taken = 0
+    for med_id, name, med_start, med_end, alarm_time, _, slot_times, weekday_mask, interval_days in medicines:
+        slots = medicine_slots(slot_times, alarm_time)
+        rule = compile_rule(med_start, med_end, slots, weekday_mask, interval_days)
+        first, med_last = max(start, med_start), min(last, med_end)
+        counts = {d: n for d, n in taken[med_id].items() if first <= d <= med_last and rule.occurs(d)}
+        doses_taken = sum(counts.values())
+        scheduled = rule.count(first, med_last) * len(slots)
+        full_days = sorted(d for d, n in counts.items() if n >= len(slots))
+        longest, current = _streaks(full_days, rule, first, med_last, today)
+
+        total_scheduled += scheduled
+        total_taken += doses_taken
+        result.append({
+            "medicine_id": med_id,
+            "name": name,
+            "scheduled": scheduled,
+            "taken": doses_taken,
+            "adherence": _rate(doses_taken, scheduled),
+            "current_streak": current,
+            "longest_streak": longest,
+            "timing": _timing(drifts[med_id]),
+        })
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "overall": {
+            "scheduled": total_scheduled,
+            "taken": total_taken,
+            "adherence": _rate(total_taken, total_scheduled),
+        },
+        "medicines": result,
+    }
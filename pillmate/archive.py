@@ -0,0 +1,235 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .caching import touch_all
+from .models import Medicine, DailyDose, DoseArchive, DoseLog
+
+# 이번 달 포함 최근 몇 달을 DailyDose / DoseLog 에 남길지 (미복용 확인, 달력 조회가 주로 보는 기간)
+ARCHIVE_KEEP_MONTHS = 3
+# 한 트랜잭션에서 보관할 약 수
+ARCHIVE_BATCH_SIZE = 200
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    """day 가 속한 달에서 months 만큼 이동한 달의 1일"""
+    index = day.year * 12 + day.month - 1 + months
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def archived_rows(archive):
+    """DoseArchive → [(date, is_taken)] (DailyDose row 가 있던 날짜만)"""
+    rows = []
+    for i in range(archive.scheduled_mask.bit_length()):
+        if archive.scheduled_mask >> i & 1:
+            rows.append((archive.month + timedelta(days=i), bool(archive.taken_mask >> i & 1)))
+    return rows
+
+
+def archive_cutoff(today, keep_months=ARCHIVE_KEEP_MONTHS):
+    """이 날짜 이전 (전날까지) 의 row 를 보관 — 최근 keep_months 달은 남김"""
+    return add_months(today, -(keep_months - 1))
+
+
+def _archive_batch(medicines, cutoff, log_cutoff):
+    """약 묶음의 cutoff 이전 DailyDose / DoseLog 를 DoseArchive 로 옮기고 원본 삭제 (트랜잭션 안에서 호출)"""
+    ids = list(medicines)
+    doses = DailyDose.objects.filter(medicine_id__in=ids, date__lt=cutoff)
+    logs = DoseLog.objects.filter(medicine_id__in=ids, taken_at__lt=log_cutoff)
+
+    rows = list(doses.values_list("medicine_id", "date", "slot_time", "is_taken"))
+    log_counts = list(
+        logs.annotate(month=TruncMonth("taken_at"))
+        .values_list("medicine_id", "month")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    months = {month_start(d) for _, d, _, _ in rows} | {timezone.localdate(m) for _, m, _ in log_counts}
+    if not months:
+        return {"archives": 0, "doses": 0, "logs": 0}
+
+    # 중간에 멈췄다 다시 돌리는 경우 등 이미 있는 보관 row 에 합친다
+    archives = {
+        (archive.medicine_id, archive.month, archive.slot_time): archive
+        for archive in DoseArchive.objects.filter(medicine_id__in=ids, month__in=months)
+    }
+    existing = set(archives)
+
+    def archive_for(medicine_id, month, slot_time):
+        key = (medicine_id, month, slot_time)
+        if key not in archives:
+            archives[key] = DoseArchive(
+                medicine_id=medicine_id, user_id=medicines[medicine_id], month=month, slot_time=slot_time,
+            )
+        return archives[key]
+
+    for medicine_id, d, slot_time, is_taken in rows:
+        archive = archive_for(medicine_id, month_start(d), slot_time)
+        bit = day_bit(d)
+        if archive.scheduled_mask & bit:
+            continue
+        archive.scheduled_mask |= bit
+        archive.scheduled += 1
+        if is_taken:
+            archive.taken_mask |= bit
+            archive.taken += 1
+
+    if log_counts:
+        # DoseLog 는 복용 시각 구분이 없으므로 그 달의 첫 복용 시각 보관 row 에 개수를 더한다
+        first_slots = {}
+        for medicine_id, month, slot_time in archives:
+            key = (medicine_id, month)
+            first_slots[key] = min(first_slots.get(key, slot_time), slot_time)
+        alarms = dict(Medicine.objects.filter(id__in=ids).values_list("id", "alarm_time"))
+        for medicine_id, month, n in log_counts:
+            month = timezone.localdate(month)
+            slot_time = first_slots.get((medicine_id, month), alarms[medicine_id])
+            archive_for(medicine_id, month, slot_time).log_count += n
+
+    DoseArchive.objects.bulk_create([a for key, a in archives.items() if key not in existing])
+    DoseArchive.objects.bulk_update(
+        [a for key, a in archives.items() if key in existing],
+        ["scheduled_mask", "taken_mask", "scheduled", "taken", "log_count"],
+    )
+
+    # 보관 기간 날짜는 sync_daily_doses / materialize_dose 가 다시 만들지 않음
+    until = cutoff - timedelta(days=1)
+    Medicine.objects.filter(id__in=ids).filter(
+        Q(archived_until__isnull=True) | Q(archived_until__lt=until)
+    ).update(archived_until=until)
+
+    # DailyDose / DoseLog 는 삭제 수신기가 없어서 범위 DELETE 1번씩
+    doses.delete()
+    logs.delete()
+    return {"archives": len(archives), "doses": len(rows), "logs": sum(n for _, _, n in log_counts)}
+
+
+def archive_doses(keep_months=ARCHIVE_KEEP_MONTHS, batch_size=ARCHIVE_BATCH_SIZE, today=None):
+    """
+    지난 달 DailyDose / DoseLog 를 약별 월 단위 DoseArchive 로 압축 보관하고 원본은 지운다.
+    (날짜별 집계 DailyAdherenceSummary 는 그대로 — 복용 기록 수가 바뀌지 않음)
+    약 batch_size 개씩 한 트랜잭션으로 처리한다.
+    반환값: {"medicines", "archives", "doses", "logs"}
+    """
+    today = today or timezone.localdate()
+    cutoff = archive_cutoff(today, keep_months)
+    log_cutoff = timezone.make_aware(datetime.combine(cutoff, time.min))
+
+    candidates = Medicine.objects.filter(
+        Exists(DailyDose.objects.filter(medicine=OuterRef("pk"), date__lt=cutoff))
+        | Exists(DoseLog.objects.filter(medicine=OuterRef("pk"), taken_at__lt=log_cutoff))
+    ).order_by("id")
+
+    totals = {"medicines": 0, "archives": 0, "doses": 0, "logs": 0}
+    last_id = 0
+    while True:
+        medicines = dict(candidates.filter(id__gt=last_id).values_list("id", "user_id")[:batch_size])
+        if not medicines:
+            break
+        last_id = max(medicines)
+
+        with transaction.atomic():
+            result = _archive_batch(medicines, cutoff, log_cutoff)
+
+        totals["medicines"] += len(medicines)
+        for key, value in result.items():
+            totals[key] += value
+
+    if totals["medicines"]:
+        # ?date= 조회 캐시가 보관 row 기준으로 다시 만들어지도록
+        touch_all()
+    return totals
+
+
+########################################################################
+# 조회 — 보관된 달은 DoseArchive 에서 읽는다
+
+def is_archivable(day, today=None):
+    """이번 달 이전 날짜만 보관될 수 있음 (그 외에는 보관 row 조회를 건너뜀)"""
+    return day < month_start(today or timezone.localdate())
+
+
+def archived_doses_for_date(day, user_id=None):
+    """
+    보관된 그날의 dose → 저장되지 않은 DailyDose (pk=None, medicine 포함)
+    """
+    if not is_archivable(day):
+        return []
+
+    bit = day_bit(day)
+    archives = (
+        DoseArchive.objects.filter(month=month_start(day))
+        .annotate(scheduled_bit=F("scheduled_mask").bitand(bit))
+        .filter(scheduled_bit__gt=0)
+        .select_related("medicine")
+        .order_by("medicine_id", "slot_time")
+    )
+    if user_id is not None:
+        archives = archives.filter(user_id=user_id)
+
+    return [
+        DailyDose(
+            medicine=archive.medicine,
+            user_id=archive.user_id,
+            date=day,
+            slot_time=archive.slot_time,
+            quantity=archive.medicine.quantity,
+            is_taken=bool(archive.taken_mask & bit),
+        )
+        for archive in archives
+    ]
+
+
+def archived_day_counts(medicine_ids, start, end):
+    """약들의 보관된 dose 날짜별 개수 → {date: count} (기간 start ~ end)"""
+    counts = defaultdict(int)
+    archives = DoseArchive.objects.filter(
+        medicine_id__in=medicine_ids, month__range=(month_start(start), end)
+    ).only("month", "scheduled_mask", "taken_mask")
+    for archive in archives:
+        for d, _ in archived_rows(archive):
+            if start <= d <= end:
+                counts[d] += 1
+    return counts
+
+
+def archived_summary(user_id=None):
+    """보관 row 기준 날짜별 집계 → {(user_id, date): (scheduled, taken)}"""
+    archives = DoseArchive.objects.exclude(scheduled_mask=0)
+    if user_id is not None:
+        archives = archives.filter(user_id=user_id)
+
+    summary = defaultdict(lambda: (0, 0))
+    for archive in archives.only("user_id", "month", "scheduled_mask", "taken_mask"):
+        for d, is_taken in archived_rows(archive):
+            scheduled, taken = summary[(archive.user_id, d)]
+            summary[(archive.user_id, d)] = (scheduled + 1, taken + is_taken)
+    return dict(summary)
+
+
+def last_taken_archived(medicine_ids):
+    """약별 보관된 마지막 복용일 → {medicine_id: date}"""
+    last = {}
+    archives = (
+        DoseArchive.objects.filter(medicine_id__in=medicine_ids, taken__gt=0)
+        .order_by("medicine_id", "-month")
+        .only("medicine_id", "month", "taken_mask")
+    )
+    for archive in archives:
+        # 복용 시각별 row 가 있으므로 가장 최근 달의 row 들 중 마지막 복용일
+        d = archive.month + timedelta(days=archive.taken_mask.bit_length() - 1)
+        if last.get(archive.medicine_id, d) <= d:
+            last[archive.medicine_id] = d
+    return last
@@ -0,0 +1,173 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .models import Medicine, DailyDose
+from .seeding import seed, SEED_USERNAME_PREFIX
+
+# "유저x약x일수" 형식 (예: 10x3x30)
+DEFAULT_SCALES = ["10x3x30", "50x5x90"]
+DEFAULT_REPEAT = 5
+
+
+def parse_scale(text):
+    try:
+        users, medicines, days = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"scale 형식 오류: {text} (예: 10x3x30)")
+    return users, medicines, days
+
+
+def measure(func, repeat):
+    """func 를 repeat 번 실행 → 소요 시간(ms) / 쿼리 수 통계"""
+    timings, queries = [], []
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func(i)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+
+    timings.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+        "queries": max(queries),
+    }
+
+
+def _check(response, expected=(200,)):
+    if response.status_code not in expected:
+        raise RuntimeError(f"{response.request['PATH_INFO']} → {response.status_code}")
+    return response
+
+
+def scenarios(client, user, today):
+    """벤치마크 이름 → func(i) (i 번째 반복)"""
+    medicine = Medicine.objects.filter(user=user).order_by("id").first()
+    # 반복마다 다른 dose 를 복용 처리 (이미 복용한 dose 면 측정 의미가 없음)
+    untaken = list(
+        DailyDose.objects.filter(user=user, is_taken=False).order_by("-date").values_list("id", flat=True)
+    )
+
+    def confirm(i):
+        if i < len(untaken):
+            _check(client.post("/medicine/arduino/confirm/", {"dose_id": untaken[i]}, content_type="application/json"))
+
+    def create(i):
+        _check(client.post("/medicine/", {
+            "name": f"벤치마크 {i}",
+            "type": "SUPPLEMENT",
+            "quantity": 1,
+            "start_date": today.isoformat(),
+            "end_date": (today + timedelta(days=29)).isoformat(),
+            "time": "AFTER_MEAL",
+            "alarm_time": "09:00",
+        }, content_type="application/json"), (201,))
+
+    def update(i):
+        end = medicine.end_date + timedelta(days=1 if i % 2 == 0 else -1)
+        medicine.end_date = end
+        _check(client.patch(
+            f"/medicine/{medicine.id}/", {"end_date": end.isoformat()}, content_type="application/json"
+        ))
+
+    return {
+        "medicine_logs": lambda i: _check(client.get("/medicine/logs/")),
+        "medicine_stats": lambda i: _check(client.get("/medicine/stats/")),
+        "daily_dose_list": lambda i: _check(client.get("/medicine/daily-dose/", {"page_size": 50})),
+        "daily_dose_list_date": lambda i: _check(client.get("/medicine/daily-dose/", {"date": today.isoformat()})),
+        "arduino_today_doses": lambda i: _check(client.get("/medicine/arduino/today-dose/")),
+        "arduino_confirm": confirm,
+        "medicine_create": create,
+        "medicine_update": update,
+        "nopill_task": lambda i: call_command("nopill_task", stdout=StringIO()),
+    }
+
+
+def run_scale(scale, repeat=DEFAULT_REPEAT, seed_value=0):
+    """scale 규모로 seed 후 각 시나리오 측정 (호출하는 쪽에서 빈 DB 를 준비)"""
+    users, medicines, days = parse_scale(scale)
+    today = timezone.localdate()
+
+    started = time.perf_counter()
+    counts = seed(users, medicines, days, today=today, rng=random.Random(seed_value))
+    seed_ms = (time.perf_counter() - started) * 1000
+
+    user = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).order_by("id").first()
+    client = Client()
+    client.force_login(user)
+
+    results = {}
+    with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+        for name, func in scenarios(client, user, today).items():
+            results[name] = measure(func, repeat)
+
+    return {"scale": scale, "rows": counts, "seed_ms": round(seed_ms, 3), "results": results}
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, reset=None):
+    """
+    scale 마다 reset() 으로 DB 를 비우고 측정
+    반환값은 JSON 으로 저장해서 실행 간 비교 (compare_results)
+    """
+    runs = []
+    for scale in scales:
+        if reset:
+            reset()
+        runs.append(run_scale(scale, repeat))
+
+    return {
+        "created_at": timezone.now().isoformat(),
+        "django": django.get_version(),
+        "python": platform.python_version(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "runs": runs,
+    }
+
+
+def compare_results(previous, current, threshold=0.2):
+    """
+    이전 결과 대비 느려진(median +threshold 이상) / 쿼리 수가 늘어난 항목
+    → [(scale, name, 항목, 이전, 현재)]
+    """
+    before = {
+        (run["scale"], name): stats
+        for run in previous["runs"] for name, stats in run["results"].items()
+    }
+    regressions = []
+    for run in current["runs"]:
+        for name, stats in run["results"].items():
+            old = before.get((run["scale"], name))
+            if old is None:
+                continue
+            if stats["queries"] > old["queries"]:
+                regressions.append((run["scale"], name, "queries", old["queries"], stats["queries"]))
+            if stats["median_ms"] > old["median_ms"] * (1 + threshold):
+                regressions.append((run["scale"], name, "median_ms", old["median_ms"], stats["median_ms"]))
+    return regressions
+
+
+def write_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,152 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .metrics import CACHE_REQUESTS
+from .pubsub import broker, schedule_channel
+
+# 날짜별 일정 버전 (해당 날짜 DailyDose 가 바뀌면 증가)
+DAY_VERSION_KEY = "pillmate:schedule:{scope}:day:{day}"
+# 월별 버전 (해당 월의 DailyDose 가 바뀌면 증가 — logs 캐시용)
+MONTH_VERSION_KEY = "pillmate:schedule:{scope}:month:{month}"
+# Medicine 변경 버전 (약 기간/시간이 바뀌면 모든 날짜 일정이 바뀔 수 있으므로 날짜 구분 없이 1개)
+MEDICINE_EPOCH_KEY = "pillmate:schedule:{scope}:medicine"
+# 집계 재생성처럼 전체 데이터를 한 번에 바꾸는 작업용 버전
+GLOBAL_EPOCH_KEY = "pillmate:schedule:epoch"
+
+# 조회 결과 캐시 — 관련 버전들이 key 에 들어가므로 데이터가 바뀌면 새 key 를 쓰고 이전 값은 TTL 로 사라진다
+LOGS_CACHE_KEY = "pillmate:logs:user{user_id}:{start}:{end}:{version}"
+DAY_DOSES_CACHE_KEY = "pillmate:doses:user{user_id}:{day}:{view}:{version}"
+# 통계는 "오늘" 기준 (연속 복용 등) 이므로 날짜가 바뀌면 새 key
+STATS_CACHE_KEY = "pillmate:stats:user{user_id}:{start}:{end}:{today}:{version}"
+# 프로세스 로컬 캐시 (locmem) 면 다른 워커의 버전 증가가 보이지 않으므로
+# 버전 / 조회 캐시를 짧게만 믿는다. (공유 캐시 설정은 settings.CACHES 참고)
+SHARED_CACHE = not settings.CACHES["default"]["BACKEND"].endswith("LocMemCache")
+LOCAL_CACHE_TTL = 60
+READ_CACHE_TTL = 60 * 60 * 24 if SHARED_CACHE else LOCAL_CACHE_TTL
+VERSION_TTL = None if SHARED_CACHE else LOCAL_CACHE_TTL
+
+# scope: 전체 일정("all") / 유저별 일정("user<id>")
+ALL_SCOPE = "all"
+
+
+def _scopes(user_id):
+    return [ALL_SCOPE, f"user{user_id}"]
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # 캐시가 비었을 때는 이전에 내려준 값과 겹치지 않도록 현재 시각으로 시작
+        cache.add(key, time.time_ns(), timeout=VERSION_TTL)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=VERSION_TTL)
+
+
+def _versions(keys):
+    """여러 버전을 한 번에 읽어서 짧은 문자열로 (캐시 왕복 1번, 빈 key 만 초기화)"""
+    found = cache.get_many(keys)
+    parts = [str(found[key]) if key in found else str(_get_version(key)) for key in keys]
+    return hashlib.md5("-".join(parts).encode()).hexdigest()
+
+
+def _months(start, end):
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _range_version(user_id, start, end):
+    """유저의 start ~ end 기간 데이터 버전 (전체 / 약 변경 / 월별 버전)"""
+    scope = f"user{user_id}"
+    keys = [GLOBAL_EPOCH_KEY, MEDICINE_EPOCH_KEY.format(scope=scope)]
+    keys += [MONTH_VERSION_KEY.format(scope=scope, month=month) for month in _months(start, end)]
+    return _versions(keys)
+
+
+def logs_cache_key(user_id, start, end):
+    return LOGS_CACHE_KEY.format(user_id=user_id, start=start, end=end, version=_range_version(user_id, start, end))
+
+
+def stats_cache_key(user_id, start, end, today):
+    return STATS_CACHE_KEY.format(
+        user_id=user_id, start=start, end=end, today=today, version=_range_version(user_id, start, end)
+    )
+
+
+def day_doses_cache_key(user_id, day, view="full"):
+    scope = f"user{user_id}"
+    keys = [
+        GLOBAL_EPOCH_KEY,
+        MEDICINE_EPOCH_KEY.format(scope=scope),
+        DAY_VERSION_KEY.format(scope=scope, day=day),
+    ]
+    return DAY_DOSES_CACHE_KEY.format(user_id=user_id, day=day, view=view, version=_versions(keys))
+
+
+def cached_read(name, key, compute):
+    """key 로 캐시된 값을 돌려주고, 없으면 compute() 결과를 저장 (name 별 hit/miss 기록)"""
+    value = cache.get(key)
+    if value is not None:
+        CACHE_REQUESTS.inc(name, "hit")
+        return value
+
+    CACHE_REQUESTS.inc(name, "miss")
+    value = compute()
+    cache.set(key, value, READ_CACHE_TTL)
+    return value
+
+
+def schedule_etag(day, user_id=None):
+    """해당 날짜 일정의 ETag (캐시만 읽고 DB 는 조회하지 않음) — user_id 가 있으면 그 유저 일정만"""
+    scope = ALL_SCOPE if user_id is None else f"user{user_id}"
+    epoch = _get_version(MEDICINE_EPOCH_KEY.format(scope=scope))
+    version = _get_version(DAY_VERSION_KEY.format(scope=scope, day=day))
+    return f'"{day.isoformat()}-{epoch}-{version}"'
+
+
+def touch_schedule_days(user_id, days):
+    """유저의 DailyDose 가 바뀐 날짜들의 버전 증가 + push (트랜잭션 커밋 후 반영)"""
+    days = set(days)
+
+    def bump():
+        for month in {day.strftime("%Y-%m") for day in days}:
+            _bump(MONTH_VERSION_KEY.format(scope=f"user{user_id}", month=month))
+        for day in days:
+            for scope in _scopes(user_id):
+                _bump(DAY_VERSION_KEY.format(scope=scope, day=day))
+            message = {"type": "schedule", "date": day.isoformat()}
+            broker.publish(schedule_channel(), message)
+            broker.publish(schedule_channel(user_id), message)
+
+    transaction.on_commit(bump)
+
+
+def touch_medicines(user_id):
+    """유저의 Medicine 이 바뀌면 그 유저의 전체 일정 버전 증가 + push (트랜잭션 커밋 후 반영)"""
+    def bump():
+        for scope in _scopes(user_id):
+            _bump(MEDICINE_EPOCH_KEY.format(scope=scope))
+        message = {"type": "schedule", "date": None}
+        broker.publish(schedule_channel(), message)
+        broker.publish(schedule_channel(user_id), message)
+
+    transaction.on_commit(bump)
+
+
+def touch_all():
+    """전체 데이터를 한 번에 바꾼 뒤 (집계 재생성 등) 모든 조회 캐시 무효화 (커밋 후)"""
+    transaction.on_commit(lambda: _bump(GLOBAL_EPOCH_KEY))
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .models import Device
+
+# 프로세스 로컬 LRU (다른 워커에서 바뀐 Device 는 TTL 이 지나면 반영)
+LOCAL_CACHE_SIZE = 1024
+LOCAL_CACHE_TTL = 30
+
+# Django 캐시 (워커 간 공유)
+DEVICE_CACHE_KEY = "pillmate:device:{device_id}"
+DEVICE_CACHE_TTL = 60 * 60
+# 등록되지 않은 기기도 잠깐 캐시해서 잘못된 기기의 반복 요청이 DB 로 가지 않게 함
+UNKNOWN_DEVICE = 0
+UNKNOWN_DEVICE_TTL = 60
+
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def _local_get(device_id):
+    with _lock:
+        entry = _local.get(device_id)
+        if entry is None:
+            return None
+        user_id, expires = entry
+        if expires < time.monotonic():
+            del _local[device_id]
+            return None
+        _local.move_to_end(device_id)
+        return user_id
+
+
+def _local_set(device_id, user_id):
+    with _lock:
+        _local[device_id] = (user_id, time.monotonic() + LOCAL_CACHE_TTL)
+        _local.move_to_end(device_id)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def resolve_device_user(device_id):
+    """device_id → user_id (등록되지 않은 기기면 None)"""
+    user_id = _local_get(device_id)
+
+    if user_id is None:
+        key = DEVICE_CACHE_KEY.format(device_id=device_id)
+        user_id = cache.get(key)
+        if user_id is None:
+            user_id = (
+                Device.objects.filter(device_id=device_id)
+                .values_list("user_id", flat=True)
+                .first()
+            ) or UNKNOWN_DEVICE
+            cache.set(key, user_id, UNKNOWN_DEVICE_TTL if user_id == UNKNOWN_DEVICE else DEVICE_CACHE_TTL)
+        _local_set(device_id, user_id)
+
+    return None if user_id == UNKNOWN_DEVICE else user_id
+
+
+def invalidate_device(device_id):
+    with _lock:
+        _local.pop(device_id, None)
+    cache.delete(DEVICE_CACHE_KEY.format(device_id=device_id))
+
+
+def clear_local_cache():
+    with _lock:
+        _local.clear()
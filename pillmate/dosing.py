@@ -0,0 +1,317 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Count, Q, Case, When, Value, DateTimeField
+from django.utils import timezone
+
+from .archive import archived_doses_for_date, archived_rows
+from .caching import touch_schedule_days
+from .models import Medicine, DailyDose, DailyAdherenceSummary, DoseArchive, DoseLog
+
+
+def date_range(start_date, end_date):
+    """start_date ~ end_date (양 끝 포함) 날짜 목록"""
+    delta = (end_date - start_date).days
+    return [start_date + timedelta(days=i) for i in range(delta + 1)]
+
+
+def bump_adherence_summary(user_id, deltas):
+    """
+    DailyAdherenceSummary 증분 갱신
+    deltas: {date: (scheduled 증감, taken 증감)}
+
+    같은 증감값을 가진 날짜끼리 묶어서 UPDATE 하므로
+    날짜가 많아도 쿼리 수는 증감 종류 수만큼만 나간다.
+    """
+    deltas = {d: v for d, v in deltas.items() if v != (0, 0)}
+    if not deltas:
+        return
+
+    # 집계 row 가 없는 날짜는 0 으로 먼저 만들어 둔다
+    DailyAdherenceSummary.objects.bulk_create(
+        [DailyAdherenceSummary(user_id=user_id, date=d) for d in deltas],
+        ignore_conflicts=True,
+    )
+
+    grouped = defaultdict(list)
+    for d, delta in deltas.items():
+        grouped[delta].append(d)
+
+    for (scheduled, taken), dates in grouped.items():
+        DailyAdherenceSummary.objects.filter(user_id=user_id, date__in=dates).update(
+            scheduled=F("scheduled") + scheduled,
+            taken=F("taken") + taken,
+        )
+
+
+def _count_deltas(rows, sign, deltas=None):
+    """(date, is_taken) 목록 → 집계 증감분 (sign=+1 추가 / -1 삭제)"""
+    deltas = {} if deltas is None else deltas
+    for d, is_taken in rows:
+        scheduled, taken = deltas.get(d, (0, 0))
+        deltas[d] = (scheduled + sign, taken + (sign if is_taken else 0))
+    return deltas
+
+
+def sync_daily_doses(medicine, created=False):
+    """
+    Medicine 복용 규칙에 맞춰 DailyDose 를 한 번에 맞춰준다.
+
+    날짜 하나당 쿼리를 날리지 않고, 규칙을 전개한 (날짜, 복용 시각) 집합과 기존 row 의 차이만 계산해서
+    - 규칙에서 빠진 row 는 DELETE 1번
+    - 수량이 바뀐 row 는 UPDATE 1번
+    - 빠진 (날짜, 복용 시각) 은 bulk_create 1번
+    으로 처리한다. (날짜마다 쿼리를 날리지 않음 — INSERT 만 DB 변수 한도 때문에 batch 로 나뉘어서
+    SQLite 에서는 DailyDose 142 row / 집계 249 row 마다 1번씩 늘어난다: 365일 9번, 3년 17번)
+    생성/삭제된 날짜만큼 DailyAdherenceSummary 도 같이 갱신한다.
+
+    VIRTUAL 모드 약은 미리 생성하지 않고, 복용한 row 만 남긴다.
+    DoseArchive 로 보관된 기간 (archived_until 까지) 은 다시 만들지 않는다.
+    """
+    start, end = medicine.start_date, medicine.end_date
+    rule = medicine.rule
+    first = start
+    if medicine.archived_until and medicine.archived_until >= start:
+        first = medicine.archived_until + timedelta(days=1)
+    wanted = set(rule.doses(first, end))
+
+    with transaction.atomic(savepoint=False):
+        if created:
+            # 새로 만든 약이면 기존 row 가 없으므로 바로 생성
+            existing = set()
+            removed = []
+        else:
+            doses = DailyDose.objects.filter(medicine=medicine)
+            rows = list(doses.values_list("pk", "date", "slot_time", "is_taken", "user_id"))
+
+            # 약 주인이 바뀐 경우에만 복사해 둔 user 를 맞춰주고, 집계도 이전 주인에게서 새 주인으로 옮김
+            moved = defaultdict(list)   # 이전 주인 → [(date, is_taken)]
+            for _, d, _, is_taken, owner_id in rows:
+                if owner_id != medicine.user_id:
+                    moved[owner_id].append((d, is_taken))
+            if moved:
+                doses.update(user_id=medicine.user_id)
+            if medicine.archived_until:
+                archives = list(DoseArchive.objects.filter(medicine=medicine).exclude(user_id=medicine.user_id))
+                for archive in archives:
+                    moved[archive.user_id] += archived_rows(archive)
+                if archives:
+                    DoseArchive.objects.filter(pk__in=[a.pk for a in archives]).update(user_id=medicine.user_id)
+            for owner_id, owner_rows in moved.items():
+                bump_adherence_summary(owner_id, _count_deltas(owner_rows, -1))
+                bump_adherence_summary(medicine.user_id, _count_deltas(owner_rows, +1))
+
+            def keep(d, slot, is_taken):
+                return (d, slot) in wanted and (is_taken or not medicine.is_virtual)
+
+            existing = {(d, slot) for _, d, slot, is_taken, _ in rows if keep(d, slot, is_taken)}
+            stale = [(pk, d, is_taken) for pk, d, slot, is_taken, _ in rows if not keep(d, slot, is_taken)]
+            removed = [(d, is_taken) for _, d, is_taken in stale]
+
+            # 1) 규칙에서 빠진 (기간 / 요일 / 복용 시각) row (VIRTUAL 이면 복용 안 한 row 도) 삭제
+            if stale:
+                doses.filter(pk__in=[pk for pk, _, _ in stale]).delete()
+
+            # 2) 남은 row 수량 갱신 (바뀐 것만)
+            if existing:
+                doses.exclude(quantity=medicine.quantity).update(quantity=medicine.quantity)
+
+        # 3) 없는 (날짜, 복용 시각) 만 생성 (VIRTUAL 은 복용 시점에 materialize_dose 로 생성)
+        added = []
+        if not medicine.is_virtual:
+            added = sorted(wanted - existing)
+            DailyDose.objects.bulk_create(
+                [DailyDose(medicine=medicine, user_id=medicine.user_id, date=d, slot_time=slot,
+                           quantity=medicine.quantity)
+                 for d, slot in added],
+                ignore_conflicts=True,
+            )
+
+        deltas = _count_deltas(removed, -1)
+        _count_deltas([(d, False) for d, _ in added], +1, deltas)
+        bump_adherence_summary(medicine.user_id, deltas)
+
+
+def materialize_dose(medicine, day, slot_time=None):
+    """
+    (medicine, day, slot_time) 의 DailyDose row 를 가져오거나 새로 만든다.
+    VIRTUAL 약을 복용/수정할 때 사용 — 복용일이 아니거나 보관된 날짜면 ValueError
+    slot_time 이 없으면 그날 아직 복용하지 않은 첫 복용 시각
+    """
+    if not medicine.start_date <= day <= medicine.end_date:
+        raise ValueError("복용 기간이 아닌 날짜입니다.")
+    rule = medicine.rule
+    if not rule.occurs(day):
+        raise ValueError("복용하는 요일/간격이 아닌 날짜입니다.")
+    if medicine.archived_until and day <= medicine.archived_until:
+        raise ValueError("보관된 기간의 날짜는 수정할 수 없습니다.")
+
+    if slot_time is None:
+        slot_time = rule.slots[0]
+        if len(rule.slots) > 1:
+            taken = set(
+                DailyDose.objects.filter(medicine=medicine, date=day, is_taken=True)
+                .values_list("slot_time", flat=True)
+            )
+            slot_time = next((slot for slot in rule.slots if slot not in taken), rule.slots[-1])
+    elif slot_time not in rule.slots:
+        raise ValueError("복용 시각이 아닙니다.")
+
+    with transaction.atomic():
+        dose, created = DailyDose.objects.get_or_create(
+            medicine=medicine,
+            date=day,
+            slot_time=slot_time,
+            defaults={"user_id": medicine.user_id, "quantity": medicine.quantity},
+        )
+        if created:
+            # 일정 버전은 DailyDose post_save 수신기가 올려줌
+            bump_adherence_summary(medicine.user_id, {day: (1, 0)})
+    return dose
+
+
+def pending_virtual_doses(day, user_id=None, exclude_medicines=()):
+    """
+    해당 날짜에 복용 예정이지만 아직 row 가 없는 VIRTUAL 약의 가상 dose(pk=None) 목록
+    약 조회 1번에 그날 row 수를 붙여 읽고, 복용 시각 일부만 row 가 있는 약이 있을 때만 row 조회 1번 더
+    """
+    virtual = Medicine.objects.filter(schedule_mode="VIRTUAL", start_date__lte=day, end_date__gte=day)
+    if user_id is not None:
+        virtual = virtual.filter(user_id=user_id)
+    if exclude_medicines:
+        virtual = virtual.exclude(id__in=exclude_medicines)
+    virtual = virtual.annotate(stored=Count("daily_doses", filter=Q(daily_doses__date=day)))
+    medicines = [
+        med for med in virtual.order_by("id")
+        if med.stored < len(med.rule.slots) and med.rule.occurs(day)
+    ]
+    if not medicines:
+        return []
+
+    partial = [med.id for med in medicines if med.stored]
+    stored = set(
+        DailyDose.objects.filter(medicine_id__in=partial, date=day).values_list("medicine_id", "slot_time")
+    ) if partial else set()
+    return [
+        DailyDose(medicine=med, user_id=med.user_id, date=day, slot_time=slot, quantity=med.quantity)
+        for med in medicines
+        for slot in med.rule.slots
+        if (med.id, slot) not in stored
+    ]
+
+
+def stored_doses_for_date(day, user_id=None):
+    """해당 날짜에 저장된 DailyDose (date / (user, date) 인덱스로 조회)"""
+    doses = DailyDose.objects.filter(date=day).select_related("medicine")
+    if user_id is not None:
+        doses = doses.filter(user_id=user_id)
+    return doses
+
+
+def doses_for_date(day, user_id=None):
+    """
+    해당 날짜의 DailyDose 목록 (medicine 포함)
+    저장된 row + 보관된 dose(pk=None) + 아직 row 가 없는 VIRTUAL 약의 가상 dose(pk=None) 를 합쳐서 반환
+    """
+    archived = archived_doses_for_date(day, user_id)
+    result = list(stored_doses_for_date(day, user_id)) + archived
+    result += pending_virtual_doses(day, user_id, {d.medicine_id for d in archived})
+    return result
+
+
+def release_daily_doses(medicine):
+    """Medicine 삭제 직전에 호출 — 지워질 DailyDose (+ 보관 row) 만큼 집계를 빼준다."""
+    rows = list(DailyDose.objects.filter(medicine=medicine).values_list("date", "is_taken"))
+    if medicine.archived_until:
+        for archive in medicine.archives.all():
+            rows += archived_rows(archive)
+    bump_adherence_summary(medicine.user_id, _count_deltas(rows, -1))
+
+
+def mark_dose_taken(dose, taken_at=None):
+    """
+    DailyDose 복용 완료 처리
+    아직 복용 전인 경우에만 갱신하고 집계 taken 을 1 올린다.
+    (이미 복용한 dose 면 False 반환)
+    """
+    taken_at = taken_at or timezone.now()
+
+    with transaction.atomic():
+        updated = DailyDose.objects.filter(pk=dose.pk, is_taken=False).update(
+            is_taken=True, taken_at=taken_at
+        )
+        if updated:
+            bump_adherence_summary(dose.medicine.user_id, {dose.date: (0, 1)})
+            touch_schedule_days(dose.medicine.user_id, [dose.date])
+            dose.is_taken = True
+            dose.taken_at = taken_at
+
+    return bool(updated)
+
+
+def mark_doses_taken(events, source="ARDUINO", user_id=None):
+    """
+    여러 DailyDose 를 한 번에 복용 처리 (오프라인 기기 backlog 재전송 등)
+    events: [(dose_id, taken_at)] → 이벤트 순서대로 "taken" | "already_taken" | "not_found"
+
+    조회 1번 + DailyDose UPDATE 1번 + DoseLog bulk_create 1번을 한 트랜잭션에서 처리한다.
+    이미 복용한 dose 는 다시 기록하지 않으므로 같은 backlog 를 재전송해도 안전하다.
+    user_id 가 있으면 그 유저의 dose 만 처리한다. (다른 유저 dose 는 not_found)
+    """
+    results = []
+    newly_taken = {}
+
+    with transaction.atomic():
+        doses = DailyDose.objects.select_related("medicine")
+        if user_id is not None:
+            doses = doses.filter(user_id=user_id)
+        doses = doses.in_bulk({dose_id for dose_id, _ in events})
+
+        for dose_id, taken_at in events:
+            dose = doses.get(dose_id)
+            if dose is None:
+                results.append("not_found")
+            elif dose.is_taken or dose_id in newly_taken:
+                results.append("already_taken")
+            else:
+                dose.taken_at = taken_at
+                newly_taken[dose_id] = dose
+                results.append("taken")
+
+        if newly_taken:
+            DailyDose.objects.filter(pk__in=newly_taken, is_taken=False).update(
+                is_taken=True,
+                taken_at=Case(
+                    *[When(pk=pk, then=Value(dose.taken_at)) for pk, dose in newly_taken.items()],
+                    output_field=DateTimeField(),
+                ),
+            )
+            DoseLog.objects.bulk_create([
+                DoseLog(medicine=dose.medicine, taken_at=dose.taken_at, source=source)
+                for dose in newly_taken.values()
+            ])
+
+            # 유저별/날짜별로 모아서 집계 반영
+            deltas = defaultdict(Counter)
+            for dose in newly_taken.values():
+                dose.is_taken = True
+                deltas[dose.medicine.user_id][dose.date] += 1
+            for owner_id, per_date in deltas.items():
+                bump_adherence_summary(owner_id, {d: (0, n) for d, n in per_date.items()})
+                touch_schedule_days(owner_id, per_date)
+
+    return results
+
+
+def apply_dose_change(user_id, before, after):
+    """
+    DailyDose 를 직접 수정/삭제한 경우 집계 반영
+    before/after: 변경 전후 (date, is_taken) — 삭제면 after=None
+    """
+    deltas = _count_deltas([before] if before else [], -1)
+    _count_deltas([after] if after else [], +1, deltas)
+    bump_adherence_summary(user_id, deltas)
+    # 저장된 row 의 날짜는 DailyDose post_save 수신기가 처리 — 삭제/날짜 변경으로 빠진 날짜만
+    if before and (after is None or after[0] != before[0]):
+        touch_schedule_days(user_id, [before[0]])
@@ -0,0 +1,106 @@
+import csv
+import json
+
+from django.utils import timezone
+
+from .archive import archived_rows
+from .models import DailyDose, DoseArchive, DoseLog
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+# record: dose (DailyDose / 보관된 dose) | log (DoseLog)
+EXPORT_FIELDS = (
+    "record", "date", "slot_time", "medicine_id", "medicine", "quantity", "is_taken", "taken_at", "source", "archived",
+)
+
+
+def _date_filter(queryset, field, start, end):
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lte": end})
+    return queryset
+
+
+def export_rows(user_id, start=None, end=None, medicine_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    유저의 복용 기록 전체를 dict 로 하나씩 (메모리에는 chunk_size 만큼만)
+    보관된 dose (DoseArchive) → DailyDose → DoseLog 순서, 각각 날짜순
+    보관된 달의 DoseLog 는 개수만 남아 있으므로 내보내지 않는다.
+    """
+    archives = DoseArchive.objects.filter(user_id=user_id)
+    doses = _date_filter(DailyDose.objects.filter(user_id=user_id), "date", start, end)
+    logs = DoseLog.objects.filter(medicine__user_id=user_id)
+    if start:
+        archives = archives.filter(month__gte=start.replace(day=1))
+        logs = logs.filter(taken_at__date__gte=start)
+    if end:
+        archives = archives.filter(month__lte=end)
+        logs = logs.filter(taken_at__date__lte=end)
+    if medicine_id is not None:
+        archives = archives.filter(medicine_id=medicine_id)
+        doses = doses.filter(medicine_id=medicine_id)
+        logs = logs.filter(medicine_id=medicine_id)
+
+    archived = archives.order_by("month", "medicine_id", "slot_time").values_list(
+        "medicine_id", "medicine__name", "medicine__quantity", "month", "slot_time", "scheduled_mask", "taken_mask"
+    )
+    for med_id, name, quantity, month, slot_time, scheduled_mask, taken_mask in archived.iterator(chunk_size=chunk_size):
+        archive = DoseArchive(month=month, scheduled_mask=scheduled_mask, taken_mask=taken_mask)
+        for d, is_taken in archived_rows(archive):
+            if (start and d < start) or (end and d > end):
+                continue
+            yield {
+                "record": "dose", "date": d.isoformat(), "slot_time": slot_time.strftime("%H:%M"),
+                "medicine_id": med_id, "medicine": name, "quantity": quantity, "is_taken": is_taken,
+                "taken_at": None, "source": None, "archived": True,
+            }
+
+    rows = doses.order_by("date", "slot_time", "id").values_list(
+        "date", "slot_time", "medicine_id", "medicine__name", "quantity", "is_taken", "taken_at"
+    )
+    for d, slot_time, med_id, name, quantity, is_taken, taken_at in rows.iterator(chunk_size=chunk_size):
+        yield {
+            "record": "dose", "date": d.isoformat(), "slot_time": slot_time.strftime("%H:%M"),
+            "medicine_id": med_id, "medicine": name,
+            "quantity": quantity, "is_taken": is_taken,
+            "taken_at": timezone.localtime(taken_at).isoformat() if taken_at else None,
+            "source": None, "archived": False,
+        }
+
+    rows = logs.order_by("taken_at", "id").values_list("medicine_id", "medicine__name", "taken_at", "source")
+    for med_id, name, taken_at, source in rows.iterator(chunk_size=chunk_size):
+        local = timezone.localtime(taken_at)
+        yield {
+            "record": "log", "date": local.date().isoformat(), "slot_time": None,
+            "medicine_id": med_id, "medicine": name,
+            "quantity": None, "is_taken": True, "taken_at": local.isoformat(), "source": source, "archived": False,
+        }
+
+
+class _Echo:
+    """csv.writer 가 쓴 한 줄을 그대로 돌려주는 가짜 파일 (Django 문서의 streaming CSV 방식)"""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(["" if row[f] is None else row[f] for f in EXPORT_FIELDS])
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def render_export(output, rows):
+    """output: csv | ndjson → 문자열 조각 generator"""
+    return render_csv(rows) if output == "csv" else render_ndjson(rows)
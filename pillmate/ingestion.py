@@ -0,0 +1,215 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .dosing import mark_doses_taken, materialize_dose
+from .metrics import LOG_EVENTS
+from .models import Medicine, DailyDose, MedicineLog
+
+# 한 번에 INSERT 할 이벤트 수 (요청 body 는 줄 단위로 읽으므로 메모리에는 이만큼만 올라감)
+INGEST_CHUNK_SIZE = 500
+# 응답에 돌려줄 잘못된 줄 최대 개수
+INVALID_SAMPLE_LIMIT = 20
+
+RECONCILE_BATCH_SIZE = 1000
+# 맞는 DailyDose 가 없는 로그는 이 기간 동안 다음 실행에서 다시 맞춰본다 (약 등록이 늦는 경우)
+RECONCILE_RETRY = timedelta(days=1)
+
+
+def parse_event(line):
+    """
+    NDJSON 한 줄 → (medicine, taken, timestamp)
+    {"medicine": "비타민", "taken": true, "timestamp": "2025-11-18T09:03:00+09:00"}
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise ValueError("JSON 형식이 올바르지 않습니다.")
+    if not isinstance(data, dict):
+        raise ValueError("이벤트는 JSON 객체여야 합니다.")
+
+    medicine = data.get("medicine")
+    if not isinstance(medicine, str) or not medicine.strip():
+        raise ValueError("medicine 이 필요합니다.")
+    medicine = medicine.strip()
+    if len(medicine) > MedicineLog._meta.get_field("medicine").max_length:
+        raise ValueError("medicine 이 너무 깁니다.")
+
+    taken = data.get("taken", True)
+    if not isinstance(taken, bool):
+        raise ValueError("taken 은 true/false 여야 합니다.")
+
+    try:
+        timestamp = parse_datetime(data.get("timestamp") or "")
+    except (TypeError, ValueError):
+        timestamp = None
+    if timestamp is None:
+        raise ValueError("timestamp 형식은 ISO 8601 입니다.")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    return medicine, taken, timestamp
+
+
+def ingest_events(device_pk, lines, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    기기 이벤트(NDJSON 줄)를 MedicineLog 에 chunk 단위 bulk_create 로 저장
+    (device, timestamp, medicine) 이 같은 이벤트는 유니크 제약으로 한 번만 저장된다. (재전송 안전)
+    DailyDose 는 건드리지 않음 — 반영은 reconcile_logs 가 따로 한다.
+    반환값: {"accepted": 저장 시도한 이벤트 수, "invalid": 잘못된 줄 수, "errors": [{"line", "error"}]}
+    """
+    now = timezone.now()
+    chunk = []
+    accepted = invalid = 0
+    errors = []
+
+    def flush():
+        MedicineLog.objects.bulk_create(chunk, ignore_conflicts=True)
+        chunk.clear()
+
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            continue
+
+        try:
+            medicine, taken, timestamp = parse_event(line)
+        except ValueError as e:
+            invalid += 1
+            if len(errors) < INVALID_SAMPLE_LIMIT:
+                errors.append({"line": number, "error": str(e)})
+            continue
+
+        # 기기 시각은 그대로 저장 (재전송 중복 제거 key) — 미래 시각 보정은 반영할 때 taken_at 으로
+        chunk.append(MedicineLog(
+            device_id=device_pk, medicine=medicine, taken=taken, timestamp=timestamp, received_at=now,
+        ))
+        accepted += 1
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    LOG_EVENTS.inc("accepted", amount=accepted)
+    LOG_EVENTS.inc("invalid", amount=invalid)
+    return {"accepted": accepted, "invalid": invalid, "errors": errors}
+
+
+def _slot_distance(log, dose):
+    """로그 시각과 dose 복용 시각의 차이 (초)"""
+    slot = timezone.make_aware(datetime.combine(dose.date, dose.slot_time))
+    return abs((log.taken_at - slot).total_seconds())
+
+
+def _match_doses(logs):
+    """
+    로그 묶음 → ({log_id: DailyDose}, 반영할 수 없는 로그 id 집합)
+    (유저, 날짜, 약 이름) 으로 Medicine 을 찾고, 그 날짜의 DailyDose 를 한 번에 조회한다.
+    같은 이름의 약이 여러 개이거나 하루 여러 번 복용하는 약이면
+    아직 복용하지 않은 dose 중 복용 시각이 로그 시각에 가장 가까운 것을 고른다.
+    VIRTUAL 약은 row 가 없으면 로그 시각에 가장 가까운 남은 복용 시각으로 여기서 만든다.
+    맞는 약이 모두 그 날짜까지 DoseArchive 로 보관된 로그는 다시 시도해도 맞출 dose 가 없으므로 closed 로 돌려준다.
+    """
+    days = [timezone.localdate(log.taken_at) for log in logs]
+    user_ids = {log.device.user_id for log in logs}
+    names = {log.medicine for log in logs}
+
+    candidates = defaultdict(list)   # (user_id, name) → [Medicine]
+    for med in Medicine.objects.filter(
+        user_id__in=user_ids, name__in=names, start_date__lte=max(days), end_date__gte=min(days)
+    ).order_by("id"):
+        candidates[(med.user_id, med.name)].append(med)
+
+    medicine_ids = [med.id for meds in candidates.values() for med in meds]
+    doses = defaultdict(list)   # (medicine_id, date) → [DailyDose]
+    for dose in DailyDose.objects.filter(medicine_id__in=medicine_ids, date__in=set(days)).select_related("medicine"):
+        doses[(dose.medicine_id, dose.date)].append(dose)
+
+    matched = {}
+    closed = set()
+    claimed = set()   # 이 묶음에서 이미 다른 로그에 맞춘 dose id (복용 처리는 묶음 끝에 한 번에 함)
+    for log, day in zip(logs, days):
+        meds = [
+            med for med in candidates.get((log.device.user_id, log.medicine), ())
+            if med.start_date <= day <= med.end_date
+        ]
+        if meds and all(med.archived_until and day <= med.archived_until for med in meds):
+            closed.add(log.id)
+            continue
+        found = [dose for med in meds for dose in doses.get((med.id, day), ())]
+        open_doses = [d for d in found if not d.is_taken and d.id not in claimed]
+        dose = min(open_doses, key=lambda d: _slot_distance(log, d), default=None)
+
+        if dose is None:
+            for med in meds:
+                if not med.is_virtual or not med.rule.occurs(day):
+                    continue
+                if med.archived_until and day <= med.archived_until:
+                    continue   # 보관된 날짜는 materialize_dose 가 거부함
+                stored = {d.slot_time for d in doses.get((med.id, day), ())}
+                slots = [slot for slot in med.rule.slots if slot not in stored]
+                if slots:
+                    slot = min(slots, key=lambda t: _slot_distance(log, DailyDose(date=day, slot_time=t)))
+                    dose = materialize_dose(med, day, slot)
+                    doses[(med.id, day)].append(dose)
+                    break
+        if dose is None:
+            # 남은 dose 가 없으면 이미 복용한 dose 에 맞춘다 (중복 로그 — 반영할 것 없이 reconciled)
+            dose = found[0] if found else None
+        if dose is None:
+            continue
+        claimed.add(dose.id)
+        matched[log.id] = dose
+    return matched, closed
+
+
+def reconcile_logs(batch_size=RECONCILE_BATCH_SIZE, now=None):
+    """
+    아직 반영하지 않은 MedicineLog 를 id 순으로 batch_size 개씩 DailyDose 에 반영
+    - taken=true 로그 → (유저, 날짜, 약 이름) 이 맞는 DailyDose 를 mark_doses_taken 으로 복용 처리
+    - taken=false 로그 / 이미 복용한 dose → 반영할 것 없이 reconciled
+    - 맞는 dose 가 없는 로그 → RECONCILE_RETRY 가 지날 때까지 다음 실행에서 다시 시도
+    - 보관된 날짜의 로그 → 맞출 dose 가 다시 생기지 않으므로 바로 reconciled
+    batch 하나가 한 트랜잭션이다.
+    반환값: {"reconciled": reconciled 로 바꾼 로그 수, "taken": 새로 복용 처리된 dose 수, "unmatched": 보류한 로그 수}
+    """
+    now = now or timezone.now()
+    totals = {"reconciled": 0, "taken": 0, "unmatched": 0}
+    last_id = 0
+
+    while True:
+        logs = list(
+            MedicineLog.objects.filter(reconciled=False, id__gt=last_id)
+            .select_related("device")
+            .order_by("id")[:batch_size]
+        )
+        if not logs:
+            break
+        last_id = logs[-1].id
+
+        with transaction.atomic():
+            taken_logs = [log for log in logs if log.taken]
+            matched, closed = _match_doses(taken_logs) if taken_logs else ({}, set())
+
+            events = [(matched[log.id].id, log.taken_at) for log in taken_logs if log.id in matched]
+            statuses = mark_doses_taken(events) if events else []
+
+            done = [
+                log.id for log in logs
+                if not log.taken or log.id in matched or log.id in closed
+                or log.taken_at < now - RECONCILE_RETRY
+            ]
+            MedicineLog.objects.filter(id__in=done).update(reconciled=True)
+
+        totals["reconciled"] += len(done)
+        totals["taken"] += statuses.count("taken")
+        totals["unmatched"] += len(logs) - len(done)
+
+    LOG_EVENTS.inc("reconciled", amount=totals["reconciled"])
+    return totals
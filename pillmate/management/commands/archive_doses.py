@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pillmate.archive import archive_doses, ARCHIVE_KEEP_MONTHS, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Compact finished months of DailyDose and DoseLog rows into per-medicine monthly DoseArchive rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, default=ARCHIVE_KEEP_MONTHS,
+            help="이번 달 포함 원본 테이블에 남길 달 수",
+        )
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="트랜잭션당 약 수")
+
+    def handle(self, *args, **options):
+        if options["keep_months"] < 1:
+            raise CommandError("--keep-months 는 1 이상이어야 합니다.")
+
+        result = archive_doses(options["keep_months"], options["batch_size"])
+        self.stdout.write(
+            "[ARCHIVE] 약 {medicines}개 / 보관 row {archives}개 / DailyDose {doses}건 / DoseLog {logs}건 이동".format(**result)
+        )
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from pillmate.stress import run_async_comparison
+
+
+class Command(BaseCommand):
+    help = "Compare sync (thread pool) and async (event loop) throughput of the Arduino endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="모드별 요청 수")
+        parser.add_argument("--workers", type=int, default=4, help="sync 모드 워커 스레드 수")
+        parser.add_argument("--concurrency", type=int, default=50, help="async 모드 동시 요청 수")
+        parser.add_argument("--client-delay", type=float, default=50, help="요청마다 느린 기기 연결이 붙잡는 시간 (ms)")
+        parser.add_argument("--output", help="결과 JSON 경로")
+
+    def handle(self, *args, **options):
+        results = run_async_comparison(
+            requests=options["requests"],
+            workers=options["workers"],
+            concurrency=options["concurrency"],
+            client_delay=options["client_delay"] / 1000,
+        )
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"[{mode:>5}] {stats['throughput_rps']} req/s  p50 {stats['p50_ms']}ms  "
+                f"p95 {stats['p95_ms']}ms  오류 {stats['errors']}/{stats['requests']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"결과 저장: {options['output']}")
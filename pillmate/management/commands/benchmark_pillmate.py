@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pillmate.benchmarks import (
+    DEFAULT_REPEAT, DEFAULT_SCALES, compare_results, load_results, parse_scale, run_benchmarks, write_results,
+)
+from pillmate.devices import clear_local_cache
+
+
+class Command(BaseCommand):
+    help = "Time and count queries for the main endpoints on seeded data and write the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            action="append",
+            dest="scales",
+            help="유저x약x일수 (예: 10x3x30) — 여러 번 지정 가능",
+        )
+        parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="시나리오별 반복 횟수")
+        parser.add_argument("--output", default="benchmark.json", help="결과 JSON 경로")
+        parser.add_argument("--compare", help="비교할 이전 결과 JSON (느려지면 CommandError)")
+        parser.add_argument("--threshold", type=float, default=0.2, help="median 허용 증가율")
+
+    def handle(self, *args, **options):
+        scales = options["scales"] or DEFAULT_SCALES
+        for scale in scales:
+            try:
+                parse_scale(scale)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        def reset():
+            call_command("flush", interactive=False, verbosity=0)
+            cache.clear()
+            clear_local_cache()
+
+        # 운영 DB 를 건드리지 않도록 테스트 DB 를 만들어서 측정
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = run_benchmarks(scales, options["repeat"], reset=reset)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for run in results["runs"]:
+            self.stdout.write(f"=== {run['scale']} (seed {run['seed_ms']:.0f}ms) ===")
+            for name, stats in run["results"].items():
+                self.stdout.write(
+                    f"{name:<24} median {stats['median_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                    f"queries {stats['queries']}"
+                )
+
+        write_results(results, options["output"])
+        self.stdout.write(f"결과 저장: {options['output']}")
+
+        if options["compare"]:
+            regressions = compare_results(load_results(options["compare"]), results, options["threshold"])
+            for scale, name, metric, before, after in regressions:
+                self.stdout.write(f"[REGRESSION] {scale} {name} {metric}: {before} → {after}")
+            if regressions:
+                raise CommandError(f"성능 저하 {len(regressions)}건")
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pillmate.services import drain_outbox, OUTBOX_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Deliver pending emails from the outbox over a reused SMTP connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="계속 실행하면서 주기적으로 발송")
+        parser.add_argument("--interval", type=float, default=10, help="--loop 대기 간격(초)")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options["batch_size"])
+            if sent or failed or not options["loop"]:
+                self.stdout.write(f"[OUTBOX] 발송 {sent}건 / 실패 {failed}건")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from pillmate.export import export_rows, render_export, EXPORT_FORMATS
+
+
+def _date(value, name):
+    try:
+        parsed = parse_date(value) if value else None
+    except ValueError:
+        parsed = None
+    if value and not parsed:
+        raise CommandError(f"--{name} 형식은 YYYY-MM-DD 입니다.")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Stream a user's DailyDose and DoseLog history (including archived months) as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, required=True)
+        parser.add_argument("--output", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--start", help="YYYY-MM-DD")
+        parser.add_argument("--end", help="YYYY-MM-DD")
+        parser.add_argument("--medicine", type=int, help="특정 약만")
+        parser.add_argument("--file", help="저장 경로 (없으면 stdout)")
+
+    def handle(self, *args, **options):
+        rows = export_rows(
+            options["user"],
+            _date(options["start"], "start"),
+            _date(options["end"], "end"),
+            options["medicine"],
+        )
+        chunks = render_export(options["output"], rows)
+
+        if options["file"]:
+            with open(options["file"], "w", encoding="utf-8", newline="") as f:
+                f.writelines(chunks)
+            self.stderr.write(f"내보내기 완료: {options['file']}")
+            return
+
+        for chunk in chunks:
+            self.stdout.write(chunk, ending="")
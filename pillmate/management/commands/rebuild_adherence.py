@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pillmate.adherence import rebuild_summary, verify_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the DailyAdherenceSummary rollup from DailyDose rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="특정 유저만 처리")
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="다시 만들지 않고 집계가 원본과 일치하는지만 확인",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options["user"]
+
+        if options["verify"]:
+            mismatches = verify_summary(user_id)
+            for (uid, d), stored, expected in mismatches:
+                self.stdout.write(
+                    f"[MISMATCH] user={uid} date={d} 저장={stored} 실제={expected}"
+                )
+            if mismatches:
+                raise CommandError(f"집계 불일치 {len(mismatches)}건")
+            self.stdout.write("집계 일치 ✅")
+            return
+
+        count = rebuild_summary(user_id)
+        self.stdout.write(f"집계 재생성 완료: {count} rows")
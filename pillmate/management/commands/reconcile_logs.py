@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pillmate.ingestion import reconcile_logs, RECONCILE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Match ingested device MedicineLog events to DailyDose rows and mark them taken"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="계속 실행하면서 주기적으로 반영")
+        parser.add_argument("--interval", type=float, default=30, help="--loop 대기 간격(초)")
+
+    def handle(self, *args, **options):
+        while True:
+            result = reconcile_logs(options["batch_size"])
+            if result["reconciled"] or result["unmatched"] or not options["loop"]:
+                self.stdout.write(
+                    f"[RECONCILE] 반영 {result['reconciled']}건 / 복용 처리 {result['taken']}건 / "
+                    f"보류 {result['unmatched']}건"
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
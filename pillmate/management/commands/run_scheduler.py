@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from pillmate.scheduler import AlarmScheduler, ALARM, GRACE
+from pillmate.services import check_missed_doses, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Run the alarm scheduler: sleep until the next alarm/grace deadline and check missed doses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh-interval",
+            type=float,
+            default=30,
+            help="약 변경 사항을 다시 확인하는 최대 간격(초)",
+        )
+        parser.add_argument("--max-iterations", type=int, help="테스트용: 지정한 횟수만 돌고 종료")
+        parser.add_argument("--enqueue-only", action="store_true", help="알림을 outbox 에 적재만 함")
+
+    def handle(self, *args, **options):
+        scheduler = AlarmScheduler()
+        scheduler.load()
+        self.stdout.write(f"[SCHEDULER] 이벤트 {len(scheduler)}개 로드")
+
+        iterations = 0
+        while options["max_iterations"] is None or iterations < options["max_iterations"]:
+            iterations += 1
+            now = timezone.now()
+
+            # 오래 떠 있는 프로세스 — 끊긴 / 오래된 DB 연결을 정리하고, 한 번 실패해도 다음 tick 에서 계속
+            close_old_connections()
+            try:
+                changed = scheduler.refresh(now)
+                if changed:
+                    self.stdout.write(f"[SCHEDULER] 약 {changed}개 변경 반영")
+
+                self.process(scheduler.pop_due(now), now, options)
+            except Exception as e:
+                self.stderr.write(f"[SCHEDULER] 처리 실패: {e!r}")
+            finally:
+                close_old_connections()
+
+            # 다음 이벤트까지 (최대 refresh-interval) 대기
+            next_due = scheduler.next_due()
+            wait = options["refresh_interval"]
+            if next_due is not None:
+                wait = min(wait, max((next_due - timezone.now()).total_seconds(), 0))
+            if options["max_iterations"] is None or iterations < options["max_iterations"]:
+                time.sleep(wait)
+
+    def process(self, events, now, options):
+        grace_ids = set()
+        for due, kind, medicine_id, day in events:
+            if kind == ALARM:
+                self.stdout.write(f"[ALARM] medicine={medicine_id} {day} {timezone.localtime(due):%H:%M}")
+            elif kind == GRACE:
+                grace_ids.add(medicine_id)
+
+        if grace_ids:
+            # 같은 시각에 유예시간이 끝난 약들은 한 번에 확인
+            check_missed_doses(now, log=self.stdout.write, medicine_ids=grace_ids)
+            if not options["enqueue_only"]:
+                drain_outbox()
@@ -0,0 +1,35 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from pillmate.seeding import clear_seed_data, seed
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, medicines, DailyDose and DoseLog rows for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--medicines", type=int, default=3, help="유저당 약 개수")
+        parser.add_argument("--days", type=int, default=30, help="오늘까지 며칠치 기록을 만들지")
+        parser.add_argument("--take-rate", type=float, default=0.85, help="평균 복용률 (0~1)")
+        parser.add_argument("--virtual-ratio", type=float, default=0.0, help="VIRTUAL 약 비율 (0~1)")
+        parser.add_argument("--seed", type=int, help="난수 seed (같은 값이면 같은 데이터)")
+        parser.add_argument("--clear", action="store_true", help="기존 seed 유저를 지우고 생성")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted = clear_seed_data()
+            self.stdout.write(f"기존 seed 데이터 삭제: {deleted} rows")
+
+        counts = seed(
+            users=options["users"],
+            medicines=options["medicines"],
+            days=options["days"],
+            take_rate=options["take_rate"],
+            virtual_ratio=options["virtual_ratio"],
+            rng=random.Random(options["seed"]),
+        )
+        self.stdout.write(
+            "생성 완료: 유저 {users} / 약 {medicines} / DailyDose {doses} / DoseLog {logs}".format(**counts)
+        )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pillmate.stress import run_confirm_stress
+
+PROFILES = {
+    "default": lambda: {},
+    "tuned": lambda: settings.SQLITE_TUNED_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent dose confirms at a scratch SQLite file and report lock errors per settings profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=sorted(PROFILES),
+            help="비교할 SQLite 설정 (기본: default, tuned 둘 다)",
+        )
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--confirms", type=int, default=20, help="스레드당 복용 완료 건수")
+        parser.add_argument("--strict", action="store_true", help="tuned 프로필에서 오류가 있으면 CommandError")
+
+    def handle(self, *args, **options):
+        failed = False
+        for name in options["profile"] or ["default", "tuned"]:
+            result = run_confirm_stress(PROFILES[name](), options["threads"], options["confirms"])
+            self.stdout.write(
+                f"[{name}] journal={result['journal_mode']} 요청 {result['requests']}건 / "
+                f"오류 {result['errors']}건 / 복용 처리 {result['taken']}/{result['expected']} / "
+                f"{result['elapsed_ms']}ms"
+            )
+            for sample in result["error_samples"]:
+                self.stdout.write(f"    {sample}")
+            failed |= name == "tuned" and (result["errors"] or result["taken"] != result["expected"])
+
+        if options["strict"] and failed:
+            raise CommandError("tuned 프로필에서 동시 처리 오류 발생")
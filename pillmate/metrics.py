@@ -0,0 +1,185 @@
+import bisect
+import glob
+import os
+import threading
+import time
+from collections import defaultdict
+
+# 요청/SQL 소요 시간 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# nopill_task 같은 배치 작업용 버킷 (초)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label 값 → [버킷별 개수..., +Inf 개수], 합계
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(label_values)
+            if counts is None:
+                counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[label_values] += value
+
+    def count(self, *label_values):
+        with self._lock:
+            return sum(self._counts.get(label_values, ()))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+        for label_values, counts, total in items:
+            cumulative = 0
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                labels = _label_text(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    프로세스 내부 메트릭 저장소 (Prometheus 텍스트 형식으로 출력)
+    값은 워커 프로세스마다 따로 쌓인다. (pubsub.Broker 와 같은 전제)
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# 요청 (view = resolve 된 url name)
+REQUEST_LATENCY = registry.register(Histogram(
+    "pillmate_request_duration_seconds", "Request latency by URL name",
+    labels=("view", "method"),
+))
+REQUEST_COUNT = registry.register(Counter(
+    "pillmate_requests_total", "Requests by URL name and status",
+    labels=("view", "method", "status"),
+))
+SQL_QUERIES = registry.register(Counter(
+    "pillmate_sql_queries_total", "SQL queries executed while handling requests",
+    labels=("view",),
+))
+SQL_DURATION = registry.register(Histogram(
+    "pillmate_request_sql_seconds", "SQL time spent per request",
+    labels=("view",),
+))
+
+# 조회 캐시 (caching.cached_read)
+CACHE_REQUESTS = registry.register(Counter(
+    "pillmate_cache_requests_total", "Read cache lookups by cache name and result",
+    labels=("cache", "result"),
+))
+
+# 기기 센서 이벤트 (ingestion)
+LOG_EVENTS = registry.register(Counter(
+    "pillmate_medicine_log_events_total", "Device sensor events by ingestion/reconciliation result",
+    labels=("result",),
+))
+
+# 배치 작업
+TASK_DURATION = registry.register(Histogram(
+    "pillmate_task_duration_seconds", "Management task run time",
+    labels=("task",), buckets=TASK_BUCKETS,
+))
+EMAILS = registry.register(Counter(
+    "pillmate_emails_total", "Outbox emails by delivery result",
+    labels=("result",),
+))
+
+
+def write_task_textfile(directory, task, duration, **values):
+    """
+    cron 으로 도는 작업은 프로세스가 바로 끝나서 메모리 메트릭이 남지 않으므로
+    마지막 실행 결과를 <directory>/<task>.prom 에 남긴다. (/metrics 가 같이 내보냄)
+    values: 추가로 남길 값 (예: emails_sent=3 → pillmate_last_task_emails_sent)
+    """
+    labels = _label_text(("task",), (task,))
+    lines = [
+        "# TYPE pillmate_last_task_duration_seconds gauge",
+        f"pillmate_last_task_duration_seconds{labels} {duration:g}",
+        "# TYPE pillmate_last_task_timestamp_seconds gauge",
+        f"pillmate_last_task_timestamp_seconds{labels} {time.time():.0f}",
+    ]
+    for name, value in values.items():
+        lines.append(f"# TYPE pillmate_last_task_{name} gauge")
+        lines.append(f"pillmate_last_task_{name}{labels} {value:g}")
+
+    # scrape 중에 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓰고 교체
+    path = os.path.join(directory, f"{task}.prom")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def render(textfile_dir=None):
+    """메모리 메트릭 + textfile_dir 의 *.prom (작업별 마지막 실행 결과)"""
+    text = registry.render()
+    if textfile_dir:
+        for path in sorted(glob.glob(os.path.join(textfile_dir, "*.prom"))):
+            with open(path, encoding="utf-8") as f:
+                text += f.read()
+    return text
@@ -0,0 +1,101 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import REQUEST_COUNT, REQUEST_LATENCY, SQL_DURATION, SQL_QUERIES
+
+
+def view_label(request):
+    """resolve 된 url name (이름 없는 route 는 route 패턴, 매칭 실패는 unmatched — 라벨 수가 늘지 않도록)"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.route
+
+
+def _sql_counter(sql):
+    """connection.execute_wrapper 용 — sql = [쿼리 수, 시간] 에 누적"""
+    def count_sql(execute, sql_text, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql_text, params, many, context)
+        finally:
+            sql[0] += 1
+            sql[1] += time.perf_counter() - started
+    return count_sql
+
+
+def sql_to_async(request, func):
+    """
+    async 뷰에서 DB 작업을 넘길 때 쓰는 sync_to_async (thread_sensitive)
+    MetricsMiddleware 가 요청의 sync 스레드 connection 에 카운터를 걸어두므로 여기서 SQL 이 따로 묶이지 않아도 기록된다.
+    """
+    return sync_to_async(func)
+
+
+def _install_sql_counter(sql):
+    """현재 스레드 connection 에 카운터를 걸고, 뗄 때 쓸 wrapper 를 돌려준다"""
+    wrapper = _sql_counter(sql)
+    connection.execute_wrappers.append(wrapper)
+    return wrapper
+
+
+def _remove_sql_counter(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class MetricsMiddleware:
+    """
+    요청마다 소요 시간 / SQL 쿼리 수 / SQL 시간을 url name 별로 기록 (metrics.registry)
+    PILLMATE_METRICS_ENABLED 가 꺼져 있으면 미들웨어 자체를 빼서 비용이 없다.
+
+    async 뷰(ASGI)에서도 동기로 바꾸지 않고 그대로 통과시킨다.
+    ASGI 에서 DB 쿼리는 요청마다 하나인 thread_sensitive sync 스레드에서 실행된다
+    (sync DRF 뷰, sql_to_async, async ORM 모두). connection 은 스레드별이므로 카운터를 그 스레드에서 걸고 뗀다.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PILLMATE_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        sql = [0, 0.0]  # 쿼리 수, 시간
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(_sql_counter(sql)):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = view_label(request)
+        REQUEST_LATENCY.observe(elapsed, view, request.method)
+        REQUEST_COUNT.inc(view, request.method, response.status_code)
+        SQL_QUERIES.inc(view, amount=sql[0])
+        SQL_DURATION.observe(sql[1], view)
+        return response
+
+    async def _acall(self, request):
+        sql = [0, 0.0]
+        started = time.perf_counter()
+        wrapper = await sync_to_async(_install_sql_counter)(sql)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_sql_counter)(wrapper)
+        elapsed = time.perf_counter() - started
+
+        view = view_label(request)
+        REQUEST_LATENCY.observe(elapsed, view, request.method)
+        REQUEST_COUNT.inc(view, request.method, response.status_code)
+        SQL_QUERIES.inc(view, amount=sql[0])
+        SQL_DURATION.observe(sql[1], view)
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_summary(apps, schema_editor):
+    DailyDose = apps.get_model('pillmate', 'DailyDose')
+    DailyAdherenceSummary = apps.get_model('pillmate', 'DailyAdherenceSummary')
+
+    rows = (
+        DailyDose.objects
+        .values('medicine__user_id', 'date')
+        .annotate(scheduled=Count('id'), taken=Count('id', filter=Q(is_taken=True)))
+        .order_by()
+    )
+    DailyAdherenceSummary.objects.bulk_create(
+        [
+            DailyAdherenceSummary(
+                user_id=row['medicine__user_id'],
+                date=row['date'],
+                scheduled=row['scheduled'],
+                taken=row['taken'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0004_guardianinfo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAdherenceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('scheduled', models.IntegerField(default=0)),
+                ('taken', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0005_dailyadherencesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='schedule_mode',
+            field=models.CharField(choices=[('EAGER', '미리 생성'), ('VIRTUAL', '복용 시 생성')], default='EAGER', max_length=10),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0006_medicine_schedule_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doselog',
+            name='taken_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
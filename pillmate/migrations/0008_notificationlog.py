@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0007_doselog_taken_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('MISSED_DOSE', '미복용 알림')], default='MISSED_DOSE', max_length=20)),
+                ('episode_start', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='pillmate.medicine')),
+            ],
+            options={
+                'unique_together': {('medicine', 'kind', 'episode_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0009_emailoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['updated_at'], name='pillmate_me_updated_314a36_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_user(apps, schema_editor):
+    DailyDose = apps.get_model('pillmate', 'DailyDose')
+    Medicine = apps.get_model('pillmate', 'Medicine')
+
+    DailyDose.objects.update(
+        user_id=Subquery(Medicine.objects.filter(pk=OuterRef('medicine_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0011_medicine_user_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailydose',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_doses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(populate_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dailydose',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_doses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='dailydose',
+            index=models.Index(fields=['date'], name='pillmate_da_date_3dba93_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailydose',
+            index=models.Index(fields=['user', 'date'], name='pillmate_da_user_id_8e260b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailydose',
+            index=models.Index(fields=['date', 'is_taken'], name='pillmate_da_date_25b42d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['end_date'], name='pillmate_me_end_dat_d1d477_idx'),
+        ),
+    ]
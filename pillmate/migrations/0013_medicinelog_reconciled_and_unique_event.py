@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_events(apps, schema_editor):
+    MedicineLog = apps.get_model('pillmate', 'MedicineLog')
+
+    # 유니크 제약을 걸기 전에 (device, timestamp, medicine) 중복은 가장 먼저 저장된 row 만 남김
+    keep = (
+        MedicineLog.objects.values('device_id', 'timestamp', 'medicine')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    MedicineLog.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0012_dailydose_user_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicinelog',
+            name='reconciled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(remove_duplicate_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='medicinelog',
+            constraint=models.UniqueConstraint(fields=('device', 'timestamp', 'medicine'), name='pillmate_medicinelog_unique_event'),
+        ),
+        migrations.AddIndex(
+            model_name='medicinelog',
+            index=models.Index(fields=['reconciled', 'id'], name='pillmate_me_reconci_6f3163_idx'),
+        ),
+    ]
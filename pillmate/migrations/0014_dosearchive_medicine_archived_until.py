@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0013_medicinelog_reconciled_and_unique_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='archived_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DoseArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('scheduled_mask', models.BigIntegerField(default=0)),
+                ('taken_mask', models.BigIntegerField(default=0)),
+                ('scheduled', models.IntegerField(default=0)),
+                ('taken', models.IntegerField(default=0)),
+                ('log_count', models.IntegerField(default=0)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='pillmate.medicine')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dose_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='pillmate_do_user_id_ce63e6_idx')],
+                'unique_together': {('medicine', 'month')},
+            },
+        ),
+    ]
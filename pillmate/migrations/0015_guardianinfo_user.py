@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_first_user(apps, schema_editor):
+    GuardianInfo = apps.get_model('pillmate', 'GuardianInfo')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    # 기존에는 전역 보호자 1명 (GuardianInfo.objects.first()) 을 모든 알림에 썼으므로 첫 번째 유저의 보호자로 옮김
+    user = User.objects.order_by('pk').first()
+    if user is None:
+        if GuardianInfo.objects.exists():
+            # 보호자 정보를 지우지 않고 멈춤 — 소유자를 만든 뒤 다시 migrate
+            raise RuntimeError(
+                "GuardianInfo 를 옮길 유저가 없습니다. "
+                "`python manage.py migrate auth` 후 `createsuperuser` 등으로 유저를 먼저 만들고 다시 migrate 하세요."
+            )
+        return
+    GuardianInfo.objects.update(user=user)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0014_dosearchive_medicine_archived_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guardianinfo',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='guardians', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(assign_first_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='guardianinfo',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guardians', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_slot_time(apps, schema_editor):
+    # 지금까지는 하루 1번 (alarm_time) 이었으므로 기존 row 는 모두 그 시각
+    # 복용 규칙은 분 단위 (recurrence.parse_slot) 이므로 alarm_time 의 초 이하를 먼저 버린다.
+    Medicine = apps.get_model('pillmate', 'Medicine')
+    for pk, alarm in Medicine.objects.values_list('pk', 'alarm_time'):
+        if alarm.second or alarm.microsecond:
+            Medicine.objects.filter(pk=pk).update(alarm_time=alarm.replace(second=0, microsecond=0))
+    alarm_time = Subquery(Medicine.objects.filter(pk=OuterRef('medicine_id')).values('alarm_time')[:1])
+    for name in ('DailyDose', 'DoseArchive'):
+        apps.get_model('pillmate', name).objects.update(slot_time=alarm_time)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0015_guardianinfo_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='slot_times',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='weekday_mask',
+            field=models.PositiveSmallIntegerField(default=127),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='interval_days',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='dailydose',
+            name='slot_time',
+            field=models.TimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='dosearchive',
+            name='slot_time',
+            field=models.TimeField(null=True),
+        ),
+        migrations.RunPython(fill_slot_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dailydose',
+            name='slot_time',
+            field=models.TimeField(),
+        ),
+        migrations.AlterField(
+            model_name='dosearchive',
+            name='slot_time',
+            field=models.TimeField(),
+        ),
+        migrations.AlterModelOptions(
+            name='dailydose',
+            options={'ordering': ['date', 'slot_time']},
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailydose',
+            unique_together={('medicine', 'date', 'slot_time')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='dosearchive',
+            unique_together={('medicine', 'month', 'slot_time')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0016_recurrence_and_slot_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='status',
+            field=models.CharField(choices=[('PENDING', '발송 대기'), ('SENDING', '발송 중'), ('SENT', '발송 완료'), ('FAILED', '발송 실패')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pillmate', '0017_emailoutbox_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicinelog',
+            name='received_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
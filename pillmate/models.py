@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from datetime import timedelta
+from django.utils import timezone
 
-# 보호자 이메일 정보
+# 보호자 이메일 정보 (약 사용자 1명에 보호자 여러 명)
 class GuardianInfo(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='guardians')
     name = models.CharField(max_length=50, null=True, blank=True)
     phone = models.CharField(max_length=50, null=True, blank=True)
     email = models.EmailField(null=True, blank=True)
@@ -24,6 +25,13 @@ class Medicine(models.Model):
         ('AFTER_MEAL', '식후 30분'),
     ]
 
+    # EAGER  : 기간 내 모든 날짜의 DailyDose 를 미리 생성
+    # VIRTUAL: 일정은 기간으로 계산하고, 실제로 복용했을 때만 DailyDose 생성 (장기 복용 영양제 등)
+    SCHEDULE_MODE_CHOICES = [
+        ('EAGER', '미리 생성'),
+        ('VIRTUAL', '복용 시 생성'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='medicines')
     name = models.CharField(max_length=100)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
@@ -31,42 +39,67 @@ class Medicine(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     time = models.CharField(max_length=20, choices=TIME_CHOICES)
-    alarm_time = models.TimeField()
+    alarm_time = models.TimeField()   # 하루 첫 복용 시각 (slot_times 가 있으면 save() 가 맞춰줌)
+    # 복용 규칙 (recurrence.rule_for 로 전개)
+    slot_times = models.JSONField(default=list, blank=True)   # 하루 복용 시각 ["08:00", "13:00", "19:00"] — 비면 alarm_time 1번
+    weekday_mask = models.PositiveSmallIntegerField(default=0b1111111)   # 복용 요일 (월 bit 0 ~ 일 bit 6)
+    interval_days = models.PositiveSmallIntegerField(default=1)   # start_date 부터 N일마다
+    schedule_mode = models.CharField(max_length=10, choices=SCHEDULE_MODE_CHOICES, default='EAGER')
+    # 이 날짜까지의 DailyDose / DoseLog 는 DoseArchive 로 옮겨짐 (archive.archive_doses 가 갱신)
+    archived_until = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # 스케줄러가 변경된 약만 다시 읽을 때 사용
+            models.Index(fields=['updated_at']),
+            # 유저별 약 목록 keyset 페이지네이션 (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id']),
+            # 미복용 확인 / 스케줄러 — 아직 끝나지 않은 약만 범위 조회
+            models.Index(fields=['end_date']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
-    
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None   # 새로 생성인지 체크
-        super().save(*args, **kwargs)
 
-        # ⭐ DailyDose 자동 생성/수정/삭제 처리 시작 ⭐
+    @property
+    def is_virtual(self):
+        return self.schedule_mode == 'VIRTUAL'
 
-        # 1) 기존 DailyDose 모두 불러오기
-        existing = DailyDose.objects.filter(medicine=self)
+    @property
+    def rule(self):
+        from .recurrence import rule_for
+        return rule_for(self)
 
-        # 2) 기간(start_date ~ end_date) 기반으로 날짜 목록 생성
-        delta = (self.end_date - self.start_date).days
-        valid_dates = [self.start_date + timedelta(days=i) for i in range(delta + 1)]
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_user_id = instance.__dict__.get('user_id')   # 주인이 바뀌면 이전 주인 캐시도 무효화
+        return instance
 
-        # 3) 기존 DailyDose 중에서 기간에서 벗어난 날짜 삭제
-        for dose in existing:
-            if dose.date not in valid_dates:
-                dose.delete()
+    def save(self, *args, **kwargs):
+        from .caching import touch_medicines
+        from .dosing import sync_daily_doses
+        from .recurrence import medicine_slots, format_slot
+
+        # 복용 시각은 분 단위 — slot_times 가 비어 있으면 alarm_time 이 그날의 유일한 복용 시각
+        slots = medicine_slots(self.slot_times, self.alarm_time)
+        if self.slot_times:
+            self.slot_times = [format_slot(slot) for slot in slots]
+        self.alarm_time = slots[0]
+
+        is_new = self.pk is None   # 새로 생성인지 체크
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # ⭐ DailyDose 자동 생성/수정/삭제 처리 (날짜 집합 diff 로 한 번에) ⭐
+            sync_daily_doses(self, created=is_new)
 
-        # 4) 기간 내 날짜는 생성 또는 업데이트
-        for d in valid_dates:
-            dose, created = DailyDose.objects.get_or_create(
-                medicine=self,
-                date=d,
-                defaults={"quantity": self.quantity}
-            )
-            if not created:
-                # 기존 DailyDose라면 quantity 업데이트
-                dose.quantity = self.quantity
-                dose.save()
+            previous_user_id = getattr(self, '_saved_user_id', None)
+            if previous_user_id is not None and previous_user_id != self.user_id:
+                touch_medicines(previous_user_id)
+        self._saved_user_id = self.user_id
 
 class DailyDose(models.Model):
     medicine = models.ForeignKey(
@@ -74,17 +107,74 @@ class DailyDose(models.Model):
         on_delete=models.CASCADE,
         related_name="daily_doses"
     )
+    # medicine.user 복사본 — 유저별 조회에서 Medicine join 을 없애기 위함 (sync_daily_doses 가 맞춰줌)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_doses")
     date = models.DateField()
+    slot_time = models.TimeField()   # 그날의 복용 시각 (하루 여러 번 복용하면 시각마다 row 1개)
     quantity = models.PositiveIntegerField(default=1)
     is_taken = models.BooleanField(default=False)
     taken_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('medicine', 'date')
+        unique_together = ('medicine', 'date', 'slot_time')
+        ordering = ['date', 'slot_time']
+        indexes = [
+            # 오늘 복용 목록 (전체)
+            models.Index(fields=['date']),
+            # 유저별 오늘/기간 조회, keyset 페이지네이션 (date, id)
+            models.Index(fields=['user', 'date']),
+            # 기간 + 복용 여부 조회
+            models.Index(fields=['date', 'is_taken']),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine.name} - {self.date} {self.slot_time:%H:%M}"
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.medicine.user_id
+        if self.slot_time is None:
+            self.slot_time = self.medicine.alarm_time
+        super().save(*args, **kwargs)
+
+
+# 날짜별 복용 현황 집계 (캘린더/통계용 rollup)
+class DailyAdherenceSummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="adherence_summaries")
+    date = models.DateField()
+    scheduled = models.IntegerField(default=0)   # 그날 복용해야 하는 DailyDose 수
+    taken = models.IntegerField(default=0)       # 그중 복용 완료 수
+
+    class Meta:
+        unique_together = ('user', 'date')
         ordering = ['date']
 
     def __str__(self):
-        return f"{self.medicine.name} - {self.date}"
+        return f"{self.user_id} - {self.date} ({self.taken}/{self.scheduled})"
+
+
+# 지난 달 DailyDose / DoseLog 압축 보관 (약 1개 × 1달 × 복용 시각 1개 = row 1개)
+# 날짜 d 는 bit (d - 1) — scheduled_mask: DailyDose row 가 있던 날, taken_mask: 그중 복용한 날
+class DoseArchive(models.Model):
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="archives")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="dose_archives")
+    month = models.DateField()   # 해당 월 1일
+    slot_time = models.TimeField()
+    scheduled_mask = models.BigIntegerField(default=0)
+    taken_mask = models.BigIntegerField(default=0)
+    scheduled = models.IntegerField(default=0)
+    taken = models.IntegerField(default=0)
+    log_count = models.IntegerField(default=0)   # 보관하면서 지운 DoseLog 수 (첫 복용 시각 row 에 기록)
+
+    class Meta:
+        unique_together = ('medicine', 'month', 'slot_time')
+        indexes = [
+            # 유저별 월 범위 조회
+            models.Index(fields=['user', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id} - {self.month:%Y-%m} {self.slot_time:%H:%M} ({self.taken}/{self.scheduled})"
 
 
 class DoseLog(models.Model):
@@ -94,19 +184,88 @@ class DoseLog(models.Model):
     ]
 
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='logs')
-    taken_at = models.DateTimeField(auto_now_add=True)
+    taken_at = models.DateTimeField(default=timezone.now)   # 오프라인 기기는 기기 시각으로 기록
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='ARDUINO')
 
     def __str__(self):
         return f"{self.medicine.name} - {self.taken_at.strftime('%Y-%m-%d %H:%M')}"
 
+# 보호자 알림 발송 기록 (같은 미복용 구간은 한 번만 알림)
+class NotificationLog(models.Model):
+    KIND_CHOICES = [
+        ('MISSED_DOSE', '미복용 알림'),
+    ]
+
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='MISSED_DOSE')
+    episode_start = models.DateField()   # 미복용 구간 시작일 (마지막 복용 다음날 또는 복용 시작일)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('medicine', 'kind', 'episode_start')
+
+    def __str__(self):
+        return f"{self.medicine.name} - {self.kind} ({self.episode_start})"
+
+
+# 발송 대기 이메일 (알림 스캔은 여기에 쌓기만 하고, deliver_emails 가 모아서 발송)
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', '발송 대기'),
+        ('SENDING', '발송 중'),
+        ('SENT', '발송 완료'),
+        ('FAILED', '발송 실패'),
+    ]
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    # PENDING: 다음 발송 시도 시각 / SENDING: 발송을 가져간 worker 의 점유 만료 시각
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)   # 발송 중인 worker 표시 (deliver_outbox)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.to} - {self.subject} ({self.status})"
+
+
 # 아두이노 통신 관련
 class Device(models.Model):
     device_id = models.CharField(unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+# 기기 센서 이벤트 원본 (ingestion.ingest_events 가 쌓고, reconcile_logs 가 DailyDose 에 반영)
 class MedicineLog(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE)
-    medicine = models.CharField(max_length=200)
+    medicine = models.CharField(max_length=200)   # 기기가 보낸 약 이름
     taken = models.BooleanField()
-    timestamp = models.DateTimeField()
+    timestamp = models.DateTimeField()   # 기기가 보낸 시각 그대로 (재전송 중복 제거 key)
+    received_at = models.DateTimeField(default=timezone.now)
+    reconciled = models.BooleanField(default=False)   # DailyDose 반영(또는 반영할 대상 없음) 확인 완료
+
+    class Meta:
+        constraints = [
+            # 기기가 같은 이벤트를 재전송해도 한 번만 저장
+            models.UniqueConstraint(
+                fields=['device', 'timestamp', 'medicine'], name='pillmate_medicinelog_unique_event'
+            ),
+        ]
+        indexes = [
+            # 아직 반영하지 않은 로그만 id 순으로 읽음
+            models.Index(fields=['reconciled', 'id']),
+        ]
+
+    @property
+    def taken_at(self):
+        """복용 시각 — 기기 시각이 미래로 틀어진 경우 서버가 받은 시각으로 보정"""
+        return min(self.timestamp, self.received_at)
+
+    def __str__(self):
+        return f"{self.device_id} - {self.medicine} ({self.timestamp:%Y-%m-%d %H:%M})"
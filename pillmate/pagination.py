@@ -0,0 +1,96 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    (정렬 컬럼들, id) 기준 cursor(keyset) 페이지네이션
+    OFFSET 을 쓰지 않고 "마지막으로 본 값 다음부터" 조회하므로 몇 페이지째든 비용이 같다.
+
+    뷰의 keyset_ordering 으로 정렬 지정 (예: ("-created_at", "-id"))
+    ?cursor= / ?page_size= 가 없어도 첫 페이지 (page_size 개, ?page_size= 는 최대 max_page_size) 만 반환한다.
+    응답: {"next": "<다음 페이지 URL>" | null, "results": [...]}
+    PILLMATE_UNPAGINATED_LISTS 를 켜면 파라미터 없는 요청은 예전처럼 전체 목록 (list) 을 반환 (예전 앱 호환용)
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def _ordering(self, view):
+        return getattr(view, "keyset_ordering", ("-id",))
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "정수여야 합니다."})
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj, ordering):
+        # 모델 인스턴스 / .values() dict 둘 다 지원
+        get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name)
+        values = [get(field.lstrip("-")) for field in ordering]
+        raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor, queryset, ordering):
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if len(raw) != len(ordering):
+                raise ValueError
+            model = queryset.model
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(ordering, raw)
+            ]
+        except Exception:
+            raise ValidationError({self.cursor_query_param: "잘못된 cursor 입니다."})
+
+    @staticmethod
+    def after(ordering, values):
+        """(a, b) > (va, vb) 를 컬럼별 비교로 풀어쓴 조건 (내림차순 컬럼은 <)"""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values[:i]):
+                step &= Q(**{prev_field.lstrip("-"): prev_value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        legacy = self.cursor_query_param not in params and self.page_size_query_param not in params
+        if legacy and getattr(settings, "PILLMATE_UNPAGINATED_LISTS", False):
+            return None
+
+        ordering = self._ordering(view)
+        size = self._page_size(request)
+        queryset = queryset.order_by(*ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(ordering, self.decode_cursor(cursor, queryset, ordering)))
+
+        rows = list(queryset[:size + 1])
+        page = rows[:size]
+
+        self.next_url = None
+        if len(rows) > size:
+            url = request.build_absolute_uri()
+            self.next_url = replace_query_param(
+                url, self.cursor_query_param, self.encode_cursor(page[-1], ordering)
+            )
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next_url, "results": data})
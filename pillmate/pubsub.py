@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+# 구독자 1명당 쌓아둘 최대 메시지 수 (느린 기기는 오래된 알림부터 버림)
+QUEUE_SIZE = 16
+
+
+class Subscription:
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def _put(self, message):
+        # 이벤트 루프 스레드에서만 실행됨
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    """
+    프로세스 내부 pub/sub
+    - subscribe/unsubscribe 는 async 뷰(이벤트 루프)에서
+    - publish 는 동기 코드(다른 스레드)에서도 호출 가능
+    구독자 하나는 Queue 하나뿐이라 idle 연결 수천 개도 워커 하나로 유지할 수 있다.
+    (프로세스 간 전달은 하지 않음 — 기기 스트림은 ASGI 워커 1개 기준)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, message)
+            except RuntimeError:
+                # 이벤트 루프가 이미 닫힌 구독자
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+broker = Broker()
+
+# 일정 변경 알림 채널 (전체 / 유저별)
+SCHEDULE_CHANNEL = "schedule"
+
+
+def schedule_channel(user_id=None):
+    return SCHEDULE_CHANNEL if user_id is None else f"{SCHEDULE_CHANNEL}:{user_id}"
@@ -0,0 +1,118 @@
+import bisect
+import heapq
+from datetime import date, time
+from functools import lru_cache
+from math import gcd
+
+# weekday_mask: 월요일 bit 0 ~ 일요일 bit 6
+ALL_WEEKDAYS = 0b1111111
+# 하루 최대 복용 횟수
+MAX_SLOTS = 8
+
+
+def parse_slot(value):
+    """"HH:MM" / time → time (초 이하는 버림)"""
+    if isinstance(value, str):
+        value = time.fromisoformat(value)
+    return value.replace(second=0, microsecond=0)
+
+
+def format_slot(value):
+    return value.strftime("%H:%M")
+
+
+def medicine_slots(slot_times, alarm_time):
+    """하루 복용 시각 목록 (정렬) — slot_times 가 비어 있으면 alarm_time 1번 (예전 약)"""
+    if not slot_times:
+        return (parse_slot(alarm_time),)
+    return tuple(sorted({parse_slot(value) for value in slot_times}))
+
+
+class CompiledRule:
+    """
+    복용 규칙 (기간 + 요일 + N일 간격 + 하루 복용 시각) 을 미리 계산해 둔 형태
+
+    복용일은 start_date 부터 period = lcm(interval_days, 7) 일 주기로 같은 모양이 반복되므로
+    한 주기 안의 복용일 offset 만 구해 두면
+        복용일 = start_date + period × k + offset
+    으로 표현된다. 기간 전개 / 개수 / 특정 날짜 여부를 날짜를 하루씩 훑지 않고
+    offset 별 등차수열 (range) 계산으로 처리한다.
+    """
+
+    def __init__(self, start_date, end_date, slots, weekday_mask=ALL_WEEKDAYS, interval_days=1):
+        self.first = start_date.toordinal()
+        self.last = end_date.toordinal()
+        self.slots = tuple(slots)
+        interval_days = max(1, interval_days)
+        self.period = interval_days * 7 // gcd(interval_days, 7)
+        weekday = start_date.weekday()
+        self.offsets = tuple(
+            offset for offset in range(0, self.period, interval_days)
+            if weekday_mask >> ((weekday + offset) % 7) & 1
+        )
+        self._offset_set = frozenset(self.offsets)
+
+    def _ranges(self, start, end):
+        """start ~ end 안의 복용일 ordinal — offset 별 range 목록"""
+        lo = max(start.toordinal(), self.first)
+        hi = min(end.toordinal(), self.last)
+        if lo > hi or not self.offsets:
+            return []
+
+        cycle = self.first + (lo - self.first) // self.period * self.period
+        ranges = []
+        for offset in self.offsets:
+            first = cycle + offset
+            if first < lo:
+                first += self.period
+            ranges.append(range(first, hi + 1, self.period))
+        return ranges
+
+    def dates(self, start, end):
+        """start ~ end 안의 복용일 (정렬)"""
+        return [date.fromordinal(o) for o in heapq.merge(*self._ranges(start, end))]
+
+    def count(self, start, end):
+        """start ~ end 안의 복용일 수 (전개하지 않고 range 길이 합)"""
+        return sum(len(r) for r in self._ranges(start, end))
+
+    def doses(self, start, end):
+        """start ~ end 안의 (날짜, 복용 시각) 목록"""
+        return [(d, slot) for d in self.dates(start, end) for slot in self.slots]
+
+    def occurs(self, day):
+        o = day.toordinal()
+        return self.first <= o <= self.last and (o - self.first) % self.period in self._offset_set
+
+    def index(self, day):
+        """start_date ~ day 의 복용일 수 — 연속 복용 계산용 (복용일마다 1씩 증가)"""
+        return self.count(date.fromordinal(self.first), day)
+
+    def last_on_or_before(self, day):
+        """day 이전 (포함) 마지막 복용일 (없으면 None)"""
+        o = min(day.toordinal(), self.last)
+        if o < self.first or not self.offsets:
+            return None
+        cycle, position = divmod(o - self.first, self.period)
+        i = bisect.bisect_right(self.offsets, position)
+        if i:
+            return date.fromordinal(self.first + cycle * self.period + self.offsets[i - 1])
+        if cycle == 0:
+            return None
+        return date.fromordinal(self.first + (cycle - 1) * self.period + self.offsets[-1])
+
+
+@lru_cache(maxsize=4096)
+def compile_rule(start_date, end_date, slots, weekday_mask=ALL_WEEKDAYS, interval_days=1):
+    return CompiledRule(start_date, end_date, slots, weekday_mask, interval_days)
+
+
+def rule_for(medicine):
+    """Medicine → CompiledRule (같은 규칙은 캐시된 것을 재사용)"""
+    return compile_rule(
+        medicine.start_date,
+        medicine.end_date,
+        medicine_slots(medicine.slot_times, medicine.alarm_time),
+        medicine.weekday_mask,
+        medicine.interval_days,
+    )
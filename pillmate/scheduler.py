@@ -0,0 +1,123 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Medicine
+from .services import MISSED_GRACE
+
+ALARM = "ALARM"   # 복용 알람 시각
+GRACE = "GRACE"   # 알람 + 30분 — 미복용 확인 시각
+
+
+class AlarmScheduler:
+    """
+    다음에 처리할 알람/유예시간 이벤트를 min-heap 으로 들고 있는 스케줄러
+
+    - load(): 오늘~내일 복용 예정인 약으로 heap 생성 (쿼리 1번)
+    - refresh(): 날짜 창 안 약의 (id, updated_at, archived_until) 를 읽어 들고 있는 것과 맞춰봄
+      바뀌었거나 새로 보이는 약만 다시 읽어 이벤트 추가 (이전 이벤트는 version 으로 무효화), 사라진 약은 버림
+    - pop_due(): 시각이 된 이벤트만 꺼냄
+    updated_at 워터마크 대신 매번 id 집합과 비교하므로 늦게 커밋된 트랜잭션 / 삭제 / .update() 도 놓치지 않는다.
+    """
+
+    def __init__(self, horizon_days=1):
+        self.horizon_days = horizon_days
+        self._heap = []
+        self._seq = itertools.count()
+        self._versions = {}        # medicine_id → 최신 version (이전 이벤트 무효화용)
+        self._fingerprints = {}    # medicine_id → 마지막으로 반영한 (updated_at, archived_until)
+        self._loaded_through = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _push(self, due, kind, medicine_id, day):
+        version = self._versions.get(medicine_id, 0)
+        heapq.heappush(self._heap, (due, next(self._seq), kind, medicine_id, day, version))
+
+    def _schedule(self, medicine, start, end, now):
+        """
+        medicine 의 start~end 복용일 이벤트 추가 (이미 지난 알람은 건너뛰고, 유예시간 확인은 남김)
+        알람은 복용 시각마다, 유예시간 확인은 그날 마지막 복용 시각 기준 1번
+        """
+        rule = medicine.rule
+        for day in rule.dates(start, end):
+            for slot in rule.slots:
+                alarm = timezone.make_aware(datetime.combine(day, slot))
+                if alarm >= now:
+                    self._push(alarm, ALARM, medicine.id, day)
+            self._push(alarm + MISSED_GRACE, GRACE, medicine.id, day)
+
+    def _track(self, medicine):
+        self._fingerprints[medicine.id] = (medicine.updated_at, medicine.archived_until)
+
+    def load(self, now=None):
+        now = now or timezone.now()
+        today = timezone.localdate(now)
+        end = today + timedelta(days=self.horizon_days)
+
+        self._heap = []
+        for medicine in Medicine.objects.filter(start_date__lte=end, end_date__gte=today):
+            self._versions[medicine.id] = self._versions.get(medicine.id, 0)
+            self._schedule(medicine, today, end, now)
+            self._track(medicine)
+
+        self._loaded_through = end
+
+    def refresh(self, now=None):
+        """
+        바뀐 / 새로 보이는 약을 다시 반영, 삭제된 약은 버림 + 날짜가 넘어가면 새 날짜 이벤트 추가
+        반환값: 반영한 약 수
+        """
+        now = now or timezone.now()
+        today = timezone.localdate(now)
+        end = today + timedelta(days=self.horizon_days)
+
+        # 어제 끝난 약도 창에 남김 — 자정 직전 복용의 유예시간 확인이 오늘로 넘어옴
+        current = {
+            medicine_id: (updated_at, archived_until)
+            for medicine_id, updated_at, archived_until in Medicine.objects.filter(
+                start_date__lte=end, end_date__gte=today - timedelta(days=1)
+            ).values_list("id", "updated_at", "archived_until")
+        }
+        for medicine_id in self._fingerprints.keys() - current.keys():
+            # 삭제 (또는 창을 벗어남) → 남은 이벤트는 version 이 없어서 pop 할 때 버려진다
+            del self._fingerprints[medicine_id]
+            self._versions.pop(medicine_id, None)
+
+        changed_ids = [
+            medicine_id for medicine_id, fingerprint in current.items()
+            if self._fingerprints.get(medicine_id) != fingerprint
+        ]
+        if changed_ids:
+            for medicine in Medicine.objects.filter(id__in=changed_ids):
+                # 이전 이벤트는 version 이 달라져서 pop 할 때 버려진다
+                self._versions[medicine.id] = self._versions.get(medicine.id, 0) + 1
+                self._schedule(medicine, today, end, now)
+                self._track(medicine)
+
+        if end > self._loaded_through:
+            new_start = self._loaded_through + timedelta(days=1)
+            medicines = Medicine.objects.filter(start_date__lte=end, end_date__gte=new_start)
+            for medicine in medicines.exclude(id__in=changed_ids):
+                self._versions.setdefault(medicine.id, 0)
+                self._schedule(medicine, new_start, end, now)
+            self._loaded_through = end
+
+        return len(changed_ids)
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """시각이 된 이벤트 목록 [(due, kind, medicine_id, day)]"""
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, kind, medicine_id, day, version = heapq.heappop(self._heap)
+            if version != self._versions.get(medicine_id):
+                continue  # 약이 수정되기 전 이벤트
+            due.append((when, kind, medicine_id, day))
+        return due
@@ -0,0 +1,108 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .adherence import rebuild_summary
+from .dosing import date_range
+from .models import Medicine, DailyDose, DoseLog, GuardianInfo
+
+SEED_USERNAME = "seed-user-{n}"
+SEED_USERNAME_PREFIX = "seed-user-"
+
+MEDICINE_NAMES = ["비타민", "오메가3", "유산균", "혈압약", "당뇨약", "진통제", "감기약", "철분제"]
+ALARM_TIMES = [time(8, 0), time(9, 0), time(12, 30), time(19, 0), time(22, 0)]
+
+# 유저별 복용률 편차 / 복용 시각 지연 (분)
+TAKE_RATE_SPREAD = 0.1
+DELAY_MEAN_MINUTES = 10
+DELAY_SD_MINUTES = 20
+
+
+def clear_seed_data():
+    """seed 로 만든 유저 (+ 약/복용 기록 CASCADE) 삭제"""
+    deleted, _ = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).delete()
+    return deleted
+
+
+def seed(users=10, medicines=3, days=30, take_rate=0.85, virtual_ratio=0.0, today=None, rng=None):
+    """
+    users × medicines × days 규모의 가짜 데이터 생성
+    - 약 기간: 오늘 기준 days 일 전 ~ 오늘
+    - 유저마다 복용률을 take_rate ± TAKE_RATE_SPREAD 로 정하고, 복용한 날은 알람 시각 ± 지연으로 taken_at 기록
+    - virtual_ratio 만큼은 VIRTUAL 약 (복용한 날만 row 생성)
+    - 유저마다 보호자 1명
+
+    Medicine.save() 를 거치지 않고 bulk_create 로 넣은 뒤 집계는 rebuild_summary 로 한 번에 맞춘다.
+    반환값: 생성한 row 수 {"users", "medicines", "doses", "logs"}
+    """
+    rng = rng or random.Random()
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    now = timezone.now()
+
+    with transaction.atomic():
+        offset = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count()
+        created_users = User.objects.bulk_create([
+            User(username=SEED_USERNAME.format(n=offset + i)) for i in range(users)
+        ])
+        # sqlite 는 bulk_create 후 pk 를 돌려주지만 DB 마다 다를 수 있으므로 다시 조회
+        created_users = list(
+            User.objects.filter(username__in=[u.username for u in created_users]).order_by("id")
+        )
+
+        meds = []
+        for user in created_users:
+            for i in range(medicines):
+                meds.append(Medicine(
+                    user=user,
+                    name=MEDICINE_NAMES[i % len(MEDICINE_NAMES)],
+                    type=rng.choice(Medicine.TYPE_CHOICES)[0],
+                    quantity=rng.randint(1, 3),
+                    start_date=start,
+                    end_date=today,
+                    time=rng.choice(Medicine.TIME_CHOICES)[0],
+                    alarm_time=rng.choice(ALARM_TIMES),
+                    schedule_mode="VIRTUAL" if rng.random() < virtual_ratio else "EAGER",
+                ))
+        meds = Medicine.objects.bulk_create(meds)
+
+        doses, logs = [], []
+        rates = {user.id: min(1.0, max(0.0, rng.gauss(take_rate, TAKE_RATE_SPREAD))) for user in created_users}
+        for med in meds:
+            for day in date_range(start, today):
+                alarm = timezone.make_aware(datetime.combine(day, med.alarm_time))
+                delay = timedelta(minutes=rng.gauss(DELAY_MEAN_MINUTES, DELAY_SD_MINUTES))
+                taken_at = alarm + delay
+                is_taken = taken_at <= now and rng.random() < rates[med.user_id]
+
+                if is_taken:
+                    logs.append(DoseLog(medicine=med, taken_at=taken_at, source="ARDUINO"))
+                elif med.is_virtual:
+                    continue
+                doses.append(DailyDose(
+                    medicine=med,
+                    user_id=med.user_id,
+                    date=day,
+                    slot_time=med.alarm_time,
+                    quantity=med.quantity,
+                    is_taken=is_taken,
+                    taken_at=taken_at if is_taken else None,
+                ))
+
+        DailyDose.objects.bulk_create(doses, batch_size=1000)
+        DoseLog.objects.bulk_create(logs, batch_size=1000)
+        for user in created_users:
+            rebuild_summary(user.id)
+
+        GuardianInfo.objects.bulk_create([
+            GuardianInfo(
+                user=user, name="보호자", email=f"guardian+{user.username}@example.com",
+                owner_name=user.username, owner_email=f"{user.username}@example.com",
+            )
+            for user in created_users
+        ])
+
+    return {"users": len(created_users), "medicines": len(meds), "doses": len(doses), "logs": len(logs)}
@@ -1,5 +1,8 @@
+from django.db.models import QuerySet
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Medicine, DoseLog, DailyDose, GuardianInfo
+from .recurrence import ALL_WEEKDAYS, MAX_SLOTS, format_slot, medicine_slots
 
 
 class DoseLogSerializer(serializers.ModelSerializer):
@@ -14,7 +17,29 @@ class MedicineSerializer(serializers.ModelSerializer):
     class Meta:
         model = Medicine
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'archived_until', 'created_at', 'updated_at']
+
+    def validate_slot_times(self, value):
+        """하루 복용 시각 목록 ["08:00", "20:00"] — 비우면 alarm_time 1번"""
+        if not isinstance(value, list):
+            raise serializers.ValidationError("복용 시각 목록이어야 합니다.")
+        try:
+            slots = medicine_slots(value, None) if value else ()
+        except (TypeError, ValueError, AttributeError):
+            raise serializers.ValidationError("복용 시각 형식은 HH:MM 입니다.")
+        if len(slots) > MAX_SLOTS:
+            raise serializers.ValidationError(f"복용 시각은 하루 최대 {MAX_SLOTS}개 입니다.")
+        return [format_slot(slot) for slot in slots]
+
+    def validate_weekday_mask(self, value):
+        if not 1 <= value <= ALL_WEEKDAYS:
+            raise serializers.ValidationError(f"복용 요일은 1 ~ {ALL_WEEKDAYS} (월요일 bit 0 ~ 일요일 bit 6) 입니다.")
+        return value
+
+    def validate_interval_days(self, value):
+        if value < 1:
+            raise serializers.ValidationError("복용 간격은 1일 이상입니다.")
+        return value
 
 class DailyDoseSerializer(serializers.ModelSerializer):
     medicine = MedicineSerializer(read_only=True)
@@ -22,8 +47,51 @@ class DailyDoseSerializer(serializers.ModelSerializer):
     class Meta:
         model = DailyDose
         fields = "__all__"
+        read_only_fields = ("user",)
+
+# ?view=compact — 모델 인스턴스/중첩 serializer 없이 .values() 로 만드는 가벼운 응답
+COMPACT_DOSE_FIELDS = ("id", "medicine_id", "date", "slot_time", "quantity", "is_taken", "taken_at")
+COMPACT_MEDICINE_FIELDS = (
+    "id", "name", "type", "quantity", "time", "alarm_time", "slot_times", "weekday_mask", "interval_days",
+    "schedule_mode",
+)
+
+
+def compact_doses(doses, extra_doses=()):
+    """
+    {"doses": [평평한 dose row...], "medicines": {"<id>": {...}}}
+    dose 마다 Medicine 전체를 반복하지 않고, 약 정보는 medicines 에 한 번씩만 담는다.
+    doses 는 DailyDose queryset 또는 이미 .values(*COMPACT_DOSE_FIELDS) 로 읽은 row 목록
+    extra_doses: 저장되지 않은 dose (보관된 dose / VIRTUAL 가상 dose, id=null)
+    """
+    if isinstance(doses, QuerySet):
+        doses = doses.values(*COMPACT_DOSE_FIELDS)
+    rows = list(doses)
+    rows += [{field: getattr(dose, field) for field in COMPACT_DOSE_FIELDS} for dose in extra_doses]
+
+    medicines = {}
+    missing = {row["medicine_id"] for row in rows}
+    if missing:
+        for med in Medicine.objects.filter(id__in=missing).values(*COMPACT_MEDICINE_FIELDS):
+            medicines[med["id"]] = med
+
+    for row in rows:
+        if row["taken_at"] is not None:
+            row["taken_at"] = timezone.localtime(row["taken_at"])
+
+    return {
+        "doses": rows,
+        "medicines": {str(med_id): med for med_id, med in medicines.items()},
+    }
+
 
 class GuardianInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = GuardianInfo
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+        read_only_fields = ("user",)
+
+# 아두이노 batch confirm 이벤트 1건
+class DoseConfirmEventSerializer(serializers.Serializer):
+    dose_id = serializers.IntegerField()
+    taken_at = serializers.DateTimeField(required=False)
@@ -1,22 +1,281 @@
-from django.core.mail import send_mail
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .archive import last_taken_archived
+from .metrics import EMAILS
+from .models import Medicine, GuardianInfo, NotificationLog, EmailOutbox
+from .recurrence import ALL_WEEKDAYS
+
+
+def enqueue_missed_digest_email(guardian_email, entries):
+    """
+    보호자 1명에게 이번 실행에서 새로 확인된 미복용 약을 모아서 메일 1통으로 outbox 에 적재
+    entries: [(owner_name, medicine_name, episode_start, alarm_time)]
+    """
+    owners = list(dict.fromkeys(owner for owner, _, _, _ in entries))
+    subject = f"[PillMate] {', '.join(owners)} 최근 {MISSED_WINDOW_DAYS}일간 미복용 알림 ({len(entries)}건)"
+
+    lines = [f"최근 {MISSED_WINDOW_DAYS}일 동안 복용해야 했던 아래 약을 단 한 번도 복용하지 않은 것으로 확인되었습니다.", ""]
+    for owner in owners:
+        lines.append(f"[{owner}]")
+        lines.extend(
+            f"- {medicine_name} (복용 시간 {alarm_time.strftime('%H:%M')}, {episode_start} 이후 복용 기록 없음)"
+            for entry_owner, medicine_name, episode_start, alarm_time in entries
+            if entry_owner == owner
+        )
+        lines.append("")
+    lines += ["건강 관리를 위해 확인 부탁드립니다.", "", "- PillMate"]
+
+    return enqueue_email(guardian_email, subject, "\n".join(lines))
+
+
+##################################################################
+# 이메일 outbox
+
+# 발송 재시도: 1분, 2분, 4분, 8분 후 → 5번 실패하면 FAILED
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE = timedelta(minutes=1)
+# 발송을 가져간 worker 가 이 시간 안에 결과를 남기지 못하면 (중간에 죽은 경우) 다른 worker 가 다시 가져간다
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(to, subject, body):
+    return EmailOutbox.objects.create(to=to, subject=subject, body=body)
 
-def send_missed_dose_email(guardian_email, owner_name, medicine_name, time):
-    subject = f"[PillMate] {owner_name} 최근 2일간 미복용 알림"
 
-    message = (
-        f"{owner_name}이 최근 2일 동안 복용해야 했던 약 '{medicine_name}'을(를)\n"
-        f"단 한 번도 복용하지 않은 것으로 확인되었습니다.\n\n"
-        f"복용 시간은 {time.strftime('%H:%M')} 입니다.\n"
-        f"건강 관리를 위해 확인 부탁드립니다.\n\n"
-        f"- PillMate"
+def claim_outbox(batch_size=OUTBOX_BATCH_SIZE, now=None):
+    """
+    보낼 메일을 batch_size 만큼 SENDING 으로 바꿔서 이 worker 몫으로 가져간다.
+    조건부 UPDATE (아직 PENDING / 점유가 만료된 SENDING 인 row 만) 라서
+    여러 worker (nopill_task, run_scheduler, deliver_emails) 가 동시에 돌아도 같은 메일을 두 번 가져가지 않는다.
+    """
+    now = now or timezone.now()
+    claimable = EmailOutbox.objects.filter(status__in=("PENDING", "SENDING"), next_attempt_at__lte=now)
+    ids = list(claimable.order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    claimable.filter(id__in=ids).update(
+        status="SENDING", claim_token=token, next_attempt_at=now + OUTBOX_CLAIM_TIMEOUT
     )
+    return list(EmailOutbox.objects.filter(claim_token=token, status="SENDING").order_by("id"))
+
+
+def deliver_outbox(batch_size=OUTBOX_BATCH_SIZE, now=None):
+    """
+    발송 대기 메일을 batch_size 만큼 가져와서 (claim_outbox) SMTP 연결 하나로 발송
+    실패한 메일은 지수 backoff 로 다음 시도 시각을 미뤄 PENDING 으로 되돌리고, 나머지 메일은 계속 보낸다.
+    반환값: (발송 성공 수, 실패 수)
+    """
+    now = now or timezone.now()
+    emails = claim_outbox(batch_size, now)
+    if not emails:
+        return 0, 0
 
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [guardian_email],
-        fail_silently=False,
+    sent_ids = []
+    failed = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+                sent_ids.append(email.id)
+            except Exception as e:
+                failed.append((email, e))
+    except Exception as e:
+        # 연결 자체가 실패하면 아직 못 보낸 메일은 모두 실패 처리
+        done = set(sent_ids) | {email.id for email, _ in failed}
+        failed.extend((email, e) for email in emails if email.id not in done)
+    finally:
+        connection.close()
+
+    # 결과는 아직 이 worker 가 점유 중인 row 에만 남김 (점유가 만료돼 다른 worker 가 가져갔으면 그쪽 결과를 따름)
+    claimed = EmailOutbox.objects.filter(claim_token=emails[0].claim_token)
+    claimed.filter(id__in=sent_ids).update(
+        status="SENT", sent_at=now, attempts=F("attempts") + 1, last_error=""
     )
 
+    for email, error in failed:
+        attempts = email.attempts + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            result = {"status": "FAILED"}
+        else:
+            result = {"status": "PENDING", "next_attempt_at": now + OUTBOX_RETRY_BASE * (2 ** (attempts - 1))}
+        claimed.filter(id=email.id).update(attempts=attempts, last_error=str(error), **result)
+
+    EMAILS.inc("sent", amount=len(sent_ids))
+    EMAILS.inc("failed", amount=len(failed))
+    return len(sent_ids), len(failed)
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, now=None):
+    """지금 보낼 수 있는 메일을 모두 발송 (batch 반복) → (성공 수, 실패 수)"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_outbox(batch_size, now)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
+
+
+# 미복용 판단 기준
+MISSED_WINDOW_DAYS = 2                   # 오늘 포함 최근 2일 + 오늘 (start ~ today)
+MISSED_GRACE = timedelta(minutes=30)     # 마지막 복용 예정 시각 + 30분이 지나야 미복용
+
+
+def missed_window(now=None):
+    """미복용 판단 기간 → (시작일, 종료일(오늘), 복용 예정 시각 기준선 = 지금 - 30분)"""
+    local_now = timezone.localtime(now or timezone.now())
+    end_date = local_now.date()
+    return end_date - timedelta(days=MISSED_WINDOW_DAYS), end_date, local_now - MISSED_GRACE
+
+
+def missed_medicines_queryset(now=None, medicine_ids=None):
+    """
+    최근 기간 동안 한 번도 복용하지 않았고, 기간 내 마지막 복용 예정 시각 + 30분이 지났을 수 있는 약
+    DailyDose 를 파이썬으로 읽지 않고 Medicine 기준 집계 쿼리 1번으로 찾는다.
+    하루 여러 번 / 요일 / N일 간격 규칙은 SQL 로 풀지 않고 후보만 넓게 남긴다. (is_missed_due 로 확정)
+    medicine_ids 가 있으면 그 약들만 확인 (스케줄러의 유예시간 이벤트)
+    """
+    start_date, end_date, cutoff = missed_window(now)
+
+    medicines = Medicine.objects.all()
+    if medicine_ids is not None:
+        medicines = medicines.filter(id__in=medicine_ids)
+
+    return (
+        medicines
+        .filter(start_date__lte=end_date, end_date__gte=start_date)
+        .annotate(
+            taken_in_window=Count(
+                "daily_doses",
+                filter=Q(daily_doses__date__range=(start_date, end_date), daily_doses__is_taken=True),
+            ),
+            last_taken=Max("daily_doses__date", filter=Q(daily_doses__is_taken=True)),
+            # 기간 내 마지막 복용 예정일 (매일 복용 기준)
+            last_scheduled=Least("end_date", Value(end_date)),
+        )
+        .filter(taken_in_window=0)
+        .filter(
+            Q(last_scheduled__lt=cutoff.date())
+            | Q(last_scheduled=cutoff.date(), alarm_time__lte=cutoff.time())
+            | ~Q(weekday_mask=ALL_WEEKDAYS)
+            | ~Q(interval_days=1)
+        )
+        .order_by("id")
+    )
+
+
+def is_missed_due(medicine, now=None):
+    """
+    기간 내 마지막 복용일의 마지막 복용 시각 + 30분이 지났는지 (복용 규칙 기준)
+    기간 안에 복용일이 없으면 False
+    """
+    start_date, end_date, cutoff = missed_window(now)
+    rule = medicine.rule
+    last_day = rule.last_on_or_before(end_date)
+    if last_day is None or last_day < start_date:
+        return False
+    return datetime.combine(last_day, rule.slots[-1]) <= timezone.make_naive(cutoff)
+
+
+def find_missed_medicines(now=None, medicine_ids=None):
+    """
+    미복용 약 목록 (missed_medicines_queryset 후보 중 is_missed_due 인 약)
+    각 약에 episode_start (마지막 복용 다음날 / 복용 시작일) 를 붙여서 반환
+    """
+    medicines = [med for med in missed_medicines_queryset(now, medicine_ids) if is_missed_due(med, now)]
+
+    # 마지막 복용일이 보관된 달에 있는 약은 DoseArchive 에서
+    archived = [med.id for med in medicines if med.last_taken is None and med.archived_until]
+    if archived:
+        last_taken = last_taken_archived(archived)
+        for med in medicines:
+            med.last_taken = med.last_taken or last_taken.get(med.id)
+
+    missed = []
+    for med in medicines:
+        med.episode_start = (
+            med.last_taken + timedelta(days=1) if med.last_taken else med.start_date
+        )
+        missed.append(med)
+    return missed
+
+
+def check_missed_doses(now=None, log=print, medicine_ids=None):
+    """
+    미복용 약을 찾아 약 주인의 보호자들에게 알림 (같은 미복용 구간은 NotificationLog 로 한 번만)
+    이번 실행에서 새로 확인된 약은 보호자(이메일) 별로 모아서 메일 1통씩 — 약 수가 아니라 보호자 수만큼 발송
+    반환값: 이번 실행에서 적재한 메일 수
+    """
+    missed = find_missed_medicines(now, medicine_ids)
+    if not missed:
+        log("[MISSED_DOSE] 미복용 약 없음")
+        return 0
+
+    # 이미 알림을 보낸 구간은 제외 (쿼리 1번)
+    notified = set(
+        NotificationLog.objects.filter(
+            kind="MISSED_DOSE", medicine_id__in=[med.id for med in missed]
+        ).values_list("medicine_id", "episode_start")
+    )
+    pending = [med for med in missed if (med.id, med.episode_start) not in notified]
+    if not pending:
+        log("[MISSED_DOSE] 새로 알릴 미복용 없음")
+        return 0
+
+    # 약 주인별 보호자 (쿼리 1번)
+    guardians = defaultdict(list)
+    for guardian in (
+        GuardianInfo.objects.filter(user_id__in={med.user_id for med in pending})
+        .exclude(email__isnull=True).exclude(email="")
+        .order_by("id")
+    ):
+        guardians[guardian.user_id].append(guardian)
+
+    # 보호자 이메일 → {medicine_id: (owner_name, medicine_name, episode_start, alarm_time)}
+    # 같은 유저의 보호자 여러 명이 같은 주소면 약 하나당 한 줄만
+    digests = defaultdict(dict)
+    alerted = 0
+    with transaction.atomic():
+        for med in pending:
+            if not guardians[med.user_id]:
+                # 알림 기록을 남기지 않으므로 보호자를 등록하면 다음 실행에서 알림
+                log(f"→ {med.name}: 보호자 정보 없음 → skip")
+                continue
+
+            _, created = NotificationLog.objects.get_or_create(
+                medicine=med, kind="MISSED_DOSE", episode_start=med.episode_start
+            )
+            if not created:
+                continue  # 다른 실행에서 먼저 보냄
+
+            log(f"→ {med.name}: {med.episode_start} 이후 복용 기록 없음!")
+            alerted += 1
+            for guardian in guardians[med.user_id]:
+                digests[guardian.email].setdefault(
+                    med.id, (guardian.owner_name, med.name, med.episode_start, med.alarm_time)
+                )
+
+        # outbox 에 적재만 하므로 느린 SMTP 가 스캔을 막지 않음
+        for email, entries in digests.items():
+            enqueue_missed_digest_email(email, list(entries.values()))
+
+    log(f"[MISSED_DOSE] 미복용 {alerted}건 → 보호자 메일 {len(digests)}통 적재")
+    return len(digests)
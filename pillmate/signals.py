@@ -1,18 +1,54 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from datetime import timedelta
-from .models import Medicine, DailyDose
+
+from .models import Medicine, DailyDose, Device
+from .caching import touch_medicines, touch_schedule_days
+from .devices import invalidate_device
+from .dosing import release_daily_doses
+
+# DailyDose 생성은 Medicine.save() → dosing.sync_daily_doses 에서 한 번만 처리한다.
+# (예전 post_save 수신기는 같은 루프를 한 번 더 돌았기 때문에 제거)
+
+
+@receiver(pre_delete, sender=Medicine)
+def release_medicine_doses(sender, instance, **kwargs):
+    # CASCADE 로 지워질 DailyDose 만큼 날짜별 집계에서 빼준다
+    release_daily_doses(instance)
+
 
 @receiver(post_save, sender=Medicine)
-def create_daily_doses(sender, instance, created, **kwargs):
-    if not created:
-        return
-
-    delta = (instance.end_date - instance.start_date).days
-    for i in range(delta + 1):
-        date = instance.start_date + timedelta(days=i)
-        DailyDose.objects.get_or_create(
-            medicine=instance,
-            date=date,
-            defaults={"quantity": instance.quantity}
-        )
+@receiver(post_delete, sender=Medicine)
+def bump_medicine_schedule(sender, instance, **kwargs):
+    # 약 기간/시간이 바뀌면 아두이노 일정 ETag 무효화
+    touch_medicines(instance.user_id)
+
+
+@receiver(post_save, sender=DailyDose)
+def bump_dose_schedule(sender, instance, **kwargs):
+    # 한 건씩 저장되는 경로 (수정, VIRTUAL materialize) — 그 날짜의 ETag / 조회 캐시 무효화
+    # post_delete 는 달지 않음: 수신기가 있으면 CASCADE/범위 삭제가 row 를 전부 읽어오게 된다.
+    # (삭제는 apply_dose_change / Medicine 수신기, 일괄 UPDATE 는 dosing 에서 직접 무효화)
+    touch_schedule_days(instance.user_id, [instance.date])
+
+
+@receiver(pre_save, sender=Device)
+def remember_device_id(sender, instance, **kwargs):
+    # device_id 를 바꾸는 경우 이전 ID 의 캐시도 지워야 하므로 저장 전 값을 기억
+    instance._previous_device_id = (
+        Device.objects.filter(pk=instance.pk).values_list("device_id", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_cache(sender, instance, **kwargs):
+    # 기기 → 유저 매핑 캐시 무효화 (커밋 후) — 이름이 바뀌었으면 이전 ID 도
+    device_ids = {instance.device_id, getattr(instance, "_previous_device_id", None)} - {None}
+
+    def invalidate():
+        for device_id in device_ids:
+            invalidate_device(device_id)
+
+    transaction.on_commit(invalidate)
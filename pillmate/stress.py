@@ -0,0 +1,316 @@
+import asyncio
+import copy
+import io
+import json
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from .models import Medicine, DailyDose
+
+
+@contextmanager
+def sqlite_file_database(options):
+    """
+    임시 SQLite 파일 DB 로 기본 DB 설정을 잠시 바꾼다.
+    새 스레드가 만드는 연결부터 적용되므로 DB 작업은 모두 _in_thread 로 실행한다.
+    (호출한 스레드의 기존 연결 — 테스트의 in-memory DB 등 — 은 건드리지 않음)
+    뷰가 기본 DB 를 쓰므로 별도 alias 대신 전역 설정을 바꾸고, 끝나면 (실패해도) 원래 dict 내용 그대로 되돌린다.
+    """
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    saved = copy.deepcopy(settings_dict)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict["NAME"] = os.path.join(directory, "stress.sqlite3")
+            settings_dict["OPTIONS"] = dict(options)
+            yield settings_dict["NAME"]
+    finally:
+        # 기존 연결들이 같은 dict 객체를 들고 있으므로 새 dict 로 바꾸지 않고 내용만 복원
+        settings_dict.clear()
+        settings_dict.update(saved)
+
+
+def _in_thread(func, *args, close=True):
+    """새 스레드(= 새 DB 연결)에서 func 실행 후 연결을 닫는다."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["value"] = func(*args)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            if close:
+                connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("value")
+
+
+def _prepare(doses):
+    call_command("migrate", verbosity=0, interactive=False)
+    user = User.objects.create_user(username="stress")
+    today = timezone.localdate()
+    medicine = Medicine.objects.create(
+        user=user, name="스트레스", type="SUPPLEMENT", start_date=today - timedelta(days=doses - 1),
+        end_date=today, time="AFTER_MEAL", alarm_time="09:00",
+    )
+    return list(medicine.daily_doses.order_by("id").values_list("id", flat=True))
+
+
+def _journal_mode():
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        return cursor.fetchone()[0]
+
+
+def _taken_count():
+    return DailyDose.objects.filter(is_taken=True).count()
+
+
+def run_confirm_stress(options, threads=8, confirms=20, batch_size=5):
+    """
+    스레드 threads 개가 동시에 복용 완료를 보낸다. (스레드당 confirms 건)
+    짝수 스레드는 /arduino/confirm/ 1건씩, 홀수 스레드는 /arduino/confirm/batch/ batch_size 건씩.
+    반환값: {"requests", "errors", "taken", "expected", "journal_mode", "elapsed_ms"}
+    """
+    with sqlite_file_database(options):
+        dose_ids = _in_thread(_prepare, threads * confirms)
+        errors = []
+        requests = [0]
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def worker(index):
+            client = Client()
+            mine = dose_ids[index * confirms:(index + 1) * confirms]
+            if index % 2 == 0:
+                calls = [("/medicine/arduino/confirm/", {"dose_id": dose_id}) for dose_id in mine]
+            else:
+                calls = [
+                    ("/medicine/arduino/confirm/batch/", {"events": [{"dose_id": d} for d in mine[i:i + batch_size]]})
+                    for i in range(0, len(mine), batch_size)
+                ]
+
+            start.wait()
+            for url, payload in calls:
+                try:
+                    response = client.post(url, payload, content_type="application/json")
+                    error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                except OperationalError as e:
+                    error = str(e)
+                with lock:
+                    requests[0] += 1
+                    if error:
+                        errors.append(error)
+
+        # 잠금 오류는 결과로 집계하므로 요청마다 찍히는 500 로그는 끔
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            started = time.perf_counter()
+            workers = [threading.Thread(target=_in_thread, args=(worker, i)) for i in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            request_logger.setLevel(level)
+
+        return {
+            "requests": requests[0],
+            "errors": len(errors),
+            "error_samples": sorted(set(errors))[:5],
+            "taken": _in_thread(_taken_count),
+            "expected": len(dose_ids),
+            "journal_mode": _in_thread(_journal_mode),
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+
+
+def _latency_stats(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+def _plan(dose_ids):
+    """today-dose 조회와 confirm 을 번갈아 가며"""
+    return [
+        ("today", None) if i % 2 == 0 else ("confirm", dose_id)
+        for i, dose_id in enumerate(dose_ids)
+    ]
+
+
+def _wsgi_request(app, method, path, body=b""):
+    """WSGI 앱을 직접 호출 (요청이 끝나면 Django 가 DB 연결을 정리함) → status code"""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "testserver",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+    }
+    status = []
+    result = app(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return status[0]
+
+
+async def _asgi_request(app, method, path, body=b""):
+    """ASGI 앱을 직접 호출 (project/asgi.py 와 같은 application) → status code"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    disconnected = asyncio.Event()
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status[0]
+
+
+def _run_sync(plan, workers, client_delay):
+    """동기 뷰를 WSGI 앱으로, 워커 스레드 workers 개 (WSGI 서버의 스레드 풀)"""
+    app = get_wsgi_application()
+    jobs = queue.Queue()
+    for item in plan:
+        jobs.put(item)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                kind, dose_id = jobs.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            # 느린 기기 연결이 워커 스레드를 붙잡고 있는 시간
+            time.sleep(client_delay)
+            if kind == "today":
+                code = _wsgi_request(app, "GET", "/medicine/arduino/sync/today-dose/")
+            else:
+                body = json.dumps({"dose_id": dose_id}).encode()
+                code = _wsgi_request(app, "POST", "/medicine/arduino/sync/confirm/", body)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                errors[0] += code != 200
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_in_thread, args=(worker,)) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _latency_stats(latencies, time.perf_counter() - started, errors[0])
+
+
+def _run_async(plan, concurrency, client_delay):
+    """async 뷰를 ASGI 앱으로, 이벤트 루프 1개에서 동시 연결 concurrency 개"""
+    app = get_asgi_application()
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        latencies, errors = [], [0]
+
+        async def one(kind, dose_id):
+            async with slots:
+                started = time.perf_counter()
+                # 느린 기기 연결 — 코루틴만 기다리고 스레드는 다른 요청을 처리
+                await asyncio.sleep(client_delay)
+                if kind == "today":
+                    code = await _asgi_request(app, "GET", "/medicine/arduino/today-dose/")
+                else:
+                    body = json.dumps({"dose_id": dose_id}).encode()
+                    code = await _asgi_request(app, "POST", "/medicine/arduino/confirm/", body)
+                latencies.append(time.perf_counter() - started)
+                errors[0] += code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(kind, dose_id) for kind, dose_id in plan))
+        return _latency_stats(latencies, time.perf_counter() - started, errors[0])
+
+    # DB 연결은 요청마다 Django 가 열고 닫으므로 이벤트 루프 스레드에는 남는 연결이 없음
+    return _in_thread(asyncio.run, main(), close=False)
+
+
+def run_async_comparison(requests=200, workers=4, concurrency=50, client_delay=0.05, options=None):
+    """
+    같은 요청 묶음(today-dose 조회 / confirm 반반)을
+    - sync : 동기 뷰 + 워커 스레드 workers 개
+    - async: async 뷰 + 이벤트 루프 1개, 동시 concurrency 개
+    로 처리한 처리량 비교. client_delay(초) 는 요청마다 느린 기기 연결이 붙잡는 시간.
+    반환값: {"sync": {...}, "async": {...}}
+    """
+    options = settings.SQLITE_TUNED_OPTIONS if options is None else options
+    with sqlite_file_database(options):
+        dose_ids = _in_thread(_prepare, requests * 2)
+        return {
+            "sync": _run_sync(_plan(dose_ids[:requests]), workers, client_delay),
+            "async": _run_async(_plan(dose_ids[requests:]), concurrency, client_delay),
+        }
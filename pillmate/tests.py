@@ -1,3 +1,1410 @@
-from django.test import TestCase
+import asyncio
+import json
+import math
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.core.mail.backends import locmem
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .archive import archive_doses
+from .caching import MEDICINE_EPOCH_KEY
+from .adherence import daily_counts, summary_rows, verify_summary, virtual_pending
+from .analytics import medicine_stats
+from .benchmarks import compare_results, run_benchmarks
+from .metrics import CACHE_REQUESTS, EMAILS, SQL_QUERIES, TASK_DURATION
+from .devices import clear_local_cache, resolve_device_user
+from .dosing import mark_dose_taken, materialize_dose, stored_doses_for_date
+from .ingestion import ingest_events, reconcile_logs
+from .models import Medicine, DailyDose, DailyAdherenceSummary, DoseArchive, DoseLog, Device, GuardianInfo, MedicineLog, NotificationLog, EmailOutbox
+from .pagination import KeysetPagination
+from .pubsub import broker, Broker, SCHEDULE_CHANNEL
+from .recurrence import ALL_WEEKDAYS, compile_rule
+from .seeding import seed
+from .stress import run_async_comparison, run_confirm_stress, sqlite_file_database
+from .scheduler import AlarmScheduler, ALARM, GRACE
+from .services import (
+    check_missed_doses, find_missed_medicines, missed_medicines_queryset,
+    enqueue_email, claim_outbox, deliver_outbox, drain_outbox, OUTBOX_CLAIM_TIMEOUT,
+)
+
+
+def make_medicine(user, start, days, **kwargs):
+    fields = {
+        "name": "비타민",
+        "type": "SUPPLEMENT",
+        "quantity": 1,
+        "start_date": start,
+        "end_date": start + timedelta(days=days - 1),
+        "time": "AFTER_MEAL",
+        "alarm_time": time(9, 0),
+    }
+    fields.update(kwargs)
+    return Medicine.objects.create(user=user, **fields)
+
+
+class DailyDoseMaterializationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.start = date(2025, 11, 1)
+
+    def test_create_makes_one_dose_per_day(self):
+        med = make_medicine(self.user, self.start, 30)
+        dates = list(med.daily_doses.values_list("date", flat=True))
+        self.assertEqual(len(dates), 30)
+        self.assertEqual(dates[0], self.start)
+        self.assertEqual(dates[-1], self.start + timedelta(days=29))
+
+    def test_query_count_is_bounded_by_insert_batches(self):
+        def inserts(model, rows):
+            # bulk_create 는 DB 변수 한도 (SQLite 999) 로 batch 를 나눔 — DailyDose 142 / 집계 249 row 씩
+            fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+            return math.ceil(rows / connection.ops.bulk_batch_size(fields, [None] * rows))
+
+        # 고정 4번 (savepoint, Medicine INSERT, 집계 UPDATE, release) + DailyDose / 집계 INSERT batch
+        for days in (1, 140, 365, 1095):
+            with self.assertNumQueries(4 + inserts(DailyDose, days) + inserts(DailyAdherenceSummary, days)):
+                make_medicine(self.user, self.start, days)
+
+        med = Medicine.objects.last()
+        med.quantity = 2
+        med.end_date = med.end_date + timedelta(days=30)
+        with self.assertNumQueries(8):
+            med.save()
+
+    def test_edit_shrinks_range_and_keeps_taken_state(self):
+        med = make_medicine(self.user, self.start, 10)
+        DailyDose.objects.filter(medicine=med, date=self.start + timedelta(days=2)).update(is_taken=True)
+
+        med.start_date = self.start + timedelta(days=2)
+        med.end_date = self.start + timedelta(days=5)
+        med.quantity = 3
+        med.save()
+
+        doses = list(med.daily_doses.all())
+        self.assertEqual([d.date for d in doses], [self.start + timedelta(days=i) for i in range(2, 6)])
+        self.assertTrue(all(d.quantity == 3 for d in doses))
+        self.assertTrue(doses[0].is_taken)
+
+
+class MedicineLogsTests(TestCase):
+    def setUp(self):
+        cache.clear()  # 조회 캐시 (on_commit 이 돌지 않아 버전이 안 바뀜)
+        self.user = User.objects.create(id=1, username="tester")
+        self.med = make_medicine(self.user, date(2025, 11, 1), 10)
+        for dose in self.med.daily_doses.filter(date__lte=date(2025, 11, 3)):
+            mark_dose_taken(dose)
+
+    def test_month_is_constant_queries(self):
+        # 비로그인 기본 유저 조회 1 + 집계 1 + VIRTUAL 약 1
+        with self.assertNumQueries(3):
+            res = self.client.get("/medicine/logs/", {"year": 2025, "month": 11})
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual(len(data), 30)
+        self.assertEqual(data[0], {"date": "2025-11-01", "taken": 1, "missed": 0})
+        self.assertEqual(data[5], {"date": "2025-11-06", "taken": 0, "missed": 1})
+        self.assertEqual(data[20], {"date": "2025-11-21", "taken": 0, "missed": 0})
+
+    def test_year_range(self):
+        with self.assertNumQueries(3):
+            res = self.client.get("/medicine/logs/", {"year": 2025})
+        data = res.json()
+        self.assertEqual(len(data), 365)
+        self.assertEqual(sum(d["taken"] for d in data), 3)
+        self.assertEqual(sum(d["missed"] for d in data), 7)
+
+    def test_start_end_range(self):
+        res = self.client.get("/medicine/logs/", {"start": "2025-10-31", "end": "2025-11-02"})
+        self.assertEqual([d["taken"] for d in res.json()], [0, 1, 1])
+
+    def test_invalid_range(self):
+        res = self.client.get("/medicine/logs/", {"start": "2025-11-02", "end": "2025-11-01"})
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get("/medicine/logs/", {"start": "2024-01-01", "end": "2025-12-31"})
+        self.assertEqual(res.status_code, 400)
+
+
+class DoseArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.today = date(2025, 12, 15)
+        # 10/25 ~ 11/5 (12일) — 10월, 11월 1~5일
+        self.med = make_medicine(self.user, date(2025, 10, 25), 12)
+        self.virtual = make_medicine(self.user, date(2025, 10, 25), 12, name="감기약", schedule_mode="VIRTUAL")
+        for day in (date(2025, 10, 26), date(2025, 11, 2)):
+            mark_dose_taken(self.med.daily_doses.get(date=day))
+            DoseLog.objects.create(medicine=self.med, taken_at=timezone.make_aware(datetime.combine(day, time(9))))
+        mark_dose_taken(materialize_dose(self.virtual, date(2025, 10, 27)))
+
+    def archive(self, keep_months=2):
+        return archive_doses(keep_months=keep_months, today=self.today)
+
+    def test_archive_moves_finished_months(self):
+        before = daily_counts(self.user.id, date(2025, 10, 20), date(2025, 11, 10))
+
+        # 11월 ~ 12월은 남기고 10월만 보관
+        result = self.archive()
+        self.assertEqual(result, {"medicines": 2, "archives": 2, "doses": 8, "logs": 1})
+        self.assertFalse(DailyDose.objects.filter(date__lt=date(2025, 11, 1)).exists())
+        self.assertEqual(DoseLog.objects.count(), 1)
+
+        archive = DoseArchive.objects.get(medicine=self.med)
+        self.assertEqual((archive.month, archive.scheduled, archive.taken), (date(2025, 10, 1), 7, 1))
+        self.assertEqual(archive.taken_mask, 1 << 25)
+
+        self.assertEqual(daily_counts(self.user.id, date(2025, 10, 20), date(2025, 11, 10)), before)
+        self.assertEqual(verify_summary(), [])
+        # 다시 돌려도 그대로
+        self.assertEqual(self.archive()["medicines"], 0)
+
+    def test_history_reads_fall_back_to_archive(self):
+        self.archive()
+        res = self.client.get("/medicine/daily-dose/", {"date": "2025-10-26"})
+        doses = {d["medicine"]["name"]: d for d in res.json()}
+        self.assertIsNone(doses["비타민"]["id"])
+        self.assertTrue(doses["비타민"]["is_taken"])
+        self.assertFalse(doses["감기약"]["is_taken"])   # VIRTUAL, row 없던 날 → 미복용
+
+        res = self.client.get("/medicine/daily-dose/", {"date": "2025-10-27", "view": "compact"})
+        self.assertEqual(sorted(d["is_taken"] for d in res.json()["doses"]), [False, True])
+
+    def test_sync_and_materialize_skip_archived_days(self):
+        self.archive()
+        med = Medicine.objects.get(pk=self.med.pk)
+        self.assertEqual(med.archived_until, date(2025, 10, 31))
+
+        med.quantity = 2
+        med.save()
+        self.assertFalse(med.daily_doses.filter(date__lt=date(2025, 11, 1)).exists())
+        with self.assertRaises(ValueError):
+            materialize_dose(Medicine.objects.get(pk=self.virtual.pk), date(2025, 10, 28))
+        self.assertEqual(verify_summary(), [])
+
+        med.delete()
+        self.assertEqual(verify_summary(), [])
+        self.assertFalse(DoseArchive.objects.filter(medicine_id=self.med.pk).exists())
+
+    def test_async_and_sync_today_doses_match_on_archived_day(self):
+        # 보관된 날짜도 async / sync 아두이노 일정이 같음 (보관 dose + VIRTUAL 미복용)
+        self.archive()
+        with mock.patch("pillmate.views.timezone", wraps=timezone) as views_timezone:
+            views_timezone.localdate.return_value = date(2025, 10, 27)   # 뷰의 "오늘" 만 보관된 날짜로
+            res = self.client.get("/medicine/arduino/today-dose/").json()
+            self.assertEqual(res, self.client.get("/medicine/arduino/sync/today-dose/").json())
+        self.assertEqual(sorted((d["name"], d["is_taken"]) for d in res["doses"]), [("감기약", True), ("비타민", False)])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.med = make_medicine(self.user, date(2025, 10, 30), 4)   # 10/30 ~ 11/2
+        self.other = make_medicine(self.user, date(2025, 11, 1), 1, name="감기약")
+        mark_dose_taken(self.med.daily_doses.get(date=date(2025, 10, 31)))
+        DoseLog.objects.create(medicine=self.med, taken_at=timezone.make_aware(datetime(2025, 11, 1, 9)))
+        archive_doses(keep_months=2, today=date(2025, 12, 15))   # 10월 보관
+
+    def test_csv_streams_archived_and_live_rows(self):
+        res = self.client.get("/medicine/daily-dose/export/")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertIn("attachment", res["Content-Disposition"])
+
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "record,date,slot_time,medicine_id,medicine,quantity,is_taken,taken_at,source,archived")
+        body = [line.split(",") for line in lines[1:]]
+        self.assertEqual([(r[0], r[1], r[9]) for r in body], [
+            ("dose", "2025-10-30", "True"),
+            ("dose", "2025-10-31", "True"),
+            ("dose", "2025-11-01", "False"),
+            ("dose", "2025-11-01", "False"),
+            ("dose", "2025-11-02", "False"),
+            ("log", "2025-11-01", "False"),
+        ])
+        self.assertEqual(body[1][6], "True")
+        self.assertEqual(body[1][2], "09:00")
+
+    def test_ndjson_with_filters(self):
+        res = self.client.get("/medicine/daily-dose/export/", {
+            "output": "ndjson", "start": "2025-10-31", "end": "2025-11-01", "medicine_id": self.med.id,
+        })
+        rows = [json.loads(line) for line in b"".join(res.streaming_content).decode().splitlines()]
+        self.assertEqual([(r["record"], r["date"]) for r in rows], [
+            ("dose", "2025-10-31"), ("dose", "2025-11-01"), ("log", "2025-11-01"),
+        ])
+        self.assertEqual(rows[2]["source"], "ARDUINO")
+
+        self.assertEqual(self.client.get("/medicine/daily-dose/export/", {"output": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/medicine/daily-dose/export/", {"start": "2025-13-01"}).status_code, 400)
+
+    def test_command_writes_ndjson(self):
+        out = StringIO()
+        call_command("export_adherence", user=self.user.id, output="ndjson", medicine=self.other.id, stdout=out)
+        self.assertEqual([json.loads(line)["date"] for line in out.getvalue().splitlines()], ["2025-11-01"])
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.today = timezone.localdate()
+        self.start = self.today - timedelta(days=9)
+        self.med = make_medicine(self.user, self.start, 10)   # 오늘까지 10일
+        self.virtual = make_medicine(self.user, self.start, 30, name="유산균", schedule_mode="VIRTUAL")
+
+        # 비타민: 0~2일, 5~8일 복용 (오늘 미복용) / 알람 09:00 기준 +10분, 마지막 날만 -40분
+        for i in [0, 1, 2, 5, 6, 7, 8]:
+            day = self.start + timedelta(days=i)
+            minutes = -40 if i == 8 else 10
+            taken_at = timezone.make_aware(datetime.combine(day, time(9))) + timedelta(minutes=minutes)
+            mark_dose_taken(self.med.daily_doses.get(date=day), taken_at)
+        mark_dose_taken(materialize_dose(self.virtual, self.start))
+
+    def get(self, **params):
+        params = params or {"start": self.start.isoformat(), "end": self.today.isoformat()}
+        return self.client.get("/medicine/stats/", params)
+
+    def test_rates_streaks_and_timing(self):
+        res = self.get()
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        stats = {m["name"]: m for m in data["medicines"]}
+
+        med = stats["비타민"]
+        self.assertEqual((med["scheduled"], med["taken"], med["adherence"]), (10, 7, 70.0))
+        # 오늘은 아직 안 먹었으므로 어제까지 4일 연속
+        self.assertEqual((med["longest_streak"], med["current_streak"]), (4, 4))
+        self.assertEqual(med["timing"]["samples"], 7)
+        self.assertEqual(med["timing"]["median_minutes"], 10)
+        self.assertEqual(med["timing"]["buckets"]["on_time"], 6)
+        self.assertEqual(med["timing"]["buckets"]["early"], 1)
+
+        virtual = stats["유산균"]
+        self.assertEqual((virtual["scheduled"], virtual["taken"]), (10, 1))
+        self.assertEqual((virtual["longest_streak"], virtual["current_streak"]), (1, 0))
+        self.assertEqual(data["overall"], {"scheduled": 20, "taken": 8, "adherence": 40.0})
+
+    def test_cached_until_dose_changes(self):
+        self.get()
+        with self.assertNumQueries(1):   # 비로그인 기본 유저 조회만
+            self.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_dose_taken(self.med.daily_doses.get(date=self.today))
+        med = next(m for m in self.get().json()["medicines"] if m["name"] == "비타민")
+        self.assertEqual(med["current_streak"], 5)
+
+    def test_invalid_range(self):
+        self.assertEqual(self.get(start="2025-11-02", end="2025-11-01").status_code, 400)
+
+
+class AdherenceSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.start = date(2025, 11, 1)
+        self.med = make_medicine(self.user, self.start, 5)
+
+    def summary(self):
+        return {
+            s.date: (s.scheduled, s.taken)
+            for s in DailyAdherenceSummary.objects.filter(user=self.user).exclude(scheduled=0, taken=0)
+        }
+
+    def test_materialization_updates_summary(self):
+        make_medicine(self.user, self.start, 2, name="감기약")
+        self.assertEqual(self.summary()[self.start], (2, 0))
+        self.assertEqual(self.summary()[self.start + timedelta(days=4)], (1, 0))
+
+        self.med.end_date = self.start + timedelta(days=2)
+        self.med.save()
+        self.assertNotIn(self.start + timedelta(days=4), self.summary())
+        self.assertEqual(verify_summary(self.user.id), [])
+
+        self.med.delete()
+        self.assertEqual(self.summary(), {self.start: (1, 0), self.start + timedelta(days=1): (1, 0)})
+
+    def test_take_and_confirm_count_once(self):
+        dose = self.med.daily_doses.get(date=self.start)
+        self.client.patch(f"/medicine/daily-dose/{dose.id}/take/")
+        self.client.patch(f"/medicine/daily-dose/{dose.id}/take/")
+        self.client.post("/medicine/arduino/confirm/", {"dose_id": dose.id})
+        self.assertEqual(self.summary()[self.start], (1, 1))
+
+        other = self.med.daily_doses.get(date=self.start + timedelta(days=1))
+        self.client.post("/medicine/arduino/confirm/", {"dose_id": other.id})
+        self.assertEqual(self.summary()[self.start + timedelta(days=1)], (1, 1))
+        self.assertEqual(verify_summary(), [])
+
+    def test_rebuild_and_verify_command(self):
+        DailyDose.objects.filter(medicine=self.med).update(is_taken=True)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_adherence", "--verify", stdout=StringIO())
+
+        call_command("rebuild_adherence", stdout=StringIO())
+        call_command("rebuild_adherence", "--verify", stdout=StringIO())
+        self.assertEqual(self.summary()[self.start], (1, 1))
+
+
+class VirtualScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.today = timezone.localdate()
+        self.med = make_medicine(
+            self.user, self.today - timedelta(days=10), 3650, schedule_mode="VIRTUAL"
+        )
+
+    def test_no_rows_until_taken(self):
+        self.assertFalse(self.med.daily_doses.exists())
+
+        res = self.client.get("/medicine/arduino/today-dose/")
+        doses = res.json()["doses"]
+        self.assertEqual(len(doses), 1)
+        self.assertIsNone(doses[0]["dose_id"])
+
+        res = self.client.post("/medicine/arduino/confirm/", {"medicine_id": self.med.id})
+        self.assertEqual(res.status_code, 200)
+        dose = self.med.daily_doses.get()
+        self.assertTrue(dose.is_taken)
+
+        res = self.client.get("/medicine/daily-dose/", {"date": self.today.isoformat()})
+        self.assertEqual([d["id"] for d in res.json()], [dose.id])
+
+    def test_take_virtual_outside_range(self):
+        res = self.client.patch(
+            "/medicine/daily-dose/take/",
+            {"medicine_id": self.med.id, "date": "2000-01-01"},
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(self.med.daily_doses.exists())
+
+    def test_take_virtual_rejects_malformed_date(self):
+        res = self.client.patch(
+            "/medicine/daily-dose/take/",
+            {"medicine_id": self.med.id, "date": "11/18/2025"},
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(self.med.daily_doses.exists())
+
+    def test_logs_count_virtual_doses(self):
+        yesterday = self.today - timedelta(days=1)
+        mark_dose_taken(materialize_dose(self.med, yesterday))
+
+        counts = {
+            d["date"]: (d["taken"], d["missed"])
+            for d in daily_counts(self.user.id, self.today - timedelta(days=12), self.today)
+        }
+        self.assertEqual(counts[yesterday.isoformat()], (1, 0))
+        self.assertEqual(counts[self.today.isoformat()], (0, 1))
+        self.assertEqual(counts[(self.today - timedelta(days=11)).isoformat()], (0, 0))
+        self.assertEqual(verify_summary(), [])
+
+    def test_switch_to_virtual_prunes_untaken_rows(self):
+        med = make_medicine(self.user, self.today, 5, name="감기약")
+        mark_dose_taken(med.daily_doses.get(date=self.today))
+
+        med.schedule_mode = "VIRTUAL"
+        med.save()
+        self.assertEqual(list(med.daily_doses.values_list("date", flat=True)), [self.today])
+        self.assertEqual(verify_summary(), [])
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.monday = date(2025, 11, 10)
+
+    def test_compiled_rule_matches_day_loop(self):
+        start, end = date(2025, 11, 5), date(2026, 2, 20)
+        for mask, interval in [(ALL_WEEKDAYS, 1), (0b0010101, 1), (ALL_WEEKDAYS, 3), (0b1100000, 2), (0b0000001, 10)]:
+            rule = compile_rule(start, end, (time(8, 0),), mask, interval)
+            expected = [
+                start + timedelta(days=i) for i in range((end - start).days + 1)
+                if i % interval == 0 and mask >> (start + timedelta(days=i)).weekday() & 1
+            ]
+            window = (date(2025, 12, 1), date(2026, 3, 1))
+            self.assertEqual(rule.dates(*window), [d for d in expected if d >= window[0]])
+            self.assertEqual(rule.count(start - timedelta(days=5), end), len(expected))
+            self.assertEqual([rule.index(d) for d in expected], list(range(1, len(expected) + 1)))
+            for d in (start, date(2025, 12, 24), end, end + timedelta(days=3)):
+                self.assertEqual(rule.occurs(d), d in expected)
+                self.assertEqual(rule.last_on_or_before(d), max((e for e in expected if e <= d), default=None))
+
+    def test_eager_medicine_materializes_slots(self):
+        med = make_medicine(
+            self.user, self.monday, 14, slot_times=["20:00", "08:00", "13:00"], weekday_mask=0b0010101,
+        )
+        self.assertEqual(med.slot_times, ["08:00", "13:00", "20:00"])
+        self.assertEqual(med.alarm_time, time(8, 0))
+
+        rows = list(med.daily_doses.values_list("date", "slot_time"))
+        self.assertEqual(len(rows), 6 * 3)   # 월/수/금 × 2주 × 하루 3번
+        self.assertEqual({d.weekday() for d, _ in rows}, {0, 2, 4})
+        self.assertEqual(rows[:3], [(self.monday, time(8, 0)), (self.monday, time(13, 0)), (self.monday, time(20, 0))])
+
+        mark_dose_taken(med.daily_doses.get(date=self.monday, slot_time=time(13, 0)))
+        last = self.monday + timedelta(days=13)
+        stats = medicine_stats(self.user.id, self.monday, last, today=last)
+        self.assertEqual((stats["overall"]["scheduled"], stats["overall"]["taken"]), (18, 1))
+        self.assertEqual(stats["medicines"][0]["longest_streak"], 0)   # 하루 3번을 다 먹어야 복용일
+
+        # 규칙에서 빠진 요일 / 복용 시각 row 는 기간을 줄일 때처럼 삭제
+        mark_dose_taken(med.daily_doses.get(date=self.monday, slot_time=time(8, 0)))
+        med.weekday_mask = 0b0000001
+        med.slot_times = ["08:00"]
+        med.save()
+        self.assertEqual(
+            list(med.daily_doses.values_list("date", "slot_time", "is_taken")),
+            [(self.monday, time(8, 0), True), (self.monday + timedelta(days=7), time(8, 0), False)],
+        )
+        self.assertEqual(verify_summary(), [])
+
+    def test_alarm_seconds_are_dropped(self):
+        med = make_medicine(self.user, self.monday, 4, alarm_time="09:00:30")
+        self.assertEqual(med.alarm_time, time(9, 0))
+        med.daily_doses.update(is_taken=True)
+
+        med.quantity = 2
+        med.save()
+        self.assertEqual(list(med.daily_doses.values_list("slot_time", "is_taken", "quantity").order_by().distinct()),
+                         [(time(9, 0), True, 2)])
+
+    def test_today_dose_lists_slots_and_confirms_in_order(self):
+        today = timezone.localdate()
+        med = make_medicine(self.user, today, 30, schedule_mode="VIRTUAL", slot_times=["21:00", "07:30"])
+
+        doses = self.client.get("/medicine/arduino/today-dose/").json()["doses"]
+        self.assertEqual([(d["alarm_time"], d["dose_id"]) for d in doses], [("07:30", None), ("21:00", None)])
+
+        self.client.post("/medicine/arduino/confirm/", {"medicine_id": med.id})
+        self.client.post("/medicine/arduino/confirm/", {"medicine_id": med.id})
+        self.assertEqual(
+            list(med.daily_doses.values_list("slot_time", "is_taken")),
+            [(time(7, 30), True), (time(21, 0), True)],
+        )
+        res = self.client.post("/medicine/arduino/confirm/", {"medicine_id": med.id, "slot_time": "12:00"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(verify_summary(), [])
+
+    def test_device_logs_match_nearest_slot(self):
+        device = Device.objects.create(device_id="box-1", user=self.user)
+        eager = make_medicine(self.user, self.monday, 3, slot_times=["08:00", "20:00"])
+        virtual = make_medicine(self.user, self.monday, 3, name="유산균", schedule_mode="VIRTUAL", slot_times=["08:00", "20:00"])
+        for name, hour in [("비타민", 19), ("비타민", 21), ("유산균", 21)]:
+            at = timezone.make_aware(datetime.combine(self.monday, time(hour, 0)))
+            MedicineLog.objects.create(device=device, medicine=name, taken=True, timestamp=at)
+
+        totals = reconcile_logs(now=timezone.make_aware(datetime(2025, 11, 11)))
+        self.assertEqual(totals, {"reconciled": 3, "taken": 3, "unmatched": 0})
+        # 같은 묶음의 로그 2개는 같은 dose 에 겹치지 않고 20:00 → 08:00 순으로 가까운 남은 slot 에
+        self.assertEqual(
+            list(eager.daily_doses.filter(date=self.monday, is_taken=True).values_list("slot_time", flat=True)),
+            [time(8, 0), time(20, 0)],
+        )
+        self.assertEqual(list(virtual.daily_doses.values_list("slot_time", flat=True)), [time(20, 0)])
+        self.assertEqual(verify_summary(), [])
+
+    def test_missed_check_follows_rule(self):
+        now = timezone.make_aware(datetime(2025, 11, 20, 12, 0))   # 목요일
+        twice = make_medicine(self.user, self.monday, 30, name="하루2번", slot_times=["09:00", "21:00"])
+        monday_only = make_medicine(self.user, self.monday, 30, name="월요일약", weekday_mask=0b0000001)
+        every_other = make_medicine(self.user, self.monday, 30, name="격일약", interval_days=2)
+
+        with self.assertNumQueries(1):
+            missed = find_missed_medicines(now)
+        # 하루2번: 오늘 21:30 이 아직 / 월요일약: 최근 3일 중 복용일 없음 / 격일약: 11/20 09:30 지남
+        self.assertEqual([m.id for m in missed], [every_other.id])
+        self.assertEqual(
+            [m.id for m in find_missed_medicines(now + timedelta(hours=10))], [twice.id, every_other.id]
+        )
+        self.assertIn(monday_only.id, [m.id for m in find_missed_medicines(now + timedelta(days=4))])
+
+
+class TodayDoseETagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med = make_medicine(self.user, self.today, 3)
+
+    def get(self, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return self.client.get("/medicine/arduino/today-dose/", headers=headers)
+
+    def test_not_modified_without_db(self):
+        etag = self.get()["ETag"]
+        with self.assertNumQueries(0):
+            res = self.get(etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+    def test_take_changes_etag(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_dose_taken(self.med.daily_doses.get(date=self.today))
+
+        res = self.get(etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertTrue(res.json()["doses"][0]["is_taken"])
+
+    def test_medicine_edit_changes_etag(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med.alarm_time = time(21, 0)
+            self.med.save()
+        self.assertEqual(self.get(etag).status_code, 200)
+
+
+class AsyncArduinoViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.today = timezone.localdate()
+        self.med = make_medicine(self.user, self.today, 3)
+        self.virtual = make_medicine(self.user, self.today, 3, name="감기약", schedule_mode="VIRTUAL")
+
+    def test_async_and_sync_today_doses_match(self):
+        res = self.client.get("/medicine/arduino/today-dose/")
+        self.assertEqual(res.json(), self.client.get("/medicine/arduino/sync/today-dose/").json())
+        self.assertEqual(len(res.json()["doses"]), 2)
+
+    def test_async_confirm_json_and_form(self):
+        dose = self.med.daily_doses.get(date=self.today)
+        res = self.client.post("/medicine/arduino/confirm/", {"dose_id": dose.id}, content_type="application/json")
+        self.assertEqual(res.status_code, 200)
+        res = self.client.post("/medicine/arduino/confirm/", {"medicine_id": self.virtual.id})
+        self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(DoseLog.objects.filter(source="ARDUINO").count(), 2)
+        self.assertTrue(self.virtual.daily_doses.get(date=self.today).is_taken)
+        self.assertEqual(verify_summary(), [])
+
+    def test_async_confirm_rejects_bad_input(self):
+        self.assertEqual(self.client.get("/medicine/arduino/confirm/").status_code, 405)
+        self.assertEqual(self.client.post("/medicine/arduino/confirm/", {}).status_code, 400)
+        self.assertEqual(self.client.post("/medicine/arduino/confirm/", {"dose_id": 999999}).status_code, 404)
+
+
+class ScheduleStreamTests(SimpleTestCase):
+    async def test_broker_fan_out(self):
+        local = Broker()
+        subs = [local.subscribe("a") for _ in range(1000)]
+        other = local.subscribe("b")
+
+        self.assertEqual(local.publish("a", {"n": 1}), 1000)
+        for sub in subs:
+            self.assertEqual(await sub.get(timeout=1), {"n": 1})
+        self.assertTrue(other.queue.empty())
+
+        for sub in subs:
+            local.unsubscribe(sub)
+        self.assertEqual(local.subscriber_count(), 1)
+
+    async def test_stream_pushes_schedule_changes(self):
+        response = await self.async_client.get("/medicine/arduino/stream/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+
+        first = await anext(stream)
+        self.assertIn(b"event: schedule", first)
+        self.assertEqual(broker.subscriber_count(SCHEDULE_CHANNEL), 1)
+
+        today = timezone.localdate().isoformat()
+        await sync_to_async(broker.publish)(SCHEDULE_CHANNEL, {"type": "schedule", "date": today})
+        pushed = await anext(stream)
+        self.assertIn(today.encode(), pushed)
+
+        # 기기 연결이 끊기면 (ASGI 가 태스크를 취소) 구독 해제
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(broker.subscriber_count(SCHEDULE_CHANNEL), 0)
+
+
+class ConfirmBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.start = date(2025, 11, 1)
+        self.med = make_medicine(self.user, self.start, 30)
+        self.doses = list(self.med.daily_doses.all())
+
+    def post(self, events):
+        return self.client.post(
+            "/medicine/arduino/confirm/batch/", {"events": events}, content_type="application/json"
+        )
+
+    def test_applies_backlog_with_device_timestamps(self):
+        mark_dose_taken(self.doses[0])
+        events = [
+            {"dose_id": dose.id, "taken_at": f"{dose.date.isoformat()}T09:05:00+09:00"}
+            for dose in self.doses
+        ]
+        events += [{"dose_id": self.doses[1].id}, {"dose_id": 999999}, {"taken_at": "x"}]
+
+        with self.assertNumQueries(7):
+            res = self.post(events)
+        body = res.json()
+        statuses = [r["status"] for r in body["results"]]
+        self.assertEqual(body["taken"], 29)
+        self.assertEqual(statuses[0], "already_taken")
+        self.assertEqual(statuses[1:30], ["taken"] * 29)
+        self.assertEqual(statuses[30:], ["already_taken", "not_found", "invalid"])
+
+        dose = DailyDose.objects.get(pk=self.doses[5].pk)
+        self.assertEqual(timezone.localtime(dose.taken_at).time(), time(9, 5))
+        self.assertEqual(DoseLog.objects.filter(medicine=self.med).count(), 29)
+        self.assertEqual(verify_summary(), [])
+
+        # 같은 backlog 재전송은 아무것도 바꾸지 않음
+        self.assertEqual(self.post(events).json()["taken"], 0)
+        self.assertEqual(DoseLog.objects.count(), 29)
+
+    def test_rejects_empty_or_oversized(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{"dose_id": 1}] * 501).status_code, 400)
+
+
+class DeviceEndpointTests(TestCase):
+    def setUp(self):
+        clear_local_cache()
+        self.today = timezone.localdate()
+        self.user = User.objects.create(username="patient")
+        self.other = User.objects.create(username="other")
+        with self.captureOnCommitCallbacks(execute=True):
+            Device.objects.create(device_id="box-1", user=self.user)
+        self.med = make_medicine(self.user, self.today, 3)
+        self.other_med = make_medicine(self.other, self.today, 3, name="다른 약")
+
+    def test_today_doses_scoped_to_device_user(self):
+        res = self.client.get("/medicine/arduino/devices/box-1/today-dose/")
+        self.assertEqual([d["medicine_id"] for d in res.json()["doses"]], [self.med.id])
+        self.assertEqual(self.client.get("/medicine/arduino/devices/nope/today-dose/").status_code, 404)
+
+    def test_device_lookup_is_cached_and_invalidated(self):
+        self.client.get("/medicine/arduino/devices/box-1/today-dose/")
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_device_user("box-1"), self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Device.objects.filter(device_id="box-1").get().delete()
+        self.assertIsNone(resolve_device_user("box-1"))
+
+    def test_renamed_device_drops_old_id(self):
+        self.assertEqual(resolve_device_user("box-1"), self.user.id)
+        device = Device.objects.get(device_id="box-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            device.device_id = "box-2"
+            device.save()
+        self.assertIsNone(resolve_device_user("box-1"))
+        self.assertEqual(resolve_device_user("box-2"), self.user.id)
+
+    def test_confirm_rejects_other_users_dose(self):
+        other_dose = self.other_med.daily_doses.get(date=self.today)
+        res = self.client.post("/medicine/arduino/devices/box-1/confirm/", {"dose_id": other_dose.id})
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client.post(
+            "/medicine/arduino/devices/box-1/confirm/batch/",
+            {"events": [{"dose_id": other_dose.id}, {"dose_id": self.med.daily_doses.get(date=self.today).id}]},
+            content_type="application/json",
+        )
+        self.assertEqual([r["status"] for r in res.json()["results"]], ["not_found", "taken"])
+        self.assertFalse(DailyDose.objects.get(pk=other_dose.pk).is_taken)
+
+    def test_other_users_change_keeps_etag(self):
+        etag = self.client.get("/medicine/arduino/devices/box-1/today-dose/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_dose_taken(self.other_med.daily_doses.get(date=self.today))
+        res = self.client.get("/medicine/arduino/devices/box-1/today-dose/", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+
+class MedicineLogIngestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.user = User.objects.create(username="patient")
+        self.device = Device.objects.create(device_id="box-1", user=self.user)
+        self.med = make_medicine(self.user, self.today - timedelta(days=2), 3)
+        self.virtual = make_medicine(self.user, self.today - timedelta(days=2), 3, name="유산균", schedule_mode="VIRTUAL")
+
+    def event(self, name, day, taken=True, hour=9):
+        at = timezone.make_aware(datetime.combine(day, time(hour, 0)))
+        return json.dumps({"medicine": name, "taken": taken, "timestamp": at.isoformat()}, ensure_ascii=False)
+
+    def upload(self, lines, device_id="box-1"):
+        return self.client.post(
+            f"/medicine/arduino/devices/{device_id}/logs/",
+            "\n".join(lines).encode(), content_type="application/x-ndjson",
+        )
+
+    def test_upload_dedupes_and_reports_invalid_lines(self):
+        yesterday = self.today - timedelta(days=1)
+        lines = [self.event("비타민", yesterday), "{bad", self.event("비타민", yesterday), self.event("비타민", self.today)]
+        res = self.upload(lines)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["accepted"], 3)
+        self.assertEqual(res.json()["errors"], [{"line": 2, "error": "JSON 형식이 올바르지 않습니다."}])
+
+        # 재전송해도 그대로
+        self.upload(lines)
+        self.assertEqual(MedicineLog.objects.count(), 2)
+        # 업로드만으로는 복용 처리하지 않음
+        self.assertFalse(self.med.daily_doses.filter(is_taken=True).exists())
+        self.assertEqual(self.upload(lines, "nope").status_code, 404)
+
+    def test_future_dated_resend_is_stored_once(self):
+        # 기기 시각이 미래로 틀어져 있어도 보낸 값 그대로가 중복 제거 key
+        line = self.event("비타민", self.today + timedelta(days=1))
+        self.upload([line])
+        self.upload([line])
+        log = MedicineLog.objects.get()
+        self.assertGreater(log.timestamp, log.received_at)
+        self.assertEqual(log.taken_at, log.received_at)   # 반영할 때는 받은 시각으로 보정
+
+    def test_ingest_writes_in_chunks(self):
+        lines = [self.event("비타민", self.today, hour=h) for h in range(10)]
+        with self.assertNumQueries(3):
+            ingest_events(self.device.pk, lines, chunk_size=4)
+        self.assertEqual(MedicineLog.objects.count(), 10)
+
+    def test_reconcile_marks_matching_doses(self):
+        yesterday = self.today - timedelta(days=1)
+        self.upload([
+            self.event("비타민", yesterday),
+            self.event("비타민", yesterday, hour=10),   # 같은 dose 중복 감지
+            self.event("유산균", self.today),            # VIRTUAL → row 생성
+            self.event("비타민", self.today, taken=False),
+            self.event("모르는 약", self.today),          # 아직 맞는 약 없음 → 보류
+        ])
+
+        result = reconcile_logs(batch_size=2)
+        self.assertEqual(result, {"reconciled": 4, "taken": 2, "unmatched": 1})
+        self.assertTrue(self.med.daily_doses.get(date=yesterday).is_taken)
+        self.assertFalse(self.med.daily_doses.get(date=self.today).is_taken)
+        self.assertTrue(self.virtual.daily_doses.get(date=self.today).is_taken)
+        self.assertEqual(DoseLog.objects.count(), 2)
+        self.assertEqual(verify_summary(), [])
+
+        # 보류한 로그는 기한이 지나면 정리
+        self.assertEqual(reconcile_logs()["taken"], 0)
+        later = timezone.now() + timedelta(days=2)
+        self.assertEqual(reconcile_logs(now=later), {"reconciled": 1, "taken": 0, "unmatched": 0})
+        self.assertFalse(MedicineLog.objects.filter(reconciled=False).exists())
+
+
+    def test_archived_day_log_does_not_block_queue(self):
+        old = date(2025, 10, 5)
+        virtual = make_medicine(self.user, date(2025, 10, 1), 90, name="오메가3", schedule_mode="VIRTUAL")
+        Medicine.objects.filter(pk=virtual.pk).update(archived_until=date(2025, 10, 31))   # 10월 보관됨
+
+        # 보관된 날짜 로그는 예외로 batch 를 멈추지 않고, 다시 시도할 것 없이 정리됨
+        self.upload([self.event("오메가3", old), self.event("비타민", self.today)])
+        result = reconcile_logs(now=timezone.make_aware(datetime.combine(old, time(10, 0))))
+        self.assertEqual(result, {"reconciled": 2, "taken": 1, "unmatched": 0})
+        self.assertFalse(virtual.daily_doses.filter(date=old).exists())
+        self.assertTrue(self.med.daily_doses.get(date=self.today).is_taken)
+
+class MissedDoseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        GuardianInfo.objects.create(
+            user=self.user, email="guardian@example.com", owner_name="홍길동", owner_email="me@example.com"
+        )
+        self.now = timezone.make_aware(datetime(2025, 11, 20, 12, 0))
+        self.med = make_medicine(self.user, date(2025, 11, 10), 30, alarm_time=time(9, 0))
+        self.late = make_medicine(self.user, date(2025, 11, 10), 30, name="저녁약", alarm_time=time(21, 0))
+        self.taken = make_medicine(self.user, date(2025, 11, 10), 30, name="먹은약")
+        mark_dose_taken(self.taken.daily_doses.get(date=date(2025, 11, 19)))
+
+    def test_finds_missed_medicines_in_one_query(self):
+        with self.assertNumQueries(1):
+            missed = find_missed_medicines(self.now)
+        # 저녁약은 오늘 21:30 이 아직 안 지남, 먹은약은 어제 복용
+        self.assertEqual([m.id for m in missed], [self.med.id])
+        self.assertEqual(missed[0].episode_start, date(2025, 11, 10))
+
+    def test_alerts_once_per_episode(self):
+        self.assertEqual(check_missed_doses(self.now, log=lambda msg: None), 1)
+        self.assertEqual(check_missed_doses(self.now + timedelta(minutes=5), log=lambda msg: None), 0)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertIn(self.med.name, EmailOutbox.objects.get().body)
+
+        # 복용 후 다시 미복용이면 새 구간으로 알림
+        mark_dose_taken(self.med.daily_doses.get(date=date(2025, 11, 21)))
+        later = self.now + timedelta(days=4)
+        check_missed_doses(later, log=lambda msg: None)
+        self.assertEqual(
+            sorted(NotificationLog.objects.filter(medicine=self.med).values_list("episode_start", flat=True)),
+            [date(2025, 11, 10), date(2025, 11, 22)],
+        )
+
+    def test_one_digest_per_guardian(self):
+        # 약 3개 미복용 + 보호자 2명 → 메일 2통 / 다른 유저의 보호자도 같은 사람이면 한 통에 같이
+        make_medicine(self.user, date(2025, 11, 10), 30, name="혈압약")
+        make_medicine(self.user, date(2025, 11, 10), 30, name="당뇨약")
+        GuardianInfo.objects.create(user=self.user, email="second@example.com", owner_name="홍길동", owner_email="me@example.com")
+        other = User.objects.create(username="other")
+        make_medicine(other, date(2025, 11, 10), 30, name="감기약")
+        GuardianInfo.objects.create(user=other, email="guardian@example.com", owner_name="김철수", owner_email="kim@example.com")
+        make_medicine(User.objects.create(username="nobody"), date(2025, 11, 10), 30, name="보호자없음")
+
+        self.assertEqual(check_missed_doses(self.now, log=lambda msg: None), 2)
+        emails = {email.to: email for email in EmailOutbox.objects.all()}
+        self.assertEqual(set(emails), {"guardian@example.com", "second@example.com"})
+        body = emails["guardian@example.com"].body
+        for name in ("비타민", "혈압약", "당뇨약", "감기약", "홍길동", "김철수"):
+            self.assertIn(name, body)
+        self.assertNotIn("감기약", emails["second@example.com"].body)
+        # 보호자가 없는 유저의 약은 알림 기록을 남기지 않음 (보호자 등록 후 알림)
+        self.assertEqual(NotificationLog.objects.count(), 4)
+
+    def test_same_guardian_address_listed_once(self):
+        GuardianInfo.objects.create(user=self.user, email="guardian@example.com", owner_name="홍길동", owner_email="me@example.com")
+        self.assertEqual(check_missed_doses(self.now, log=lambda msg: None), 1)
+        email = EmailOutbox.objects.get()
+        self.assertIn("(1건)", email.subject)
+        self.assertEqual(email.body.count(self.med.name), 1)
+
+    def test_guardians_are_scoped_to_user(self):
+        other = User.objects.create(username="other")
+        GuardianInfo.objects.create(user=other, email="other@example.com", owner_name="김철수", owner_email="kim@example.com")
+        self.client.force_login(self.user)
+
+        res = self.client.post("/medicine/guardians/", {"email": "new@example.com", "owner_name": "홍길동", "owner_email": "me@example.com"})
+        self.assertEqual(res.status_code, 201)
+        res = self.client.get("/medicine/guardians/")
+        self.assertEqual([g["email"] for g in res.json()], ["guardian@example.com", "new@example.com"])
+        self.assertEqual(self.client.get("/medicine/guardian/").json()["email"], "guardian@example.com")
+
+    def test_virtual_medicine_without_rows_is_missed(self):
+        virtual = make_medicine(self.user, date(2025, 11, 1), 365, name="영양제", schedule_mode="VIRTUAL")
+        self.assertIn(virtual.id, [m.id for m in find_missed_medicines(self.now)])
+
+    def test_nopill_task_command(self):
+        out = StringIO()
+        call_command("nopill_task", stdout=out)
+        self.assertIn("CHECK MISSED DOSES END", out.getvalue())
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """'fail' 이 들어간 주소로는 발송 실패하는 테스트용 backend"""
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any("fail" in to for message in messages for to in message.to):
+            raise ConnectionError("smtp down")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="pillmate.tests.FlakyEmailBackend", DEFAULT_FROM_EMAIL="pillmate@example.com")
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        self.now = timezone.now() + timedelta(seconds=1)
+
+    def test_batch_uses_one_connection(self):
+        for i in range(5):
+            enqueue_email(f"guardian{i}@example.com", "제목", "본문")
+
+        self.assertEqual(drain_outbox(batch_size=2, now=self.now), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(FlakyEmailBackend.opened, 3)
+        self.assertFalse(EmailOutbox.objects.exclude(status="SENT").exists())
+
+    def test_failure_backs_off_without_blocking_others(self):
+        enqueue_email("fail@example.com", "제목", "본문")
+        enqueue_email("ok@example.com", "제목", "본문")
+
+        self.assertEqual(deliver_outbox(now=self.now), (1, 1))
+        failed = EmailOutbox.objects.get(to="fail@example.com")
+        self.assertEqual((failed.status, failed.attempts), ("PENDING", 1))
+        self.assertEqual(failed.next_attempt_at, self.now + timedelta(minutes=1))
+
+        # backoff 전에는 다시 시도하지 않음
+        self.assertEqual(deliver_outbox(now=self.now + timedelta(seconds=30)), (0, 0))
+
+        later = self.now
+        for _ in range(4):
+            later += timedelta(hours=1)
+            deliver_outbox(now=later)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ("FAILED", 5))
+
+
+    def test_claimed_rows_are_not_sent_twice(self):
+        for i in range(3):
+            enqueue_email(f"guardian{i}@example.com", "제목", "본문")
+
+        # 다른 worker 가 먼저 2통을 가져간 상태
+        claimed = claim_outbox(batch_size=2, now=self.now)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(deliver_outbox(now=self.now), (1, 0))
+        self.assertEqual(deliver_outbox(now=self.now), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+        # 가져간 worker 가 결과를 남기지 못하고 죽으면 점유 만료 후 다시 발송
+        self.assertEqual(deliver_outbox(now=self.now + OUTBOX_CLAIM_TIMEOUT), (2, 0))
+        self.assertFalse(EmailOutbox.objects.exclude(status="SENT").exists())
+
+    def test_result_is_not_written_over_another_claim(self):
+        enqueue_email("ok@example.com", "제목", "본문")
+        enqueue_email("fail@example.com", "제목", "본문")
+
+        def claim_then_expire(*args, **kwargs):
+            # 발송 중에 점유가 만료돼 다른 worker 가 다시 가져간 상황
+            emails = claim_outbox(*args, **kwargs)
+            EmailOutbox.objects.update(claim_token="other")
+            return emails
+
+        with mock.patch("pillmate.services.claim_outbox", side_effect=claim_then_expire):
+            self.assertEqual(deliver_outbox(now=self.now), (1, 1))
+        self.assertEqual(
+            set(EmailOutbox.objects.values_list("status", "attempts", "claim_token")),
+            {("SENDING", 0, "other")},
+        )
+
+class AlarmSchedulerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tester")
+        self.now = timezone.make_aware(datetime(2025, 11, 20, 8, 0))
+        self.med = make_medicine(self.user, date(2025, 11, 1), 60, alarm_time=time(9, 0))
+        self.scheduler = AlarmScheduler()
+        self.scheduler.load(self.now)
+
+    def test_events_come_out_in_due_order(self):
+        self.assertEqual(self.scheduler.next_due(), timezone.make_aware(datetime(2025, 11, 20, 9, 0)))
+        self.assertEqual(self.scheduler.pop_due(self.now), [])
+
+        events = self.scheduler.pop_due(self.now + timedelta(hours=1, minutes=30))
+        self.assertEqual([(kind, day) for _, kind, _, day in events],
+                         [(ALARM, date(2025, 11, 20)), (GRACE, date(2025, 11, 20))])
+
+    def test_refresh_replaces_events_of_changed_medicine(self):
+        Medicine.objects.filter(pk=self.med.pk).update(
+            alarm_time=time(10, 0), updated_at=timezone.now() + timedelta(minutes=1)
+        )
+        with self.assertNumQueries(2):   # id 집합 + 바뀐 약
+            self.assertEqual(self.scheduler.refresh(self.now), 1)
+
+        events = self.scheduler.pop_due(self.now + timedelta(hours=2, minutes=30))
+        self.assertEqual([(timezone.localtime(due).hour, kind) for due, kind, _, _ in events],
+                         [(10, ALARM), (10, GRACE)])
+
+    def test_refresh_catches_late_commits_and_deletes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.scheduler.refresh(self.now), 0)
+
+        # 늦게 커밋된 트랜잭션 (updated_at 이 과거) / updated_at 을 안 바꾸는 .update() 도 반영
+        Medicine.objects.filter(pk=self.med.pk).update(
+            alarm_time=time(10, 0), updated_at=self.med.updated_at - timedelta(hours=1)
+        )
+        other = make_medicine(self.user, date(2025, 11, 1), 60, name="감기약", alarm_time=time(11, 0))
+        Medicine.objects.filter(pk=other.pk).update(updated_at=self.med.updated_at - timedelta(hours=1))
+        self.assertEqual(self.scheduler.refresh(self.now), 2)
+
+        Medicine.objects.filter(pk=self.med.pk).update(archived_until=date(2025, 10, 31))
+        self.assertEqual(self.scheduler.refresh(self.now), 1)
+
+        other.delete()
+        self.assertEqual(self.scheduler.refresh(self.now), 0)
+        events = self.scheduler.pop_due(self.now + timedelta(hours=4))
+        self.assertEqual({(medicine_id, timezone.localtime(due).hour) for due, _, medicine_id, _ in events},
+                         {(self.med.pk, 10)})
+
+    def test_run_scheduler_command(self):
+        out = StringIO()
+        call_command("run_scheduler", "--max-iterations", "1", "--enqueue-only", stdout=out)
+        self.assertIn("[SCHEDULER]", out.getvalue())
+
+    def test_run_scheduler_survives_failed_tick(self):
+        err = StringIO()
+        with mock.patch.object(AlarmScheduler, "refresh", side_effect=RuntimeError("db down")):
+            call_command("run_scheduler", "--max-iterations", "2", "--refresh-interval", "0",
+                         "--enqueue-only", stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue().count("[SCHEDULER] 처리 실패"), 2)
+
+
+class CompactDoseViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="tester")
+        self.today = timezone.localdate()
+        self.meds = [make_medicine(self.user, self.today, 10, name=f"약{i}") for i in range(3)]
+        self.virtual = make_medicine(self.user, self.today, 365, name="영양제", schedule_mode="VIRTUAL")
+
+    def test_compact_day_view(self):
+        with self.assertNumQueries(4):
+            res = self.client.get("/medicine/daily-dose/", {"date": self.today.isoformat(), "view": "compact"})
+        body = res.json()
+        self.assertEqual(len(body["doses"]), 4)
+        self.assertEqual(set(body["medicines"]), {str(m.id) for m in self.meds + [self.virtual]})
+        self.assertEqual(body["medicines"][str(self.virtual.id)]["name"], "영양제")
+        self.assertNotIn("medicine", body["doses"][0])
+        self.assertIsNone(body["doses"][-1]["id"])
+
+    def test_compact_list_dedupes_medicines(self):
+        body = self.client.get("/medicine/daily-dose/", {"view": "compact"}).json()["results"]
+        self.assertEqual(len(body["doses"]), 30)
+        self.assertEqual(len(body["medicines"]), 3)
+
+
+class UserScopedPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="patient")
+        self.other = User.objects.create(username="other")
+        start = date(2025, 11, 1)
+        self.meds = [make_medicine(self.user, start, 5, name=f"약{i}") for i in range(7)]
+        make_medicine(self.other, start, 5, name="다른 약")
+        self.client.force_login(self.user)
+
+    def walk(self, url, params):
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            body = res.json()
+            pages.append(body["results"])
+            if not body["next"]:
+                return pages
+            res = self.client.get(body["next"])
+
+    def test_medicines_scoped_and_keyset_paginated(self):
+        body = self.client.get("/medicine/").json()
+        self.assertEqual((len(body["results"]), body["next"]), (7, None))
+
+        pages = self.walk("/medicine/", {"page_size": 3})
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        ids = [m["id"] for page in pages for m in page]
+        self.assertEqual(ids, [m.id for m in reversed(self.meds)])
+
+    def test_daily_doses_keyset_paginated(self):
+        pages = self.walk("/medicine/daily-dose/", {"page_size": 10})
+        rows = [d for page in pages for d in page]
+        self.assertEqual(len(rows), 35)
+        self.assertEqual(rows, sorted(rows, key=lambda d: (d["date"], d["id"])))
+
+        pages = self.walk("/medicine/daily-dose/", {"page_size": 20, "view": "compact"})
+        self.assertEqual([len(p["doses"]) for p in pages], [20, 15])
+
+    def test_page_cost_does_not_depend_on_depth(self):
+        url, counts = "/medicine/daily-dose/?page_size=5", []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                url = self.client.get(url).json()["next"]
+            counts.append(len(queries))
+            self.assertNotIn("OFFSET", queries[-1]["sql"])
+        self.assertEqual(len(counts), 7)
+        self.assertEqual(len(set(counts)), 1)
+
+    def test_other_users_dose_is_hidden(self):
+        other_dose = DailyDose.objects.filter(medicine__user=self.other).first()
+        self.assertEqual(self.client.get(f"/medicine/daily-dose/{other_dose.id}/").status_code, 404)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/medicine/", {"cursor": "garbage"}).status_code, 400)
+
+    def test_default_page_is_bounded(self):
+        # 파라미터 없는 요청도 첫 페이지만 (page_size 기본값), ?page_size= 는 max_page_size 까지
+        with mock.patch.object(KeysetPagination, "page_size", 10), \
+                mock.patch.object(KeysetPagination, "max_page_size", 20):
+            body = self.client.get("/medicine/daily-dose/").json()
+            self.assertEqual(len(body["results"]), 10)
+            self.assertIsNotNone(body["next"])
+            self.assertEqual(len(self.client.get("/medicine/daily-dose/", {"page_size": 1000}).json()["results"]), 20)
+
+    @override_settings(PILLMATE_UNPAGINATED_LISTS=True)
+    def test_unpaginated_lists_opt_out(self):
+        self.assertEqual(len(self.client.get("/medicine/").json()), 7)
+        self.assertEqual(len(self.client.get("/medicine/daily-dose/").json()), 35)
+        self.assertEqual(len(self.client.get("/medicine/", {"page_size": 3}).json()["results"]), 3)
+
+
+def index_name(model, fields):
+    return next(index.name for index in model._meta.indexes if index.fields == fields)
+
+
+class DailyDoseIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="index")
+        self.other = User.objects.create_user(username="index-other")
+        self.start = date(2025, 11, 1)
+        self.med = make_medicine(self.user, self.start, 10)
+        make_medicine(self.user, self.start, 10, schedule_mode="VIRTUAL")
+        make_medicine(self.other, self.start, 10)
+
+    def assertSearches(self, queryset, table, index):
+        plan = queryset.explain()
+        self.assertNotIn(f"SCAN {table}", plan)
+        self.assertIn(f"SEARCH {table} USING", plan)
+        self.assertIn(index, plan)
+
+    def test_user_copied_from_medicine(self):
+        self.assertFalse(DailyDose.objects.exclude(user_id=F("medicine__user_id")).exists())
+        dose = materialize_dose(Medicine.objects.get(schedule_mode="VIRTUAL"), self.start)
+        self.assertEqual(dose.user_id, self.user.id)
+
+        self.med.user = self.other
+        self.med.save()
+        self.assertEqual(set(self.med.daily_doses.values_list("user_id", flat=True)), {self.other.id})
+
+    def test_owner_change_moves_summary(self):
+        mark_dose_taken(self.med.daily_doses.get(date=self.start))
+        archive_doses(keep_months=1, today=date(2025, 12, 5))   # 11월 보관
+        self.med.refresh_from_db()
+        self.med.end_date = date(2025, 12, 3)
+        self.med.save()
+
+        epoch = MEDICINE_EPOCH_KEY.format(scope=f"user{self.user.id}")
+        before = cache.get(epoch)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med.user = self.other
+            self.med.save()
+        self.assertEqual(verify_summary(), [])
+        self.assertNotEqual(cache.get(epoch), before)   # 이전 주인의 ETag / 조회 캐시도 무효화
+        self.assertEqual(set(self.med.archives.values_list("user_id", flat=True)), {self.other.id})
+        def totals(user):
+            rows = summary_rows(user.id, self.start, date(2025, 12, 31))
+            return sum(r[1] for r in rows), sum(r[2] for r in rows)
+
+        # 이전 주인에게는 VIRTUAL 약 (복용 row 없음) 만 남음 / 새 주인: 자기 약 10 + 옮겨온 11월 보관 10 + 12월 3
+        self.assertEqual(totals(self.user), (0, 0))
+        self.assertEqual(totals(self.other), (23, 1))
+
+    def test_logs_use_indexes(self):
+        end = self.start + timedelta(days=30)
+        self.assertSearches(
+            summary_rows(self.user.id, self.start, end),
+            "pillmate_dailyadherencesummary",
+            "user_id=? AND date>? AND date<?",
+        )
+        with CaptureQueriesContext(connection) as queries:
+            virtual_pending(self.user.id, self.start, end)
+        dose_sql = next(q["sql"] for q in queries if "pillmate_dailydose" in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {dose_sql}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        # (user, date) 인덱스 또는 (medicine, date, slot_time) unique 인덱스 범위 조회
+        self.assertRegex(plan, r"SEARCH pillmate_dailydose USING (COVERING )?INDEX .*date>\? AND date<\?")
+
+    def test_today_doses_use_indexes(self):
+        self.assertSearches(
+            stored_doses_for_date(self.start, self.user.id),
+            "pillmate_dailydose",
+            index_name(DailyDose, ["user", "date"]),
+        )
+        self.assertSearches(
+            stored_doses_for_date(self.start),
+            "pillmate_dailydose",
+            index_name(DailyDose, ["date"]),
+        )
+
+    def test_missed_dose_scan_uses_indexes(self):
+        now = timezone.make_aware(datetime(2025, 11, 5, 12, 0))
+        queryset = missed_medicines_queryset(now)
+        self.assertSearches(queryset, "pillmate_medicine", index_name(Medicine, ["end_date"]))
+        self.assertSearches(queryset, "pillmate_dailydose", "medicine_id=?")
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def test_seed_builds_consistent_data(self):
+        today = date(2025, 11, 30)
+        counts = seed(users=3, medicines=2, days=10, take_rate=0.8, today=today, rng=random.Random(1))
+        self.assertEqual(counts["users"], 3)
+        self.assertEqual(counts["medicines"], 6)
+        self.assertEqual(counts["doses"], 60)
+        self.assertEqual(DailyDose.objects.filter(is_taken=True).count(), counts["logs"])
+        self.assertEqual(verify_summary(), [])
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_benchmark_results_are_comparable(self):
+        results = run_benchmarks(["2x2x5"], repeat=2)
+        run = results["runs"][0]
+        self.assertEqual(run["scale"], "2x2x5")
+        self.assertIn("arduino_today_doses", run["results"])
+        self.assertEqual(run["results"]["medicine_logs"]["runs"], 2)
+        self.assertEqual(compare_results(results, results), [])
+
+        slower = {"runs": [{**run, "results": {
+            "medicine_logs": {**run["results"]["medicine_logs"], "queries": 99},
+        }}]}
+        self.assertEqual(compare_results(results, slower)[0][:3], ("2x2x5", "medicine_logs", "queries"))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="metrics")
+        make_medicine(self.user, timezone.localdate(), 3)
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(PILLMATE_METRICS_ENABLED=True)
+    def test_records_latency_and_sql_per_url_name(self):
+        before = SQL_QUERIES.value("arduino_today_doses")
+        self.client.get("/medicine/arduino/today-dose/")
+        self.client.get("/medicine/logs/")
+        self.assertGreater(SQL_QUERIES.value("arduino_today_doses"), before)
+
+        res = self.client.get("/metrics")
+        self.assertEqual(res.status_code, 200)
+        body = res.content.decode()
+        self.assertIn('pillmate_requests_total{view="arduino_today_doses",method="GET",status="200"}', body)
+        self.assertIn('pillmate_request_duration_seconds_bucket{view="medicine-logs",method="GET",le="+Inf"}', body)
+        self.assertIn('pillmate_request_sql_seconds_count{view="medicine-logs"}', body)
+
+    @override_settings(PILLMATE_METRICS_ENABLED=True)
+    async def test_async_views_record_sql(self):
+        # ASGI 에서도 sql_to_async 로 넘긴 조회 / 복용 처리의 SQL 이 요청 라벨로 기록됨
+        before = SQL_QUERIES.value("arduino_today_doses"), SQL_QUERIES.value("arduino_confirm")
+        body = (await self.async_client.get("/medicine/arduino/today-dose/")).json()
+        res = await self.async_client.post(
+            "/medicine/arduino/confirm/", {"dose_id": body["doses"][0]["dose_id"]}, content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(SQL_QUERIES.value("arduino_today_doses"), before[0])
+        self.assertGreater(SQL_QUERIES.value("arduino_confirm"), before[1])
+
+    @override_settings(PILLMATE_METRICS_ENABLED=True)
+    async def test_sync_view_under_asgi_records_sql(self):
+        # ASGI 에서 sync DRF 뷰 (sync_to_async 스레드에서 실행) 의 SQL 도 기록됨
+        before = SQL_QUERIES.value("medicine-logs")
+        res = await self.async_client.get("/medicine/logs/")
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(SQL_QUERIES.value("medicine-logs"), before)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_nopill_task_records_duration_and_emails(self):
+        runs = TASK_DURATION.count("nopill_task")
+        sent = EMAILS.value("sent")
+        enqueue_email("guardian@example.com", "제목", "본문")
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(PILLMATE_METRICS_TEXTFILE_DIR=directory, PILLMATE_METRICS_ENABLED=True):
+                call_command("nopill_task", stdout=StringIO())
+                body = self.client.get("/metrics").content.decode()
+
+        self.assertEqual(TASK_DURATION.count("nopill_task"), runs + 1)
+        self.assertEqual(EMAILS.value("sent"), sent + 1)
+        self.assertIn('pillmate_last_task_emails_sent{task="nopill_task"} 1', body)
+        self.assertIn('pillmate_last_task_duration_seconds{task="nopill_task"}', body)
+
+
+class ReadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cached")
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med = make_medicine(self.user, self.today, 3)
+        self.client.force_login(self.user)
+
+    def counts(self, name):
+        return CACHE_REQUESTS.value(name, "hit"), CACHE_REQUESTS.value(name, "miss")
+
+    def logs(self):
+        return self.client.get("/medicine/logs/").json()
+
+    def day(self):
+        return self.client.get("/medicine/daily-dose/", {"date": self.today.isoformat()}).json()
+
+    def test_logs_cached_until_take(self):
+        hits, misses = self.counts("logs")
+        first = self.logs()
+        self.assertEqual(self.logs(), first)
+        self.assertEqual(self.counts("logs"), (hits + 1, misses + 1))
+
+        dose = self.med.daily_doses.get(date=self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/medicine/daily-dose/{dose.id}/take/")
+
+        today = next(row for row in self.logs() if row["date"] == self.today.isoformat())
+        self.assertEqual(today["taken"], 1)
+        self.assertEqual(self.counts("logs"), (hits + 1, misses + 2))
+
+    def test_day_list_invalidated_by_dose_save_and_medicine_edit(self):
+        hits, misses = self.counts("daily_doses")
+        self.assertFalse(self.day()[0]["is_taken"])
+        self.day()
+        self.assertEqual(self.counts("daily_doses"), (hits + 1, misses + 1))
+
+        dose = self.med.daily_doses.get(date=self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/medicine/daily-dose/{dose.id}/", {"is_taken": True}, content_type="application/json"
+            )
+        self.assertTrue(self.day()[0]["is_taken"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med.name = "오메가3"
+            self.med.save()
+        self.assertEqual(self.day()[0]["medicine"]["name"], "오메가3")
+        self.assertEqual(self.counts("daily_doses"), (hits + 1, misses + 3))
+
+    def test_rebuild_invalidates_everything(self):
+        first = self.logs()
+        DailyDose.objects.filter(medicine=self.med).update(is_taken=True)
+        self.assertEqual(self.logs(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_adherence", stdout=StringIO())
+        self.assertNotEqual(self.logs(), first)
+
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    # 작업 스레드가 임시 SQLite 파일 DB 에 새로 연결 (테스트 in-memory DB 는 건드리지 않음)
+    databases = {"default"}
+
+    def test_tuned_profile_survives_parallel_confirms(self):
+        result = run_confirm_stress(settings.SQLITE_TUNED_OPTIONS, threads=6, confirms=10)
+        self.assertEqual(result["journal_mode"], "wal")
+        self.assertEqual(result["errors"], 0, result["error_samples"])
+        self.assertEqual(result["taken"], result["expected"])
+
+    def test_default_profile_locks_under_same_workload(self):
+        # 같은 부하에서 기본 설정 (rollback journal, DEFERRED) 은 읽고→쓰는 트랜잭션끼리 부딪혀 바로 실패
+        result = run_confirm_stress({}, threads=6, confirms=10)
+        self.assertEqual(result["journal_mode"], "delete")
+        self.assertGreater(result["errors"], 0)
+        self.assertIn("database is locked", result["error_samples"])
+        self.assertLess(result["taken"], result["expected"])
+
+    def test_scratch_database_settings_are_restored(self):
+        settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+        before = dict(settings_dict)
+        with self.assertRaises(RuntimeError):
+            with sqlite_file_database({"timeout": 1}):
+                raise RuntimeError
+        self.assertIs(connections.settings[DEFAULT_DB_ALIAS], settings_dict)
+        self.assertEqual(settings_dict, before)
+
+    def test_async_comparison_runs_both_modes(self):
+        result = run_async_comparison(requests=10, workers=2, concurrency=5, client_delay=0)
+        for mode in ("sync", "async"):
+            self.assertEqual(result[mode]["requests"], 10)
+            self.assertEqual(result[mode]["errors"], 0)
@@ -4,14 +4,24 @@ from .views import *
 
 router = DefaultRouter()
 router.register(r"daily-dose", DailyDoseViewSet, basename="daily-dose")
-router.register(r"", MedicineViewSet, basename='')
+router.register(r"guardians", GuardianInfoViewSet, basename="guardians")
+router.register(r"", MedicineViewSet, basename="medicine")
 
 urlpatterns = [
-    path("guardian/", get_guardian_info),
-    path("guardian/update/", update_guardian_info),
-    path("check_missed/", check_missed),
-    path("arduino/today-dose/", arduino_today_doses),
+    path("guardian/", get_guardian_info, name="guardian_info"),
+    path("guardian/update/", update_guardian_info, name="guardian_update"),
+    path("check_missed/", check_missed, name="check_missed"),
+    path("arduino/today-dose/", arduino_today_doses, name="arduino_today_doses"),
+    path("arduino/sync/today-dose/", arduino_today_doses_sync, name="arduino_today_doses_sync"),
+    path("arduino/stream/", arduino_stream, name="arduino_stream"),
     path('arduino/confirm/', arduino_confirm, name='arduino_confirm'),
+    path('arduino/sync/confirm/', arduino_confirm_sync, name='arduino_confirm_sync'),
+    path('arduino/confirm/batch/', arduino_confirm_batch, name='arduino_confirm_batch'),
+    path("arduino/devices/<str:device_id>/today-dose/", device_today_doses, name="device_today_doses"),
+    path("arduino/devices/<str:device_id>/stream/", device_stream, name="device_stream"),
+    path("arduino/devices/<str:device_id>/confirm/", device_confirm, name="device_confirm"),
+    path("arduino/devices/<str:device_id>/confirm/batch/", device_confirm_batch, name="device_confirm_batch"),
+    path("arduino/devices/<str:device_id>/logs/", device_logs, name="device_logs"),
     path('', include(router.urls)),
 
 
@@ -19,10 +29,25 @@ urlpatterns = [
 
 # /medicines/
 # /medicines/{id}/
+# /medicines/logs/
+# /medicines/stats/   (약별 복용률 / 연속 복용 / 복용 시각 분포)
 # /daily-dose/
 # /daily-dose/{id}/
 # /daily-dose/{id}/take/
 # /daily-dose/?date=YYYY-MM-DD
+# /daily-dose/export/?output=csv|ndjson  (스트리밍 내보내기)
+# /guardians/
+# /guardians/{id}/
 # /guardian/
 # /guardian/update/
-# /arduino/confirm/
+# /arduino/today-dose/        (async)
+# /arduino/sync/today-dose/   (WSGI 용 동기 버전)
+# /arduino/stream/
+# /arduino/confirm/           (async)
+# /arduino/sync/confirm/      (WSGI 용 동기 버전)
+# /arduino/confirm/batch/
+# /arduino/devices/{device_id}/today-dose/
+# /arduino/devices/{device_id}/stream/
+# /arduino/devices/{device_id}/confirm/
+# /arduino/devices/{device_id}/confirm/batch/
+# /arduino/devices/{device_id}/logs/          (NDJSON 센서 이벤트 업로드)
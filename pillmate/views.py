@@ -5,122 +5,277 @@ from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db import transaction
 
-from datetime import date, timedelta, datetime
-from django.utils.timezone import make_aware
-from collections import defaultdict
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
-from .models import Medicine, DoseLog, DailyDose, GuardianInfo
-from .serializers import MedicineSerializer, DailyDoseSerializer, GuardianInfoSerializer
-from .services import send_missed_dose_email
+from datetime import date, timedelta, datetime
+from django.utils.dateparse import parse_date, parse_time
+from django.utils.http import parse_etags
+
+from .models import Medicine, DoseLog, DailyDose, GuardianInfo, Device
+from .serializers import MedicineSerializer, DailyDoseSerializer, GuardianInfoSerializer, DoseConfirmEventSerializer, compact_doses, COMPACT_DOSE_FIELDS
+from .services import check_missed_doses
+from .adherence import resolve_range, daily_counts
+from .analytics import medicine_stats
+from .caching import schedule_etag, cached_read, logs_cache_key, day_doses_cache_key, stats_cache_key
+from .pubsub import broker, schedule_channel
+from .devices import resolve_device_user
+from .ingestion import ingest_events
+from .archive import archived_doses_for_date
+from .export import export_rows, render_export, EXPORT_FORMATS
+from .pagination import KeysetPagination
+from .metrics import render as render_metrics
+from .middleware import sql_to_async
+from .dosing import mark_dose_taken, mark_doses_taken, apply_dose_change, materialize_dose, doses_for_date, pending_virtual_doses
+
+
+def request_user(request):
+    """요청 유저 — 로그인 안 되어 있으면 기본 유저로 대체 (테스트용)"""
+    user = request.user
+    if user.is_anonymous:
+        user = User.objects.first()
+    return user
+
+
+def request_user_id(request):
+    user = request_user(request)
+    return user.id if user else None
 
 
 @extend_schema(tags = ["약 등록"], summary= ["type: PRESCRIPTION | GENERAL | SUPPLEMENT", "time: BEFORE_MEAL | AFTER_MEAL"])
 class MedicineViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = MedicineSerializer   
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Medicine.objects.order_by('-created_at')
+        return Medicine.objects.filter(user_id=request_user_id(self.request)).order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
-        user = self.request.user
-        if user.is_anonymous:  # 로그인 안 되어 있으면 
-            user = User.objects.first()  # 기본 유저로 대체 (테스트용)
-        serializer.save(user=user)
+        serializer.save(user=request_user(self.request))
         
     @action(detail=False, methods=["GET"], permission_classes=[AllowAny])
     def logs(self, request):
         """
-        이번 달 날짜별 복용 현황 반환
+        날짜별 복용 현황 반환 (기본: 이번 달)
+        ?month=11 / ?year=2025&month=11 / ?year=2025 / ?start=2025-01-01&end=2025-12-31
         [
         {"date": "2025-11-01", "taken": 2, "missed": 1},
         {"date": "2025-11-02", "taken": 3, "missed": 0},
         ]
         """
         try:
-            # 현재 날짜 기준
+            # 현재 날짜 기준으로 조회 기간 계산
             today = timezone.localdate()
+            start, end = resolve_range(request.query_params, today)
 
-            # 쿼리 파라미터에서 month 받기
-            month_str = request.query_params.get("month")
-            month = int(month_str) if month_str else today.month
-            year = today.year
-
-            # 월의 첫날, 마지막날 구하기
-            first_day = date(year, month, 1)
-            last_day = (date(year + (month == 12), (month % 12) + 1, 1)
-                        - timedelta(days=1))
-
-            # 유저 (임시로 1)
-            user_id = 1
+            user_id = request_user_id(request)
 
-            # 유저의 모든 DailyDose 조회
-            doses = DailyDose.objects.filter(
-                medicine__user_id=user_id,
-                date__gte=first_day,
-                date__lte=last_day
+            # 날짜별 집계 (캐시 → 없으면 쿼리 1번)
+            data = cached_read(
+                "logs", logs_cache_key(user_id, start, end), lambda: daily_counts(user_id, start, end)
             )
 
-            # 날짜별 집계
-            data = []
-            current = first_day
-
-            while current <= last_day:
-                day_doses = doses.filter(date=current)
-
-                taken = day_doses.filter(is_taken=True).count()
-                missed = day_doses.filter(is_taken=False).count()
-
-                data.append({
-                    "date": current.strftime("%Y-%m-%d"),
-                    "taken": taken,
-                    "missed": missed
-                })
-
-                current += timedelta(days=1)
-
             return Response(data, status=status.HTTP_200_OK)
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+    @action(detail=False, methods=["GET"], permission_classes=[AllowAny])
+    def stats(self, request):
+        """
+        약별 복용률 / 연속 복용 / 알람 대비 복용 시각 분포 (기간 지정은 logs 와 같음)
+        {"start", "end", "overall": {...}, "medicines": [{"medicine_id", "adherence", "current_streak", ...}]}
+        """
+        try:
+            today = timezone.localdate()
+            start, end = resolve_range(request.query_params, today)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request_user_id(request)
+        data = cached_read(
+            "stats", stats_cache_key(user_id, start, end, today),
+            lambda: medicine_stats(user_id, start, end, today),
+        )
+        return Response(data)
+
+
 class DailyDoseViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
-    queryset = DailyDose.objects.all()
     serializer_class = DailyDoseSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date', 'id')
+
+    def get_queryset(self):
+        return (
+            DailyDose.objects
+            .filter(user_id=request_user_id(self.request))
+            .select_related('medicine')
+            .order_by('date', 'id')
+        )
+
+    # DailyDose 를 직접 수정/삭제하면 날짜별 집계도 같이 맞춰준다
+    def perform_update(self, serializer):
+        before = (serializer.instance.date, serializer.instance.is_taken)
+        with transaction.atomic():
+            dose = serializer.save()
+            apply_dose_change(dose.medicine.user_id, before, (dose.date, dose.is_taken))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            apply_dose_change(instance.medicine.user_id, (instance.date, instance.is_taken), None)
+            instance.delete()
 
     # /daily-dose/?date=2025-11-18
+    # ?view=compact → {"doses": [...], "medicines": {id: {...}}}
     def list(self, request, *args, **kwargs):
         date = request.query_params.get('date')
+        compact = request.query_params.get('view') == 'compact'
         if not date:
+            if compact:
+                rows = self.filter_queryset(self.get_queryset()).values(*COMPACT_DOSE_FIELDS)
+                page = self.paginate_queryset(rows)
+                if page is not None:
+                    return self.get_paginated_response(compact_doses(page))
+                return Response(compact_doses(rows))
             return super().list(request, *args, **kwargs)
 
-        queryset = DailyDose.objects.filter(date=date).select_related('medicine')
-        serializer = DailyDoseSerializer(queryset, many=True)
-        return Response(serializer.data)
+        try:
+            day = parse_date(date)
+        except ValueError:
+            day = None
+        if not day:
+            return Response({"error": "date 형식은 YYYY-MM-DD 입니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request_user_id(request)
+        if compact:
+            data = cached_read(
+                "daily_doses", day_doses_cache_key(user_id, day, "compact"),
+                lambda: compact_day_doses(day, user_id),
+            )
+            return Response(data)
+
+        # 저장된 row + VIRTUAL 약의 가상 dose (id=null)
+        data = cached_read(
+            "daily_doses", day_doses_cache_key(user_id, day),
+            lambda: DailyDoseSerializer(doses_for_date(day, user_id), many=True).data,
+        )
+        return Response(data)
+
+    # GET /daily-dose/export/?output=csv|ndjson&start=&end=&medicine_id=
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        전체 복용 기록 내보내기 (보관된 달 포함) — 한 번에 읽지 않고 chunk 단위로 스트리밍
+        ?format= 은 DRF renderer 선택에 쓰이므로 형식은 ?output= 으로 받는다.
+        """
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': 'output 은 csv 또는 ndjson 입니다.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start, end = (parse_date(params.get(name) or '') for name in ('start', 'end'))
+            if (params.get('start') and not start) or (params.get('end') and not end):
+                raise ValueError
+            medicine_id = int(params['medicine_id']) if params.get('medicine_id') else None
+        except ValueError:
+            return Response(
+                {'error': 'start/end 는 YYYY-MM-DD, medicine_id 는 정수입니다.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = export_rows(request_user_id(request), start, end, medicine_id)
+        response = StreamingHttpResponse(render_export(output, rows), content_type=EXPORT_FORMATS[output])
+        filename = f"pillmate-{timezone.localdate():%Y%m%d}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     # PATCH /daily-dose/{id}/take/
     @action(detail=True, methods=['patch'])
     def take(self, request, pk=None):
         dose = self.get_object()
-        dose.is_taken = True
-        dose.taken_at = timezone.now()
-        dose.save()
+        mark_dose_taken(dose)
+
+        serializer = DailyDoseSerializer(dose)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    # PATCH /daily-dose/take/  {"medicine_id": 1, "date": "2025-11-18"}
+    # 아직 row 가 없는 VIRTUAL dose 복용 처리
+    @action(detail=False, methods=['patch'], url_path='take')
+    def take_virtual(self, request):
+        try:
+            dose = materialize_requested_dose(request.data, request_user_id(request))
+        except Medicine.DoesNotExist:
+            return Response({'error': '해당 Medicine을 찾을 수 없음'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        mark_dose_taken(dose)
 
         serializer = DailyDoseSerializer(dose)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def compact_day_doses(day, user_id):
+    """?date=&view=compact — 저장된 row + 보관된 dose + VIRTUAL 가상 dose (보관/가상은 id=null)"""
+    archived = archived_doses_for_date(day, user_id)
+    virtual = pending_virtual_doses(day, user_id, {d.medicine_id for d in archived})
+    return compact_doses(DailyDose.objects.filter(date=day, user_id=user_id), archived + virtual)
+
+
+def materialize_requested_dose(data, user_id=None):
+    """
+    요청의 medicine_id (+ date, 기본 오늘 / + slot_time "HH:MM", 기본 그날 아직 안 먹은 첫 복용 시각)
+    로 DailyDose row 를 가져오거나 생성
+    """
+    medicine_id = data.get('medicine_id')
+    if not medicine_id:
+        raise ValueError('medicine_id가 필요합니다.')
+
+    day = parse_date(data.get('date') or '')
+    if data.get('date') and day is None:
+        raise ValueError('date 형식은 YYYY-MM-DD 입니다.')
+    day = day or timezone.localdate()
+    slot_time = parse_time(data.get('slot_time') or '')
+    if data.get('slot_time') and slot_time is None:
+        raise ValueError('slot_time 형식은 HH:MM 입니다.')
+    medicines = Medicine.objects.all()
+    if user_id is not None:
+        medicines = medicines.filter(user_id=user_id)
+    return materialize_dose(medicines.get(id=medicine_id), day, slot_time)
     
 
 ##################################################################
 # 보호자 알림
 
-# /guardian/ 
+# /guardians/  /guardians/{id}/ — 요청 유저의 보호자 목록 (여러 명)
+class GuardianInfoViewSet(viewsets.ModelViewSet):
+    permission_classes = [AllowAny]
+    serializer_class = GuardianInfoSerializer
+
+    def get_queryset(self):
+        return GuardianInfo.objects.filter(user_id=request_user_id(self.request)).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(user=request_user(self.request))
+
+
+# /guardian/  (예전 단일 보호자 API — 요청 유저의 첫 번째 보호자)
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def get_guardian_info(request):
-    info = GuardianInfo.objects.first()   # 테스트용 하나만 존재
+    info = GuardianInfo.objects.filter(user_id=request_user_id(request)).order_by('id').first()
     if not info:
         return Response({"data": None})
     return Response(GuardianInfoSerializer(info).data)
@@ -129,10 +284,12 @@ def get_guardian_info(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def update_guardian_info(request):
-    info = GuardianInfo.objects.first()
+    user = request_user(request)
+    info = GuardianInfo.objects.filter(user=user).order_by('id').first()
 
     if not info:
         info = GuardianInfo.objects.create(
+            user=user,
             owner_name=request.data.get("owner_name", "사용자"),
             owner_email=request.data.get("owner_email", "none@example.com")
         )
@@ -143,129 +300,334 @@ def update_guardian_info(request):
 
     return Response(serializer.data)
 
-def check_missed_doses():
-    now = timezone.now()
-    today = now.date()
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def check_missed(request):
+    # check_missed_doses()
+    return Response({"status": "done"})
 
-    # 2일 범위 (오늘 포함)
-    start_date = today - timedelta(days=2)
-    end_date = today
 
-    guardian = GuardianInfo.objects.first()
-    if not guardian or not guardian.email:
-        print("[MISSED_DOSE] 보호자 정보 없음 → skip")
-        return
+########################################################################################
+# 아두이노 로직
 
-    print(f"[MISSED_DOSE] 날짜 범위: {start_date}~{end_date}")
+def _today_doses(today, user_id, if_none_match):
+    """
+    오늘 복용 일정 (아두이노 polling 용) — user_id 가 있으면 그 유저 약만
+    → (etag, 일정 목록), If-None-Match 가 현재 ETag 와 같으면 DB 조회 없이 (etag, None)
+    sync / async 뷰가 같이 쓰는 동기 코어 (async 뷰는 sql_to_async 로 한 번에 넘긴다)
+    """
+    etag = schedule_etag(today, user_id)
+    if etag in if_none_match or "*" in if_none_match:
+        return etag, None
+
+    # 저장된 row + 보관된 dose + 아직 row 가 없는 VIRTUAL 약 (dose_id=null → medicine_id 로 confirm)
+    doses = doses_for_date(today, user_id)
+    return etag, sorted((_today_dose_item(dose) for dose in doses), key=lambda item: item["alarm_time"])
+
+
+def _today_dose_item(dose):
+    med = dose.medicine
+    return {
+        "dose_id": dose.id,
+        "medicine_id": med.id,
+        "name": med.name,
+        "alarm_time": dose.slot_time.strftime("%H:%M"),   # 이 dose 의 복용 시각
+        "is_taken": dose.is_taken,
+    }
+
+
+def _today_doses_response(request, user_id=None):
+    today = timezone.localdate()
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    etag, result = _today_doses(today, user_id, if_none_match)
+    if result is None:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response({"date": today, "doses": result}, headers={"ETag": etag})
+
+
+async def _atoday_doses_response(request, user_id=None):
+    """
+    _today_doses_response 의 async 버전 (ASGI 에서 기기 연결이 스레드를 잡지 않음)
+    조회는 async ORM (aget / async for) 대신 _today_doses 를 sql_to_async 로 한 번 넘겨서 실행한다.
+    """
+    today = timezone.localdate()
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    etag, result = await sql_to_async(request, _today_doses)(today, user_id, if_none_match)
+    if result is None:
+        return HttpResponseNotModified(headers={"ETag": etag})
+    return JsonResponse(
+        {"date": today.isoformat(), "doses": result},
+        headers={"ETag": etag},
+        json_dumps_params={"ensure_ascii": False},
+    )
 
-    # DailyDose에서 해당 기간의 모든 기록 가져오기
-    doses = DailyDose.objects.filter(
-        date__range=[start_date, end_date]
-    ).select_related("medicine")
 
-    # 약별로 DailyDose 리스트 묶기
-    grouped = defaultdict(list)
-    for dose in doses:
-        grouped[dose.medicine].append(dose)
+@require_GET
+async def arduino_today_doses(request):
+    return await _atoday_doses_response(request)
 
-    # 약별로 미복용 판단
-    for med, dose_list in grouped.items():
-        print(f"\n--- 약 체크: {med.name} ---")
 
-        # 1) 2일 중 한 번이라도 복용했으면 PASS
-        if any(d.is_taken for d in dose_list):
-            print("→ 지난 2일 중 복용 기록 있음 → skip")
-            continue
+# WSGI 로 띄우는 경우용 동기 버전 (요청마다 이벤트 루프를 만들지 않음) — benchmark_async 의 비교 대상
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def arduino_today_doses_sync(request):
+    return _today_doses_response(request)
 
-        # 2) 복용 예정 시간도 모두 지난 상태인지 확인
-        all_passed_time = True
-        for d in dose_list:
-            scheduled = make_aware(datetime.combine(d.date, med.alarm_time))
-            if now < scheduled + timedelta(minutes=30):
-                all_passed_time = False
-                print(f"→ {d.date} 복용 예정시간이 아직 지나지 않음 → skip")
-                break
 
-        if not all_passed_time:
-            continue
+# 아두이노 push (SSE)
+# ASGI(project.asgi:application) 로 띄우면 연결 하나가 스레드를 잡지 않고 코루틴 하나로 유지된다.
+STREAM_HEARTBEAT_SECONDS = 15
 
-        # 3) 최종적으로 2일 동안 복용 0회 → 이메일 1회 발송
-        print("→ 2일 동안 한 번도 복용하지 않음! 이메일 발송")
-        send_missed_dose_email(
-            guardian_email=guardian.email,
-            owner_name=guardian.owner_name,
-            medicine_name=med.name,
-            time=med.alarm_time,
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _schedule_stream_response(user_id=None):
+    """
+    오늘 일정이 바뀌거나 앱에서 복용 처리되면 {"date", "etag"} 이벤트를 push 한다.
+    기기는 이벤트를 받으면 today-dose 를 If-None-Match 로 다시 조회하면 된다.
+    """
+    async def events():
+        subscription = broker.subscribe(schedule_channel(user_id))
+        try:
+            today = timezone.localdate()
+            etag = await sync_to_async(schedule_etag)(today, user_id)
+            yield _sse("schedule", {"date": today.isoformat(), "etag": etag})
+
+            while True:
+                try:
+                    message = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = None
+
+                current = timezone.localdate()
+                changed = message is not None and message["date"] in (None, current.isoformat())
+                if current != today or changed:
+                    # 날짜가 바뀌었거나 오늘 일정이 바뀜
+                    today = current
+                    etag = await sync_to_async(schedule_etag)(today, user_id)
+                    yield _sse("schedule", {"date": today.isoformat(), "etag": etag})
+                elif message is None:
+                    yield ": keep-alive\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+async def arduino_stream(request):
+    """GET /arduino/stream/  (text/event-stream)"""
+    return _schedule_stream_response()
+
+
+def _confirm_dose(data, user_id=None):
+    """
+    아두이노 → 백엔드로 복용 완료 전송 — user_id 가 있으면 그 유저 dose 만
+    → (응답 body, status code), sync / async 뷰가 같이 쓰는 동기 코어
+    """
+    dose_id = data.get('dose_id')
+
+    if not dose_id and not data.get('medicine_id'):
+        return {'error': 'dose_id 또는 medicine_id가 필요합니다.'}, status.HTTP_400_BAD_REQUEST
+
+    try:
+        if dose_id:
+            doses = DailyDose.objects.select_related('medicine')
+            if user_id is not None:
+                doses = doses.filter(user_id=user_id)
+            dose = doses.get(id=dose_id)
+        else:
+            # VIRTUAL 약은 복용한 시점에 row 생성
+            dose = materialize_requested_dose(data, user_id)
+
+        # DailyDose 업데이트 (+ 날짜별 집계 반영)
+        mark_dose_taken(dose)
+
+        # DoseLog (Medicine 단위로 기록)
+        DoseLog.objects.create(
+            medicine=dose.medicine,   # 모델에 맞게 수정 완료
+            source='ARDUINO'
         )
 
-        print("→ 이메일 전송 완료")
+        return {'message': '복용 완료 반영됨'}, status.HTTP_200_OK
 
+    except (DailyDose.DoesNotExist, ValidationError):
+        return {'error': '해당 DailyDose를 찾을 수 없음'}, status.HTTP_404_NOT_FOUND
+    except Medicine.DoesNotExist:
+        return {'error': '해당 Medicine을 찾을 수 없음'}, status.HTTP_404_NOT_FOUND
+    except ValueError as e:
+        return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def check_missed(request):
-    # check_missed_doses()
-    return Response({"status": "done"})
 
+def _confirm_response(request, user_id=None):
+    body, code = _confirm_dose(request.data, user_id)
+    return Response(body, status=code)
 
-########################################################################################
-# 아두이노 로직
 
-@api_view(["GET"])
+def _request_payload(request):
+    """JSON / form 요청 body → dict (DRF request.data 와 같은 입력을 받기 위함)"""
+    if request.content_type == "application/json":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+    return request.POST
+
+
+async def _aconfirm_response(request, user_id=None):
+    """
+    _confirm_response 의 async 버전
+    async ORM (aget / aupdate) 대신 _confirm_dose (조회 + 복용 처리 + DoseLog) 를 sql_to_async 로 한 번 넘겨서 실행한다.
+    """
+    data = _request_payload(request)
+    if data is None:
+        return JsonResponse({'error': 'JSON 형식이 올바르지 않습니다.'}, status=400)
+
+    body, code = await sql_to_async(request, _confirm_dose)(data, user_id)
+    return JsonResponse(body, status=code, json_dumps_params={"ensure_ascii": False})
+
+
+@csrf_exempt  # 아두이노 접근 가능
+@require_POST
+async def arduino_confirm(request):
+    """아두이노 → 백엔드로 복용 완료 전송"""
+    return await _aconfirm_response(request)
+
+
+@extend_schema(tags = ["아두이노->백엔드로 복용 완료 전송"])
+@api_view(['POST'])
 @permission_classes([AllowAny])
-def arduino_today_doses(request):
-    today = timezone.localdate()
+def arduino_confirm_sync(request):
+    """arduino_confirm 의 동기 버전 (WSGI 배포 / 비교용)"""
+    return _confirm_response(request)
+
+
+# 한 번에 받을 수 있는 최대 이벤트 수
+CONFIRM_BATCH_LIMIT = 500
+
+
+def _confirm_batch_response(request, user_id=None):
+    """
+    아두이노 → 백엔드로 복용 완료 여러 건 전송 (오프라인 backlog 재전송)
+    {"events": [{"dose_id": 1, "taken_at": "2025-11-18T09:03:00+09:00"}, ...]}
+    → {"results": [{"dose_id": 1, "status": "taken"}, ...], "taken": 1}
+    status: taken | already_taken | not_found | invalid
+    """
+    events = request.data.get('events')
+    if not isinstance(events, list) or not events:
+        return Response({'error': 'events 배열이 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > CONFIRM_BATCH_LIMIT:
+        return Response(
+            {'error': f'events 는 최대 {CONFIRM_BATCH_LIMIT}건까지 보낼 수 있습니다.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    now = timezone.now()
+    results = []
+    valid = []
+    for item in events:
+        serializer = DoseConfirmEventSerializer(data=item)
+        if not serializer.is_valid():
+            dose_id = item.get('dose_id') if isinstance(item, dict) else None
+            results.append({'dose_id': dose_id, 'status': 'invalid', 'errors': serializer.errors})
+            continue
+
+        # 기기 시각이 미래로 틀어진 경우 서버 시각으로 보정
+        dose_id = serializer.validated_data['dose_id']
+        taken_at = min(serializer.validated_data.get('taken_at') or now, now)
+        result = {'dose_id': dose_id}
+        results.append(result)
+        valid.append((result, (dose_id, taken_at)))
+
+    statuses = mark_doses_taken([event for _, event in valid], user_id=user_id) if valid else []
+    for (result, _), result_status in zip(valid, statuses):
+        result['status'] = result_status
+
+    taken = sum(result['status'] == 'taken' for result in results)
+    return Response({'results': results, 'taken': taken}, status=status.HTTP_200_OK)
 
-    # 오늘 날짜 DailyDose 가져오기
-    doses = DailyDose.objects.filter(date=today).select_related("medicine")
-
-    result = []
-    for dose in doses:
-        med = dose.medicine
-        result.append({
-            "dose_id": dose.id, 
-            "medicine_id": med.id,
-            "name": med.name,
-            "alarm_time": med.alarm_time.strftime("%H:%M"),
-            "is_taken": dose.is_taken,
-        })
-
-    return Response({
-        "date": today,
-        "doses": result
-    })
 
 @extend_schema(tags = ["아두이노->백엔드로 복용 완료 전송"])
 @api_view(['POST'])
-@permission_classes([AllowAny])  # 아두이노 접근 가능
-def arduino_confirm(request):
-    """아두이노 → 백엔드로 복용 완료 전송"""
-    dose_id = request.data.get('dose_id')
+@permission_classes([AllowAny])
+def arduino_confirm_batch(request):
+    return _confirm_batch_response(request)
 
-    if not dose_id:
-        return Response({'error': 'dose_id가 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        dose = DailyDose.objects.get(id=dose_id)
+########################################################################################
+# 기기별 아두이노 API (/arduino/devices/<device_id>/...)
+# device_id → 유저를 캐시로 찾고, 그 유저의 약/복용 기록만 다룬다.
 
-        # DailyDose 업데이트
-        dose.is_taken = True
-        dose.taken_at = timezone.now()
-        dose.save()
+def _unknown_device():
+    return Response({'error': '등록되지 않은 기기입니다.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # DoseLog (Medicine 단위로 기록)
-        DoseLog.objects.create(
-            medicine=dose.medicine,   # 모델에 맞게 수정 완료
-            source='ARDUINO'
-        )
 
-        return Response(
-            {'message': '복용 완료 반영됨'},
-            status=status.HTTP_200_OK
-        )
+def _aunknown_device():
+    return JsonResponse({'error': '등록되지 않은 기기입니다.'}, status=404)
 
-    except DailyDose.DoesNotExist:
-        return Response(
-            {'error': '해당 DailyDose를 찾을 수 없음'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+
+@require_GET
+async def device_today_doses(request, device_id):
+    user_id = await sql_to_async(request, resolve_device_user)(device_id)
+    if user_id is None:
+        return _aunknown_device()
+    return await _atoday_doses_response(request, user_id)
+
+
+@require_GET
+async def device_stream(request, device_id):
+    user_id = await sql_to_async(request, resolve_device_user)(device_id)
+    if user_id is None:
+        return _aunknown_device()
+    return _schedule_stream_response(user_id)
+
+
+@csrf_exempt
+@require_POST
+async def device_confirm(request, device_id):
+    user_id = await sql_to_async(request, resolve_device_user)(device_id)
+    if user_id is None:
+        return _aunknown_device()
+    return await _aconfirm_response(request, user_id)
+
+
+@extend_schema(tags = ["아두이노->백엔드로 복용 완료 전송"])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def device_confirm_batch(request, device_id):
+    user_id = resolve_device_user(device_id)
+    if user_id is None:
+        return _unknown_device()
+    return _confirm_batch_response(request, user_id)
+
+
+@csrf_exempt
+@require_POST
+def device_logs(request, device_id):
+    """
+    기기 센서 이벤트 일괄 업로드 (application/x-ndjson, 한 줄에 이벤트 하나)
+    {"medicine": "비타민", "taken": true, "timestamp": "2025-11-18T09:03:00+09:00"}
+    body 를 한 번에 읽지 않고 줄 단위로 읽어서 chunk 마다 저장한다.
+    복용 처리는 하지 않음 — reconcile_logs 명령이 나중에 DailyDose 에 반영
+    """
+    device_pk = Device.objects.filter(device_id=device_id).values_list("id", flat=True).first()
+    if device_pk is None:
+        return _aunknown_device()
+    return JsonResponse(ingest_events(device_pk, request), json_dumps_params={"ensure_ascii": False})
+
+
+@require_GET
+def metrics(request):
+    """Prometheus 텍스트 형식 메트릭 (PILLMATE_METRICS_ENABLED 일 때만)"""
+    if not settings.PILLMATE_METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(
+        render_metrics(settings.PILLMATE_METRICS_TEXTFILE_DIR),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -72,6 +72,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    # 요청별 지연/SQL 메트릭 (PILLMATE_METRICS_ENABLED 일 때만 동작)
+    'pillmate.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,6 +114,33 @@ DATABASES = {
     }
 }
 
+# 운영용 SQLite 설정 (PILLMATE_SQLITE_TUNED=1)
+# - WAL: 읽기와 쓰기가 서로 막지 않음 / synchronous=NORMAL: WAL 에서는 커밋마다 fsync 하지 않아도 안전
+# - timeout: 잠겨 있으면 바로 "database is locked" 를 내지 않고 최대 20초 대기 (busy_timeout)
+# - IMMEDIATE: 트랜잭션 시작 시 쓰기 잠금을 잡아서, 읽고→쓰는 트랜잭션끼리 교착 후 즉시 실패하지 않게 함
+SQLITE_TUNED_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA cache_size=-32000;'      # 32MB
+        'PRAGMA mmap_size=134217728;'    # 128MB
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+}
+PILLMATE_SQLITE_TUNED = env.bool("PILLMATE_SQLITE_TUNED", default=False)
+if PILLMATE_SQLITE_TUNED:
+    DATABASES['default']['OPTIONS'] = SQLITE_TUNED_OPTIONS
+
+
+# 캐시 (PILLMATE_CACHE_URL, 예: redis://127.0.0.1:6379/1)
+# 일정 버전 / 조회 캐시 / ETag 가 여기 있으므로 WSGI/ASGI 워커를 여러 개 띄우면 공유 캐시를 써야
+# 한 워커의 복용 처리가 다른 워커의 캐시를 무효화한다. 기본값 locmem 은 워커 1개 기준이고,
+# 이 경우 pillmate.caching 은 다른 워커 변경이 늦게 보이는 시간을 짧은 TTL 로 제한한다.
+CACHES = {
+    'default': env.cache('PILLMATE_CACHE_URL', default='locmemcache://'),
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -181,4 +210,12 @@ EMAIL_USE_TLS = True
 EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
\ No newline at end of file
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# 목록 API 를 페이지 없이 전체 list 로 반환 (?cursor= / ?page_size= 없는 요청, 예전 앱 호환용) — 기본은 첫 페이지만
+PILLMATE_UNPAGINATED_LISTS = env.bool("PILLMATE_UNPAGINATED_LISTS", default=False)
+
+# 메트릭 (/metrics, Prometheus 텍스트 형식) — 켜야만 수집/노출
+PILLMATE_METRICS_ENABLED = env.bool("PILLMATE_METRICS_ENABLED", default=False)
+# nopill_task 등 cron 작업의 마지막 실행 결과를 남길 디렉터리 (/metrics 가 같이 읽음)
+PILLMATE_METRICS_TEXTFILE_DIR = os.getenv("PILLMATE_METRICS_TEXTFILE_DIR")